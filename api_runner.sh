@@ -2,15 +2,45 @@
 
 echo "Runner script loaded..."
 
-while true; do
+start_api() {
   echo "Running API..."
-  uvicorn thechangelogbot.api.main:app --host 0.0.0.0 --port 8000 &
-  echo "Done!"
+  uvicorn thechangelogbot.api.main:app --host 0.0.0.0 --port 8000 \
+    --workers "${API_WORKERS:-1}" &
   API_PID=$!
-  # sleep every 5 minutes
+
+  # the api starts serving right away and warms up in the background
+  until curl -sf http://localhost:8000/ready > /dev/null; do
+    if ! kill -0 $API_PID 2> /dev/null; then
+      echo "API exited while warming up"
+      exit 1
+    fi
+    sleep 1
+  done
+  echo "Done!"
+}
+
+# the memory backend swaps to the snapshot the indexer writes, the mongo
+# backend (and memory loaded from mongo) only sees new episodes on restart
+swaps_snapshots() {
+  python -c "
+import sys
+from thechangelogbot.conf.load_config import config
+from thechangelogbot.index.database import get_snapshot_directory
+sys.exit(get_snapshot_directory(config) is None)
+"
+}
+
+start_api
+
+while true; do
   sleep 86400
-  kill $API_PID
   echo "Running indexer..."
   index-podcasts
-  echo "Restarting the API..."
+
+  if ! swaps_snapshots; then
+    echo "Restarting the API..."
+    kill $API_PID
+    wait $API_PID
+    start_api
+  fi
 done
@@ -0,0 +1,78 @@
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+from synthetic import clustered_embeddings
+from thechangelogbot.index.ann import IVFIndex
+from thechangelogbot.index.memory import top_k
+from thechangelogbot.index.snapshot import load_snapshot
+
+
+def recall(expected: list[np.ndarray], found: list[np.ndarray]) -> float:
+    hits = sum(len(np.intersect1d(e, f)) for e, f in zip(expected, found))
+    return hits / sum(len(e) for e in expected)
+
+
+def search_ivf(
+    embeddings: np.ndarray, index: IVFIndex, query: np.ndarray, k: int, nprobe
+) -> np.ndarray:
+    candidates = index.candidates(query, nprobe)
+    return candidates[top_k(embeddings[candidates] @ query, k)]
+
+
+def run(search: Callable, queries: np.ndarray) -> tuple:
+    start_time = time.perf_counter()
+    rows = [search(query) for query in queries]
+    return rows, len(queries) / (time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF recall benchmark")
+    parser.add_argument(
+        "--snapshot", help="snapshot directory, synthetic vectors if unset"
+    )
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, nargs="+", default=[0])
+    parser.add_argument(
+        "--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64]
+    )
+    args = parser.parse_args()
+
+    if args.snapshot:
+        embeddings = np.asarray(
+            load_snapshot(args.snapshot).embeddings, dtype=np.float32
+        )
+    else:
+        embeddings = clustered_embeddings(args.count)
+
+    rng = np.random.default_rng(1)
+    # queries are perturbed corpus vectors, like questions near a snippet
+    queries = embeddings[rng.choice(len(embeddings), args.queries)]
+    noise = rng.standard_normal(queries.shape) / np.sqrt(embeddings.shape[1])
+    queries = (queries + 0.5 * noise).astype(np.float32)
+
+    exact, exact_qps = run(lambda q: top_k(embeddings @ q, args.k), queries)
+    print(
+        f"exact     vectors={len(embeddings)} qps={exact_qps:.0f} "
+        f"memory={embeddings.nbytes / 2**20:.1f}MiB"
+    )
+
+    for n_lists in args.n_lists:
+        start_time = time.perf_counter()
+        index = IVFIndex.build(embeddings, n_lists=n_lists or None)
+        build_time = time.perf_counter() - start_time
+
+        for nprobe in args.nprobe:
+            found, qps = run(
+                lambda q: search_ivf(embeddings, index, q, args.k, nprobe),
+                queries,
+            )
+            print(
+                f"ivf       n_lists={len(index)} nprobe={nprobe:<3} "
+                f"recall@{args.k}={recall(exact, found):.3f} qps={qps:.0f} "
+                f"speedup={qps / exact_qps:.1f}x build={build_time:.1f}s "
+                f"memory=+{index.nbytes / 2**20:.1f}MiB"
+            )
@@ -0,0 +1,80 @@
+import argparse
+import random
+import time
+
+from synthetic import episode_text
+from thechangelogbot.index.embeddings import (
+    SnippetEncoder,
+    encode_in_worker,
+    get_encoder,
+)
+from thechangelogbot.index.parser import parse_episode_text
+
+
+def make_texts(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    texts = []
+    while len(texts) < count:
+        snippets = parse_episode_text(
+            episode_text(rng), episode_number=1, podcast="podcast"
+        )
+        texts.extend(snippet.text for snippet in snippets)
+    return texts[:count]
+
+
+def encode_fixed_batches(model_name: str, texts: list[str]) -> None:
+    # the previous path, 700 snippets per encode call in arrival order
+    model = get_encoder(model_name)
+    for i in range(0, len(texts), 700):
+        model.encode(texts[i : i + 700], normalize_embeddings=True)
+
+
+def report(name: str, count: int, elapsed: float) -> None:
+    print(
+        f"{name:<32} snippets={count} time={elapsed:.2f}s "
+        f"snippets/sec={count / elapsed:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexing encoder benchmark")
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--snippets", type=int, default=5000)
+    parser.add_argument("--max-batch-tokens", type=int, default=16384)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    texts = make_texts(args.snippets)
+    # load the model and warm up torch before timing anything
+    get_encoder(args.model).encode(texts[:32])
+
+    start_time = time.perf_counter()
+    encode_fixed_batches(args.model, texts)
+    report(
+        "fixed batches of 700", len(texts), time.perf_counter() - start_time
+    )
+
+    for workers in args.workers:
+        encoder = SnippetEncoder(
+            args.model,
+            max_batch_tokens=args.max_batch_tokens,
+            max_batch_size=args.max_batch_size,
+            workers=workers,
+        )
+        # the pool spawns its replicas on first use, keep that out of it
+        if workers > 1:
+            list(
+                encoder.executor.map(
+                    encode_in_worker, [[text] for text in texts[:workers]]
+                )
+            )
+
+        start_time = time.perf_counter()
+        encoder.encode(texts)
+        report(
+            f"bucketed workers={workers}",
+            len(texts),
+            time.perf_counter() - start_time,
+        )
+        encoder.close()
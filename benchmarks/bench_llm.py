@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from thechangelogbot.index.llm import OpenAIBackend, StubBackend
+
+MESSAGES = [
+    {"role": "system", "content": "Your name is Adam Stacoviak."},
+    {
+        "role": "user",
+        "content": "CONTEXT\n---------\n\nQUESTION\n--------\nWhat is Bun?",
+    },
+]
+
+
+async def stream(backend, results: list) -> None:
+    start_time = time.perf_counter()
+    first_token = None
+
+    async for _ in backend.astream(MESSAGES):
+        if first_token is None:
+            first_token = time.perf_counter() - start_time
+
+    results.append((first_token, time.perf_counter() - start_time))
+
+
+async def run(backend, concurrency: int) -> None:
+    results: list = []
+    start_time = time.perf_counter()
+    await asyncio.gather(
+        *[stream(backend, results) for _ in range(concurrency)]
+    )
+    elapsed = time.perf_counter() - start_time
+
+    ttft = sorted(r[0] for r in results)
+    total = sorted(r[1] for r in results)
+    print(
+        f"concurrency={concurrency:<4} wall={elapsed:.2f}s "
+        f"ttft_p50={statistics.median(ttft) * 1000:.0f}ms "
+        f"ttft_max={ttft[-1] * 1000:.0f}ms "
+        f"total_p50={statistics.median(total) * 1000:.0f}ms "
+        f"total_max={total[-1] * 1000:.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat streaming benchmark")
+    parser.add_argument(
+        "--api-base", help="OpenAI compatible api, the stub backend if unset"
+    )
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--time-to-first-token", type=float, default=0.2)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 10, 100, 500]
+    )
+    args = parser.parse_args()
+
+    if args.api_base:
+        backend = OpenAIBackend(model=args.model, api_base=args.api_base)
+    else:
+        backend = StubBackend(
+            tokens_per_second=args.tokens_per_second,
+            time_to_first_token=args.time_to_first_token,
+        )
+
+    for concurrency in args.concurrency:
+        asyncio.run(run(backend, concurrency))
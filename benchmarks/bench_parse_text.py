@@ -0,0 +1,73 @@
+import argparse
+import pathlib
+import random
+import time
+import tracemalloc
+
+from synthetic import episode_text
+from thechangelogbot.index.parser import iter_episode_files, parse_episode_text
+
+
+def load_fixtures(directory: str, episodes: int) -> list[str]:
+    files = []
+    for file in iter_episode_files(directory):
+        files.append(pathlib.Path(file).read_text())
+        if len(files) >= episodes:
+            break
+    return files
+
+
+def parse_all(fixtures: list[str]) -> int:
+    return sum(
+        len(parse_episode_text(text, episode_number=1, podcast="podcast"))
+        for text in fixtures
+    )
+
+
+def run(fixtures: list[str], repeat: int) -> None:
+    lines = sum(text.count("\n") + 1 for text in fixtures)
+    size = sum(len(text.encode("UTF-8")) for text in fixtures)
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        snippets = parse_all(fixtures)
+        timings.append(time.perf_counter() - start_time)
+    elapsed = min(timings)
+
+    # a separate pass, tracing allocations slows parsing down a lot
+    tracemalloc.start()
+    parse_all(fixtures)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"episodes={len(fixtures)} lines={lines} snippets={snippets} "
+        f"time={elapsed * 1000:.1f}ms lines/sec={lines / elapsed:.0f} "
+        f"MB/sec={size / elapsed / 1e6:.1f} "
+        f"peak_alloc={peak / 1e6:.1f}MB ({peak / size:.2f}x input)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="parse_episode_text micro-benchmark"
+    )
+    parser.add_argument(
+        "--directory", help="transcript repo, synthetic episodes if not given"
+    )
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.directory:
+        fixtures = load_fixtures(args.directory, args.episodes)
+    else:
+        rng = random.Random(args.seed)
+        fixtures = [
+            episode_text(rng, turns=args.turns) for _ in range(args.episodes)
+        ]
+
+    run(fixtures, repeat=args.repeat)
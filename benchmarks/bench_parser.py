@@ -0,0 +1,51 @@
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import write_corpus
+from thechangelogbot.index.parser import (
+    index_snippet_batches,
+    iter_episode_files,
+)
+
+
+def run(directory: str, workers: int, batch_size: int) -> None:
+    files = sum(1 for _ in iter_episode_files(directory))
+    snippets = 0
+
+    start_time = time.perf_counter()
+    for batch in index_snippet_batches(
+        directory, workers=workers, batch_size=batch_size
+    ):
+        snippets += len(batch)
+    elapsed = time.perf_counter() - start_time
+
+    print(
+        f"workers={workers:<3} files={files} snippets={snippets} "
+        f"time={elapsed:.2f}s files/sec={files / elapsed:.1f} "
+        f"snippets/sec={snippets / elapsed:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcript parser benchmark")
+    parser.add_argument(
+        "--directory", help="transcript repo, a synthetic one if not given"
+    )
+    parser.add_argument("--podcasts", type=int, default=4)
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, os.cpu_count()]
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = args.directory or str(
+            write_corpus(
+                tmp_directory, podcasts=args.podcasts, episodes=args.episodes
+            )
+        )
+        for workers in args.workers:
+            run(directory, workers=workers, batch_size=args.batch_size)
@@ -0,0 +1,81 @@
+import argparse
+import time
+
+import numpy as np
+from bench_ann import recall
+from synthetic import clustered_embeddings
+from thechangelogbot.index.filters import FilterIndex
+from thechangelogbot.index.lexical import LexicalIndex
+from thechangelogbot.index.memory import MemoryIndex
+from thechangelogbot.index.quantization import QuantizedVectors
+from thechangelogbot.index.snapshot import load_snapshot
+
+
+def make_index(embeddings: np.ndarray, dtype: str = "float32") -> MemoryIndex:
+    # only the vector path is measured, skip the filter and lexical builds
+    return MemoryIndex(
+        embeddings=embeddings,
+        snippets=range(len(embeddings)),
+        dtype=dtype,
+        normalized=True,
+        filter_index=FilterIndex({}),
+        lexical_index=LexicalIndex.from_texts([]),
+    )
+
+
+def run(index: MemoryIndex, queries: np.ndarray, k: int) -> tuple:
+    start_time = time.perf_counter()
+    rows = [index.vector_rows(query, k) for query in queries]
+    return rows, len(queries) / (time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantization benchmark")
+    parser.add_argument(
+        "--snapshot", help="snapshot directory, synthetic vectors if unset"
+    )
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 4, 10])
+    args = parser.parse_args()
+
+    if args.snapshot:
+        embeddings = np.asarray(
+            load_snapshot(args.snapshot).embeddings, dtype=np.float32
+        )
+    else:
+        embeddings = clustered_embeddings(args.count)
+
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(len(embeddings), args.queries)]
+    noise = rng.standard_normal(queries.shape) / np.sqrt(embeddings.shape[1])
+    queries = (queries + 0.5 * noise).astype(np.float32)
+
+    index = make_index(embeddings)
+    exact, exact_qps = run(index, queries, args.k)
+    print(
+        f"float32          recall@{args.k}=1.000 qps={exact_qps:.0f} "
+        f"scanned={embeddings.nbytes / 2**20:.1f}MiB"
+    )
+
+    float16 = make_index(embeddings, dtype="float16")
+    found, qps = run(float16, queries, args.k)
+    print(
+        f"float16          recall@{args.k}={recall(exact, found):.3f} "
+        f"qps={qps:.0f} scanned={float16.embeddings.nbytes / 2**20:.1f}MiB"
+    )
+
+    for quantization in ("int8", "binary"):
+        index.quantized = QuantizedVectors.from_embeddings(
+            embeddings, quantization
+        )
+        for rescore in args.rescore:
+            index.quantized.rescore = rescore
+            found, qps = run(index, queries, args.k)
+            print(
+                f"{quantization:<6} rescore={rescore:<3} "
+                f"recall@{args.k}={recall(exact, found):.3f} qps={qps:.0f} "
+                f"scanned={index.quantized.nbytes / 2**20:.1f}MiB "
+                f"({embeddings.nbytes / index.quantized.nbytes:.0f}x smaller)"
+            )
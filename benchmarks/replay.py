@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+from thechangelogbot.api.querylog import read_query_log
+
+ENDPOINTS = ("/search", "/chat")
+
+
+async def send(client: httpx.AsyncClient, entry: dict, results: dict) -> None:
+    start_time = time.perf_counter()
+    first_byte, status = None, None
+
+    try:
+        async with client.stream(
+            "POST", entry["endpoint"], json=entry["request"]
+        ) as response:
+            async for _ in response.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start_time
+            status = response.status_code
+    except httpx.HTTPError:
+        pass
+
+    elapsed = time.perf_counter() - start_time
+    results[entry["endpoint"]].append((status, elapsed, first_byte))
+
+
+async def replay(
+    entries: list[dict], url: str, rate: float, concurrency: int
+) -> tuple[dict, float]:
+    results: dict = defaultdict(list)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(entry: dict) -> None:
+        try:
+            await send(client, entry, results)
+        finally:
+            semaphore.release()
+
+    async with httpx.AsyncClient(
+        base_url=url,
+        timeout=None,
+        limits=httpx.Limits(max_connections=concurrency),
+    ) as client:
+        tasks = []
+        start_time = time.perf_counter()
+
+        for i, entry in enumerate(entries):
+            # requests go out at a fixed rate, unless concurrency runs out
+            if rate > 0:
+                delay = start_time + i / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(run(entry)))
+
+        await asyncio.gather(*tasks)
+
+    return results, time.perf_counter() - start_time
+
+
+def report(results: dict, elapsed: float) -> None:
+    for endpoint, samples in sorted(results.items()):
+        ok = [s for s in samples if s[0] is not None and s[0] < 400]
+        latencies = np.array([s[1] for s in ok]) * 1000
+        line = (
+            f"{endpoint:<8} requests={len(samples)} "
+            f"errors={len(samples) - len(ok)} "
+            f"rps={len(samples) / elapsed:.1f}"
+        )
+
+        if len(ok):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            first_bytes = [s[2] for s in ok if s[2] is not None]
+            line += f" p50={p50:.0f}ms p95={p95:.0f}ms p99={p99:.0f}ms"
+            if first_bytes:
+                line += f" ttfb_p50={np.median(first_bytes) * 1000:.0f}ms"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a query log against a running api"
+    )
+    parser.add_argument("logs", nargs="+", help="query log files")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="requests/sec, 0 for no pacing"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, help="stop after this many")
+    parser.add_argument(
+        "--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS
+    )
+    args = parser.parse_args()
+
+    entries = (
+        entry
+        for path in args.logs
+        for entry in read_query_log(path)
+        if entry["endpoint"] in args.endpoints
+    )
+    entries = list(itertools.islice(entries, args.requests))
+
+    results, elapsed = asyncio.run(
+        replay(entries, args.url, args.rate, args.concurrency)
+    )
+    print(
+        f"replayed {len(entries)} requests in {elapsed:.2f}s "
+        f"rate={args.rate or 'unpaced'} concurrency={args.concurrency}"
+    )
+    report(results, elapsed)
@@ -0,0 +1,78 @@
+import pathlib
+import random
+
+import numpy as np
+
+SPEAKERS = [
+    "Adam Stacoviak",
+    "Jerod Santo",
+    "Mat Ryer",
+    "Daniel Whitenack",
+    "Chris Benson",
+    "Kball",
+    "Break",
+]
+WORDS = (
+    "the a we you it is that to of and in for on with this but so like "
+    "really think just kind going know about people code thing things go "
+    "rust sqlite bun kubernetes k8s postgres deploy embeddings model "
+    "javascript typescript open source community podcast changelog"
+).split()
+
+
+def sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + rng.choice([".", "?", "!"])
+
+
+def episode_text(
+    rng: random.Random, turns: int = 200, max_sentences: int = 30
+) -> str:
+    lines = []
+    for _ in range(turns):
+        speaker = rng.choice(SPEAKERS)
+        minute, second = rng.randint(0, 59), rng.randint(0, 59)
+        sentences = [
+            sentence(rng, 3, 25)
+            for _ in range(rng.randint(1, rng.choice([2, 5, max_sentences])))
+        ]
+        lines.append(
+            f"**{speaker}:** \\[{minute:02}:{second:02}\\] {sentences[0]}"
+        )
+        # long turns wrap over several paragraphs in the real transcripts
+        for i in range(1, len(sentences), 4):
+            lines.append("")
+            lines.append(" ".join(sentences[i : i + 4]))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def write_corpus(
+    directory: pathlib.Path,
+    podcasts: int = 4,
+    episodes: int = 50,
+    turns: int = 200,
+    seed: int = 0,
+) -> pathlib.Path:
+    rng = random.Random(seed)
+    for p in range(podcasts):
+        podcast_directory = pathlib.Path(directory) / f"podcast{p}"
+        podcast_directory.mkdir(parents=True, exist_ok=True)
+        for e in range(episodes):
+            (podcast_directory / f"podcast{p}-{e + 1}.md").write_text(
+                episode_text(rng, turns=turns)
+            )
+    return pathlib.Path(directory)
+
+
+def clustered_embeddings(
+    count: int, dim: int = 384, clusters: int = 256, seed: int = 0
+) -> np.ndarray:
+    # sentence embeddings are far from uniform, topics form loose clusters
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    embeddings = centers[labels] + rng.standard_normal((count, dim)).astype(
+        np.float32
+    )
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
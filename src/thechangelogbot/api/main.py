@@ -1,27 +1,190 @@
+import asyncio
+import threading
 import time
-from typing import Optional
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncIterator, Iterator, Literal, Optional
 
 import pkg_resources
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, StreamingResponse
+from fastapi.responses import (
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from loguru import logger
-from pydantic import BaseModel
-from ratelimiter import RateLimiter
+from pydantic import BaseModel, Field
+from thechangelogbot.api.profiler import (
+    PROFILE_HEADER,
+    SamplingProfiler,
+    get_profile_directory,
+)
+from thechangelogbot.api.querylog import get_query_log
+from thechangelogbot.api.ratelimit import RateLimit
+from thechangelogbot.api.warmup import Warmup
 from thechangelogbot.conf.load_config import config
-from thechangelogbot.index.chat import respond_to_query
+from thechangelogbot.index.chat import (
+    arespond_to_query,
+    get_answer_cache,
+    get_context_builder,
+)
 from thechangelogbot.index.database import (
+    asearch_snippets,
+    asearch_snippets_batch,
+    check_filter_values,
+    check_mongo_search_mode,
+    get_query_cache,
+    get_search_backend,
+    get_snapshot_directory,
     get_speakers,
     get_superduperdb_components,
-    search_database,
+    load_memory_index,
+    search_snippets,
+)
+from thechangelogbot.index.embeddings import QueryEncoder
+from thechangelogbot.index.llm import LLMBackend, get_llm_backend
+from thechangelogbot.index.memory import MemoryIndex
+from thechangelogbot.index.metrics import METRICS
+from thechangelogbot.index.rerank import get_reranker
+from thechangelogbot.index.snapshot import (
+    SnapshotWatcher,
+    get_current_snapshot,
+)
+from thechangelogbot.index.timing import server_timing
+
+ANSWER_CACHE = get_answer_cache(config)
+RERANKER = get_reranker(config)
+CONTEXT_BUILDER = get_context_builder(config)
+QUERY_ENCODER = QueryEncoder(
+    model_name=config["model"]["name"],
+    prefix=config["model"]["prefix"].get("querying", None),
+    cache=get_query_cache(config),
+    **config["search"].get("batching", {}),
+)
+# mongodb and the index are loaded by the warmup, after the server started
+DATABASE, COLLECTION = None, None
+DATABASE_LOCK = threading.Lock()
+# built on the first /chat, a missing api key only disables chat
+LLM_BACKEND: Optional[LLMBackend] = None
+MEMORY_INDEX, SNAPSHOTS = None, None
+WARMUP_CONFIG = config["api"].get("warmup") or {}
+WARMUP_QUERIES = WARMUP_CONFIG.get("queries") or []
+RATE_LIMIT = config["api"].get("rate_limit") or {}
+RATE_LIMIT_CALLS = RATE_LIMIT.get("calls", 10)
+RATE_LIMIT_SECONDS = RATE_LIMIT.get("seconds", 60)
+MAX_BATCH_SEARCHES = 1000
+PROFILE_DIRECTORY = get_profile_directory(config)
+QUERY_LOG = get_query_log(config)
+
+
+def current_snapshot_directory() -> Optional[str]:
+    snapshot_directory = get_snapshot_directory(config)
+
+    if snapshot_directory and get_current_snapshot(snapshot_directory):
+        return snapshot_directory
+    return None
+
+
+def connect_database() -> None:
+    global DATABASE, COLLECTION
+
+    with DATABASE_LOCK:
+        if DATABASE is None:
+            DATABASE, COLLECTION = get_superduperdb_components(config)
+
+
+def warm_database() -> None:
+    # a memory index served from a snapshot only needs mongodb for /speakers
+    if current_snapshot_directory() is None:
+        connect_database()
+
+
+def load_index() -> None:
+    global MEMORY_INDEX, SNAPSHOTS
+
+    if get_search_backend(config) != "memory":
+        return
+
+    snapshot_directory = current_snapshot_directory()
+
+    if snapshot_directory is not None:
+        SNAPSHOTS = SnapshotWatcher(
+            snapshot_directory,
+            check_interval=config["search"].get("reload_interval", 30),
+        ).start()
+    else:
+        MEMORY_INDEX = load_memory_index(
+            DATABASE,
+            COLLECTION,
+            dtype=config["search"].get("dtype", "float32"),
+            ann=config["search"].get("ann"),
+            quantization=config["search"].get("quantization"),
+        )
+
+
+def get_backend() -> LLMBackend:
+    global LLM_BACKEND
+
+    if LLM_BACKEND is None:
+        LLM_BACKEND = get_llm_backend(config)
+    return LLM_BACKEND
+
+
+def get_memory_index() -> Optional[MemoryIndex]:
+    if SNAPSHOTS is not None:
+        return SNAPSHOTS.get()
+    return MEMORY_INDEX
+
+
+def load_models() -> None:
+    # straight to the model, the query cache would skip the forward pass
+    if get_search_backend(config) == "memory" and WARMUP_QUERIES:
+        QUERY_ENCODER.encode_batch(WARMUP_QUERIES)
+
+    # a first rerank that loads the model would inflate its cost estimate
+    if RERANKER is not None:
+        RERANKER.load()
+
+
+def warm_search() -> None:
+    for query in WARMUP_QUERIES:
+        results = list(
+            search_snippets(
+                config=config,
+                query=query,
+                db=DATABASE,
+                collection=COLLECTION,
+                memory_index=get_memory_index(),
+                encoder=QUERY_ENCODER,
+                reranker=RERANKER,
+            )
+        )
+        if CONTEXT_BUILDER is not None:
+            CONTEXT_BUILDER.build(query, results)
+
+
+WARMUP = Warmup(
+    [
+        ("database", warm_database),
+        ("index", load_index),
+        ("models", load_models),
+        ("search", warm_search),
+    ],
+    retry_interval=WARMUP_CONFIG.get("retry_interval", 10),
 )
 
-DATABASE, COLLECTION = get_superduperdb_components(config)
-RATE_LIMIT_CALLS, RATE_LIMIT_SECONDS = 10, 60
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    WARMUP.start()
+    yield
+
 
 app = FastAPI(
     title="Changelogbot API",
     version=pkg_resources.get_distribution("thechangelogbot").version,
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -32,20 +195,89 @@ app.add_middleware(
 )
 
 
-def limited(until):
+async def profile_request(request: Request, call_next):
+    if request.headers.get(PROFILE_HEADER) != "1":
+        return await call_next(request)
+
+    # streamed bodies are sent after call_next returns and are not sampled
+    profiler = SamplingProfiler(
+        interval_ms=config["api"]["profiling"].get("interval_ms", 5)
+    ).start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+
+    path = await asyncio.to_thread(
+        profiler.save, PROFILE_DIRECTORY, request.url.path.strip("/")
+    )
+    response.headers[PROFILE_HEADER] = path.name
+    return response
+
+
+# the middleware wraps every response, so it is only added when profiling
+if PROFILE_DIRECTORY is not None:
+    app.middleware("http")(profile_request)
+
+
+def log_query(
+    endpoint: str,
+    request: BaseModel,
+    start_time: float,
+    hashes: list[str],
+    timings: Optional[dict] = None,
+) -> None:
+    if QUERY_LOG is None:
+        return
+
+    QUERY_LOG.record(
+        {
+            "time": time.time(),
+            "endpoint": endpoint,
+            "request": request.model_dump(),
+            "duration_ms": (time.perf_counter() - start_time) * 1000,
+            "timings": {
+                stage: value
+                for stage, value in (timings or {}).items()
+                if isinstance(value, float)
+            },
+            "hashes": hashes,
+        }
+    )
+
+
+def check_ready() -> None:
+    if not WARMUP.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Warming up, retry shortly",
+            headers={"Retry-After": "5"},
+        )
+
+
+def limited(endpoint: str, until: float):
+    METRICS.counter(
+        "changelogbot_rate_limited_total",
+        "Requests rejected by the rate limiter",
+        endpoint=endpoint,
+    ).inc()
     duration = int(round(until - time.time()))
-    logger.info(f"Sleeping for {duration:.2f} seconds")
+    logger.info(f"Rate limited for {duration:.2f} seconds")
     raise HTTPException(
         status_code=429,
-        detail=f"Rate limited, sleeping for {duration:.2f} seconds",
+        detail=f"Rate limited, retry in {duration:.2f} seconds",
     )
 
 
-rate_limiter_search = RateLimiter(
-    max_calls=RATE_LIMIT_CALLS, period=RATE_LIMIT_SECONDS, callback=limited
+rate_limiter_search = RateLimit(
+    max_calls=RATE_LIMIT_CALLS,
+    period=RATE_LIMIT_SECONDS,
+    callback=partial(limited, "search"),
 )
-rate_limiter_chat = RateLimiter(
-    max_calls=RATE_LIMIT_CALLS, period=RATE_LIMIT_SECONDS, callback=limited
+rate_limiter_chat = RateLimit(
+    max_calls=RATE_LIMIT_CALLS,
+    period=RATE_LIMIT_SECONDS,
+    callback=partial(limited, "chat"),
 )
 
 
@@ -54,10 +286,20 @@ def root():
     return RedirectResponse("/docs")
 
 
+@app.get("/ready")
+def ready(response: Response):
+    if not WARMUP.ready:
+        response.status_code = 503
+    return WARMUP.state()
+
+
 class SearchRequest(BaseModel):
     query: str
     filters: Optional[dict[str, str]] = None
+    filter_mode: Literal["exact", "regex"] = "exact"
+    mode: Literal["vector", "lexical", "hybrid"] = "vector"
     limit: int = 10
+    stream: bool = False
 
     model_config = {
         "json_schema_extra": {
@@ -65,25 +307,128 @@ class SearchRequest(BaseModel):
                 {
                     "query": "what are embeddings?",
                     "filters": {"speaker": "Adam Stacoviak"},
-                }
+                },
+                {"query": "Bun and SQLite", "mode": "hybrid"},
             ]
         }
     }
 
 
+def check_search(request: SearchRequest) -> None:
+    # lexical and hybrid search need the memory backend, integer filters
+    # must be integers for mongo
+    if get_search_backend(config) != "mongo":
+        return
+
+    try:
+        check_mongo_search_mode(request.mode)
+        check_filter_values(request.filters, request.filter_mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def stream_search(request: SearchRequest) -> Iterator[bytes]:
+    start_time, hashes = time.perf_counter(), []
+
+    # a sync generator, starlette pulls every result in its threadpool
+    for snippet in search_snippets(
+        config=config,
+        query=request.query,
+        list_of_filters=request.filters,
+        filter_mode=request.filter_mode,
+        mode=request.mode,
+        limit=request.limit,
+        db=DATABASE,
+        collection=COLLECTION,
+        memory_index=get_memory_index(),
+        encoder=QUERY_ENCODER,
+        reranker=RERANKER,
+    ):
+        hashes.append(snippet._hash)
+        yield (snippet._as_json() + "\n").encode("UTF-8")
+
+    log_query("/search", request, start_time, hashes)
+
+
 @app.post("/search")
-def search_endpoint(request: SearchRequest):
-    with rate_limiter_search:
-        return search_database(
-            config=config,
-            query=request.query,
-            list_of_filters=request.filters,
-            limit=request.limit,
-            db=DATABASE,
-            collection=COLLECTION,
-            initialize=False,
+async def search_endpoint(request: SearchRequest, response: Response):
+    check_search(request)
+    check_ready()
+    rate_limiter_search.check()
+
+    if request.stream:
+        return StreamingResponse(
+            stream_search(request), media_type="application/x-ndjson"
         )
 
+    start_time, timings = time.perf_counter(), {}
+    results = await asearch_snippets(
+        config=config,
+        query=request.query,
+        list_of_filters=request.filters,
+        filter_mode=request.filter_mode,
+        mode=request.mode,
+        limit=request.limit,
+        db=DATABASE,
+        collection=COLLECTION,
+        memory_index=get_memory_index(),
+        encoder=QUERY_ENCODER,
+        reranker=RERANKER,
+        timings=timings,
+    )
+    response.headers["Server-Timing"] = server_timing(timings)
+    log_query(
+        "/search",
+        request,
+        start_time,
+        [snippet._hash for snippet in results],
+        timings,
+    )
+    return results
+
+
+class BatchSearchRequest(BaseModel):
+    searches: list[SearchRequest] = Field(max_length=MAX_BATCH_SEARCHES)
+
+
+@app.post("/search/batch")
+async def search_batch_endpoint(
+    request: BatchSearchRequest, response: Response
+):
+    for search in request.searches:
+        check_search(search)
+    check_ready()
+    # a batch counts as one call against the rate limit
+    rate_limiter_search.check()
+    timings: dict = {}
+    results = await asearch_snippets_batch(
+        config=config,
+        searches=[
+            {
+                "query": search.query,
+                "list_of_filters": search.filters,
+                "filter_mode": search.filter_mode,
+                "mode": search.mode,
+                "limit": search.limit,
+            }
+            for search in request.searches
+        ],
+        db=DATABASE,
+        collection=COLLECTION,
+        memory_index=get_memory_index(),
+        encoder=QUERY_ENCODER,
+        timings=timings,
+    )
+    response.headers["Server-Timing"] = server_timing(timings)
+    return results
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        METRICS.render(), media_type="text/plain; version=0.0.4"
+    )
+
 
 @app.get("/podcasts")
 def podcasts():
@@ -108,22 +453,58 @@ class ChatRequest(BaseModel):
 
 @app.get("/speakers")
 def speakers():
+    check_ready()
+    try:
+        connect_database()
+    except Exception as e:
+        logger.error(f"Failed to connect to mongodb: {e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
     return get_speakers(
         database=DATABASE, collection_name=config["mongodb"]["collection"]
     )
 
 
+async def stream_chat(
+    request: ChatRequest, backend: LLMBackend
+) -> AsyncIterator[str]:
+    start_time, timings = time.perf_counter(), {}
+
+    async for text in arespond_to_query(
+        query=request.query,
+        speaker=request.speaker,
+        db=DATABASE,
+        config=config,
+        collection=COLLECTION,
+        backend=backend,
+        memory_index=get_memory_index(),
+        encoder=QUERY_ENCODER,
+        answer_cache=ANSWER_CACHE,
+        reranker=RERANKER,
+        context_builder=CONTEXT_BUILDER,
+        timings=timings,
+    ):
+        if "first_chunk" not in timings:
+            timings["first_chunk"] = (time.perf_counter() - start_time) * 1000
+        yield text
+
+    log_query(
+        "/chat", request, start_time, timings.get("context", []), timings
+    )
+
+
 @app.post("/chat")
-def chat(request: ChatRequest):
-    with rate_limiter_chat:
-        logger.info(f"Query: {request}")
-        return StreamingResponse(
-            respond_to_query(
-                query=request.query,
-                speaker=request.speaker,
-                db=DATABASE,
-                config=config,
-                collection=COLLECTION,
-            ),
-            media_type="text/plain",
-        )
+async def chat(request: ChatRequest):
+    check_ready()
+    rate_limiter_chat.check()
+    logger.info(f"Query: {request}")
+
+    try:
+        backend = get_backend()
+    except ValueError as e:
+        logger.error(f"Chat is unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Chat is unavailable")
+
+    return StreamingResponse(
+        stream_chat(request, backend), media_type="text/plain"
+    )
@@ -0,0 +1,63 @@
+import pathlib
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+PROFILE_HEADER = "X-Profile"
+
+
+def folded_stack(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = 5.0):
+        self.interval = interval_ms / 1000
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        # requests hop between the event loop and worker threads, so every
+        # thread but this one is sampled
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.samples[folded_stack(frame)] += 1
+
+    def folded(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.items()
+        )
+
+    def save(self, directory: str, name: str) -> pathlib.Path:
+        path = pathlib.Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        path = path / (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{name}-{id(self):x}.folded"
+        )
+        path.write_text(self.folded())
+        return path
+
+
+def get_profile_directory(config: dict) -> Optional[str]:
+    return (config.get("api", {}).get("profiling") or {}).get("directory")
@@ -0,0 +1,136 @@
+import json
+import os
+import pathlib
+import queue
+import threading
+import time
+from typing import Iterator, Optional
+
+from loguru import logger
+from thechangelogbot.index.metrics import METRICS
+
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class QueryLog:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 5,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+    ):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.dropped = METRICS.counter(
+            "changelogbot_query_log_dropped_total",
+            "Query log entries dropped because the writer fell behind",
+        )
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._open()
+        self._worker = threading.Thread(
+            target=self._run, name="query-log", daemon=True
+        )
+        self._worker.start()
+
+    def record(self, entry: dict) -> None:
+        # never waits on the disk, a full queue drops the entry instead
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped.inc()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+        self._file.close()
+
+    def _drain(self) -> tuple[list[dict], bool]:
+        entries, closed = [], False
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            timeout = deadline - time.monotonic()
+            try:
+                entry = (
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+
+            if entry is None:
+                closed = True
+                break
+            entries.append(entry)
+
+        return entries, closed
+
+    def _run(self) -> None:
+        while True:
+            entries, closed = self._drain()
+
+            if entries:
+                try:
+                    self._write(entries)
+                except Exception as e:
+                    logger.error(f"Failed to write the query log: {e}")
+
+            if closed:
+                return
+
+    def _open(self) -> None:
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+
+    def _write(self, entries: list[dict]) -> None:
+        for entry in entries:
+            line = (JSON_ENCODER.encode(entry) + "\n").encode("UTF-8")
+            self._file.write(line)
+            self._size += len(line)
+
+            if self._size >= self.max_bytes:
+                self._rotate()
+
+        self._file.flush()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{i}")
+            if source.exists():
+                os.replace(
+                    source, self.path.with_name(f"{self.path.name}.{i + 1}")
+                )
+        if self.backups > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._open()
+
+
+def read_query_log(path: str) -> Iterator[dict]:
+    with open(path, encoding="UTF-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def get_query_log(config: dict) -> Optional[QueryLog]:
+    log_config = config.get("api", {}).get("query_log") or {}
+
+    if log_config.get("path") is None:
+        return None
+
+    return QueryLog(
+        log_config["path"],
+        max_bytes=log_config.get("max_bytes", 64 * 1024 * 1024),
+        backups=log_config.get("backups", 5),
+        flush_interval=log_config.get("flush_interval", 1.0),
+    )
@@ -0,0 +1,32 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+
+class RateLimit:
+    def __init__(
+        self,
+        max_calls: int,
+        period: float,
+        callback: Callable[[float], None],
+    ):
+        self.max_calls = max_calls
+        self.period = period
+        self.callback = callback
+        self.calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        # never sleeps, so it is safe to call from the event loop
+        with self._lock:
+            now = time.time()
+
+            while self.calls and now - self.calls[0] >= self.period:
+                self.calls.popleft()
+
+            if len(self.calls) >= self.max_calls:
+                self.callback(self.calls[0] + self.period)
+                return
+
+            self.calls.append(now)
@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+from thechangelogbot.index.timing import record_timing
+
+
+class Warmup:
+    def __init__(
+        self,
+        steps: list[tuple[str, Callable[[], None]]],
+        retry_interval: float = 10.0,
+    ):
+        self.steps = steps
+        self.retry_interval = retry_interval
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.timings: dict[str, float] = {}
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def start(self) -> "Warmup":
+        # the server accepts connections while this runs, /ready says when
+        self._thread = threading.Thread(
+            target=self.run, name="warmup", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def run(self) -> None:
+        self.status = "warming"
+        start_time = time.perf_counter()
+
+        for name, step in self.steps:
+            # a failed step, e.g. mongodb not up yet, is retried until it works
+            while not self._run_step(name, step):
+                time.sleep(self.retry_interval)
+
+        total_ms = record_timing(self.timings, "warmup", start_time)
+        logger.info(f"Warm after {total_ms / 1000:.2f} seconds")
+        self.status, self.error = "ready", None
+        self._done.set()
+
+    def _run_step(self, name: str, step: Callable[[], None]) -> bool:
+        start_time = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            self.status, self.error = "failed", f"{name}: {e}"
+            logger.error(
+                f"Warmup step {name} failed, retrying in "
+                f"{self.retry_interval} seconds: {e}"
+            )
+            return False
+
+        # a retry that works clears the failure /ready was reporting
+        self.status, self.error = "warming", None
+        elapsed_ms = record_timing(self.timings, f"warmup_{name}", start_time)
+        logger.info(f"Warmup step {name} took {elapsed_ms:.0f}ms")
+        return True
+
+    def state(self) -> dict:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "timings": dict(self.timings),
+        }
@@ -1,3 +1,8 @@
+import os
+
 import yaml
 
-config = yaml.safe_load(open("config.yml"))
+CONFIG_PATH = os.getenv("CHANGELOGBOT_CONFIG", "config.yml")
+
+with open(CONFIG_PATH) as handle:
+    config = yaml.safe_load(handle)
@@ -0,0 +1,143 @@
+import math
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+ANN_TYPES = ("ivf",)
+ASSIGN_CHUNK_SIZE = 65536
+
+
+def assign_lists(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(len(embeddings), dtype=np.int32)
+    for i in range(0, len(embeddings), ASSIGN_CHUNK_SIZE):
+        block = embeddings[i : i + ASSIGN_CHUNK_SIZE].astype(np.float32)
+        assignments[i : i + ASSIGN_CHUNK_SIZE] = np.argmax(
+            block @ centroids.T, axis=1
+        )
+    return assignments
+
+
+def train_centroids(
+    embeddings: np.ndarray,
+    n_lists: int,
+    iterations: int = 10,
+    sample_size: Optional[int] = None,
+    seed: int = 0,
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(embeddings), sample_size or n_lists * 256)
+    sample = np.asarray(
+        embeddings[np.sort(rng.choice(len(embeddings), sample_size, False))],
+        dtype=np.float32,
+    )
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+
+    # spherical k-means, the vectors are compared by inner product
+    for _ in range(iterations):
+        assignments = assign_lists(sample, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+
+        # reseed empty lists with random vectors from the sample
+        empty = np.flatnonzero(~filled)
+        sums[empty] = sample[rng.choice(len(sample), len(empty))]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+
+    return centroids
+
+
+class IVFIndex:
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        nprobe: int = 8,
+    ):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.offsets = offsets
+        self.rows = rows
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        sample_size: Optional[int] = None,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        if n_lists is None:
+            n_lists = max(1, int(4 * math.sqrt(len(embeddings))))
+        n_lists = min(n_lists, len(embeddings))
+
+        centroids = train_centroids(
+            embeddings,
+            n_lists=n_lists,
+            iterations=iterations,
+            sample_size=sample_size,
+            seed=seed,
+        )
+        assignments = assign_lists(embeddings, centroids)
+
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=offsets[1:])
+        rows = np.argsort(assignments, kind="stable").astype(np.int32)
+
+        return cls(
+            centroids=centroids, offsets=offsets, rows=rows, nprobe=nprobe
+        )
+
+    def __len__(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + self.offsets.nbytes + self.rows.nbytes
+
+    def candidates(
+        self, query_embedding: np.ndarray, nprobe: Optional[int] = None
+    ) -> np.ndarray:
+        nprobe = min(nprobe or self.nprobe, len(self))
+        scores = self.centroids @ np.asarray(query_embedding, dtype=np.float32)
+        lists = np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+        return np.concatenate(
+            [self.rows[self.offsets[i] : self.offsets[i + 1]] for i in lists]
+        )
+
+
+def build_ann_index(
+    embeddings: np.ndarray, ann_config: Optional[dict]
+) -> Optional[IVFIndex]:
+    if not ann_config or ann_config.get("type") is None:
+        return None
+
+    ann_type = ann_config["type"]
+    if ann_type not in ANN_TYPES:
+        raise ValueError(
+            f"{ann_type} is not a valid ann index type (must be in {ANN_TYPES})"
+        )
+
+    index = IVFIndex.build(
+        embeddings,
+        n_lists=ann_config.get("n_lists"),
+        nprobe=ann_config.get("nprobe", 8),
+        iterations=ann_config.get("iterations", 10),
+        sample_size=ann_config.get("sample_size"),
+    )
+    logger.info(
+        f"Built an ivf index with {len(index)} lists over {len(embeddings)} vectors"
+    )
+    return index
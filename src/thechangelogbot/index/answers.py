@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from thechangelogbot.index.cache import normalize_query
+from thechangelogbot.index.snippet import Snippet
+
+
+def context_key(speaker: str, context: list[Snippet]) -> str:
+    return f"{speaker}\x00" + ",".join(snippet._hash for snippet in context)
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b)) / norm if norm else 0.0
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: Optional[float] = None,
+        similarity_threshold: Optional[float] = 0.95,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+
+        # (context key, normalized query) -> (created, embedding, chunks, size)
+        self._entries: OrderedDict = OrderedDict()
+        self._queries: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _find(
+        self, key: str, query: str, query_embedding: Optional[np.ndarray]
+    ) -> Optional[tuple]:
+        if (key, query) in self._entries:
+            return key, query
+
+        if query_embedding is None or self.similarity_threshold is None:
+            return None
+
+        best, best_similarity = None, self.similarity_threshold
+        for cached_query in self._queries.get(key, ()):
+            embedding = self._entries[(key, cached_query)][1]
+            if embedding is None:
+                continue
+
+            similarity = cosine_similarity(query_embedding, embedding)
+            if similarity >= best_similarity:
+                best, best_similarity = (key, cached_query), similarity
+
+        return best
+
+    def get(
+        self,
+        key: str,
+        query: str,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> Optional[list[str]]:
+        query = normalize_query(query)
+
+        with self._lock:
+            entry_key = self._find(key, query, query_embedding)
+
+            if entry_key is not None and self._expired(
+                self._entries[entry_key][0]
+            ):
+                self._evict(entry_key)
+                entry_key = None
+
+            if entry_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return list(self._entries[entry_key][2])
+
+    def put(
+        self,
+        key: str,
+        query: str,
+        chunks: list[str],
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> None:
+        query = normalize_query(query)
+        if query_embedding is not None:
+            query_embedding = np.array(query_embedding, dtype=np.float32)
+
+        size = len(key) + len(query) + sum(len(chunk) for chunk in chunks)
+        if query_embedding is not None:
+            size += query_embedding.nbytes
+
+        with self._lock:
+            if (key, query) in self._entries:
+                self._evict((key, query))
+
+            self._entries[(key, query)] = (
+                time.time(),
+                query_embedding,
+                tuple(chunks),
+                size,
+            )
+            self._queries.setdefault(key, set()).add(query)
+            self.size_bytes += size
+
+            while self.size_bytes > self.max_bytes and self._entries:
+                self._evict(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self, entry_key: tuple) -> None:
+        *_, size = self._entries.pop(entry_key)
+        self.size_bytes -= size
+
+        key, query = entry_key
+        queries = self._queries[key]
+        queries.discard(query)
+        if not queries:
+            del self._queries[key]
@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Iterable, Iterator, Sequence
+
+import numpy as np
+from loguru import logger
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        encode_batch: Callable[[list[str]], Sequence[np.ndarray]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = threading.Event()
+        self._worker = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        if self._closed.is_set():
+            raise RuntimeError("MicroBatcher is closed")
+
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self) -> list:
+        item = self._queue.get()
+        if item is None:
+            return []
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            if item is None:
+                self._queue.put(None)
+                break
+
+            batch.append(item)
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.encode_batch(texts)
+            except Exception as e:
+                logger.error(f"Failed to encode a batch of {len(texts)}: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+
+def plan_batches(
+    lengths: Sequence[int],
+    max_batch_tokens: int = 16384,
+    max_batch_size: int = 256,
+) -> list[np.ndarray]:
+    lengths = np.asarray(lengths, dtype=np.int64)
+    # longest first, every batch is padded to the length of its first item
+    order = np.argsort(-lengths, kind="stable")
+    batches, start = [], 0
+
+    while start < len(order):
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch_size, max_batch_tokens // longest))
+        batches.append(order[start : start + size])
+        start += size
+
+    return batches
+
+
+def encode_in_buckets(
+    encode_batch: Callable[[list[str]], np.ndarray],
+    texts: list[str],
+    lengths: Sequence[int],
+    max_batch_tokens: int = 16384,
+    max_batch_size: int = 256,
+    map_batches: Callable[..., Iterable[np.ndarray]] = map,
+) -> np.ndarray:
+    batches = plan_batches(lengths, max_batch_tokens, max_batch_size)
+    batch_texts: Iterator[list[str]] = (
+        [texts[i] for i in batch] for batch in batches
+    )
+    embeddings = None
+
+    # map_batches may hand the batches to a pool, results come back in order
+    for batch, encoded in zip(batches, map_batches(encode_batch, batch_texts)):
+        encoded = np.asarray(encoded)
+        if embeddings is None:
+            embeddings = np.empty(
+                (len(texts), encoded.shape[1]), dtype=encoded.dtype
+            )
+        embeddings[batch] = encoded
+
+    if embeddings is None:
+        return np.empty((0, 0), dtype=np.float32)
+    return embeddings
@@ -0,0 +1,139 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, created REAL, dtype TEXT, vector BLOB)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(model_name: str, prefix: Optional[str], query: str) -> str:
+        return f"{model_name}\x00{prefix or ''}\x00{normalize_query(query)}"
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and self._expired(entry[0]):
+                self._evict(key)
+                entry = None
+
+            if entry is None and self._db is not None:
+                entry = self._get_from_disk(key)
+                if entry is not None:
+                    self._insert(key, *entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # an entry bigger than max_bytes is returned but not kept
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    async def aget(self, key: str) -> Optional[np.ndarray]:
+        # sqlite reads and commits block, keep them off the event loop
+        if self._db is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    def put(self, key: str, embedding: np.ndarray) -> None:
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        created = time.time()
+
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._insert(key, created, embedding)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                    (key, created, embedding.dtype.str, embedding.tobytes()),
+                )
+                self._db.commit()
+
+    async def aput(self, key: str, embedding: np.ndarray) -> None:
+        if self._db is None:
+            return self.put(key, embedding)
+        await asyncio.to_thread(self.put, key, embedding)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _insert(self, key: str, created: float, embedding: np.ndarray):
+        self._entries[key] = (created, embedding)
+        self.size_bytes += embedding.nbytes + len(key)
+
+        while self.size_bytes > self.max_bytes and self._entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str) -> None:
+        _, embedding = self._entries.pop(key)
+        self.size_bytes -= embedding.nbytes + len(key)
+
+    def _get_from_disk(self, key: str) -> Optional[tuple]:
+        row = self._db.execute(
+            "SELECT created, dtype, vector FROM embeddings WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        created, dtype, vector = row
+        if self._expired(created):
+            self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+
+        return created, np.frombuffer(vector, dtype=dtype)
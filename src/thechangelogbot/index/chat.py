@@ -1,26 +1,30 @@
-import os
-from typing import Generator
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 
-import openai
 from loguru import logger
-from superduperdb.db.mongodb.query import Collection
-from tenacity import retry, stop_after_attempt, wait_random_exponential
-from thechangelogbot.index.database import search_mongo
+from thechangelogbot.index.answers import AnswerCache, context_key
+from thechangelogbot.index.context import (
+    ContextBuilder,
+    count_words_as_tokens,
+)
+from thechangelogbot.index.database import asearch_snippets, get_search_backend
+from thechangelogbot.index.embeddings import QueryEncoder, get_token_counter
+from thechangelogbot.index.llm import LLMBackend
+from thechangelogbot.index.memory import MemoryIndex
+from thechangelogbot.index.rerank import Reranker
 from thechangelogbot.index.snippet import Snippet
+from thechangelogbot.index.timing import record_timing
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-if not openai.api_key:
-    raise ValueError("OPENAI_API_KEY is not set")
+if TYPE_CHECKING:
+    from superduperdb.db.mongodb.query import Collection
 
 
-@retry(wait=wait_random_exponential(min=1, max=40), stop=stop_after_attempt(3))
-def get_person_response(
-    question: str,
-    context: list[Snippet],
-    speaker: str,
-    model: str = "gpt-3.5-turbo",
-) -> Generator[str, None, None]:
+def build_messages(
+    question: str, context: list[Snippet], speaker: str
+) -> list[dict]:
     system_prompt = (
         f"Your name is {speaker}. Your goal is answer a specific question from a user from your perspective."
         "You will be given some context of things you have said in the past related to the question."
@@ -31,47 +35,144 @@ def get_person_response(
     context_string = "\n".join([snippet._as_context() for snippet in context])
     user_prompt = f"CONTEXT\n---------\n{context_string}\n\nQUESTION\n--------\n{question}"
 
-    response = openai.ChatCompletion.create(
-        model=model,
-        stream=True,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=250,
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def get_answer_cache(config: dict) -> Optional[AnswerCache]:
+    cache_config = config.get("llm", {}).get("answer_cache")
+
+    if not cache_config:
+        return None
+
+    return AnswerCache(
+        max_bytes=cache_config.get("max_bytes", 16 * 1024 * 1024),
+        ttl=cache_config.get("ttl"),
+        similarity_threshold=cache_config.get("similarity_threshold"),
+    )
+
+
+def get_context_builder(config: dict) -> Optional[ContextBuilder]:
+    context_config = config.get("llm", {}).get("context")
+
+    if not context_config:
+        return None
+
+    tokenizer = context_config.get("tokenizer", "model")
+    if tokenizer not in ("model", "words"):
+        raise ValueError(
+            f"{tokenizer} is not a valid context tokenizer (must be model or words)"
+        )
+
+    return ContextBuilder(
+        count_tokens=(
+            get_token_counter(config["model"]["name"])
+            if tokenizer == "model"
+            else count_words_as_tokens
+        ),
+        max_tokens=context_config.get("max_tokens", 600),
+        max_snippet_tokens=context_config.get("max_snippet_tokens", 250),
+        candidates=context_config.get("candidates", 5),
     )
 
-    for chunk in response:
-        text = chunk["choices"][-1]["delta"].get("content", None)
-        if text:
-            yield text
+
+def use_query_embedding(
+    config: dict,
+    answer_cache: Optional[AnswerCache],
+    encoder: Optional[QueryEncoder],
+) -> bool:
+    # the memory backend already encoded the query, so this is a cache hit
+    return (
+        answer_cache is not None
+        and answer_cache.similarity_threshold is not None
+        and encoder is not None
+        and get_search_backend(config) == "memory"
+    )
 
 
-def respond_to_query(
+async def aget_person_response(
+    question: str,
+    context: list[Snippet],
+    speaker: str,
+    backend: LLMBackend,
+) -> AsyncIterator[str]:
+    start_time, first = time.perf_counter(), True
+    async for text in backend.astream(
+        build_messages(question, context, speaker)
+    ):
+        if first:
+            record_timing(None, "llm_first_token", start_time)
+            first = False
+        yield text
+    record_timing(None, "llm_stream", start_time)
+
+
+async def arespond_to_query(
     query: str,
     speaker: str,
     db,
     collection: Collection,
     config: dict,
+    backend: LLMBackend,
     limit: int = 3,
-) -> Generator[str, None, None]:
-    logger.info("Starting to yield...")
-
-    index_id = config["mongodb"]["index_id"]
-    list_of_filters = {"speaker": speaker}
-
-    results = list(
-        search_mongo(
-            limit=limit,
-            query=query,
-            query_prefix=config["model"]["prefix"].get("querying", None),
-            db=db,
-            index_id=index_id,
-            collection=collection,
-            list_of_filters=list_of_filters,
-        )
+    memory_index: Optional[MemoryIndex] = None,
+    encoder: Optional[QueryEncoder] = None,
+    answer_cache: Optional[AnswerCache] = None,
+    reranker: Optional[Reranker] = None,
+    context_builder: Optional[ContextBuilder] = None,
+    timings: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    timings = {} if timings is None else timings
+    results = await asearch_snippets(
+        config=config,
+        query=query,
+        db=db,
+        collection=collection,
+        memory_index=memory_index,
+        list_of_filters={"speaker": speaker},
+        limit=context_builder.candidates if context_builder else limit,
+        encoder=encoder,
+        reranker=reranker,
+        timings=timings,
     )
+    logger.debug(f"Context search timings: {timings}")
 
-    yield from get_person_response(
-        question=query, context=results, speaker=speaker
+    # pack the best snippets into the prompt's token budget
+    if context_builder is not None:
+        results = await asyncio.to_thread(
+            context_builder.build, query, results
+        )
+    timings["context"] = [snippet._hash for snippet in results]
+
+    if answer_cache is None:
+        async for text in aget_person_response(
+            question=query, context=results, speaker=speaker, backend=backend
+        ):
+            yield text
+        return
+
+    key = context_key(speaker, results)
+    query_embedding = (
+        await encoder.aencode(query)
+        if use_query_embedding(config, answer_cache, encoder)
+        else None
     )
+
+    chunks = answer_cache.get(key, query, query_embedding)
+    if chunks is not None:
+        logger.info(f"Answer cache hit: {answer_cache.stats()}")
+        for text in chunks:
+            yield text
+        return
+
+    # only complete answers are cached, a dropped client skips the put
+    chunks = []
+    async for text in aget_person_response(
+        question=query, context=results, speaker=speaker, backend=backend
+    ):
+        chunks.append(text)
+        yield text
+
+    answer_cache.put(key, query, chunks, query_embedding)
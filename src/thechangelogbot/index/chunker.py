@@ -0,0 +1,113 @@
+from typing import Iterable, Iterator, Optional
+
+from thechangelogbot.index.context import split_sentences
+from thechangelogbot.index.snippet import Snippet
+
+# chunks of the same turn compete for the same result slots, fetch more
+# of them before collapsing so that limit distinct turns remain
+COLLAPSE_OVERFETCH = 3
+
+
+def check_chunking(max_words: int, overlap_words: int) -> None:
+    if max_words <= 0 or not 0 <= overlap_words < max_words:
+        raise ValueError(
+            f"Chunks need 0 <= overlap_words ({overlap_words}) < max_words ({max_words})"
+        )
+
+
+def chunk_text(text: str, max_words: int, overlap_words: int) -> list[str]:
+    check_chunking(max_words, overlap_words)
+
+    # sentences longer than a whole chunk are cut at max_words
+    pieces = []
+    for sentence in split_sentences(text):
+        words = sentence.split()
+        for i in range(0, len(words), max_words):
+            pieces.append(words[i : i + max_words])
+
+    chunks, start = [], 0
+    while start < len(pieces):
+        end, used = start, 0
+        while end < len(pieces) and used + len(pieces[end]) <= max_words:
+            used += len(pieces[end])
+            end += 1
+
+        chunks.append(
+            " ".join(w for piece in pieces[start:end] for w in piece)
+        )
+        if end == len(pieces):
+            break
+
+        # the next chunk repeats the trailing sentences that fit in the
+        # overlap, but always moves forward by at least one sentence
+        next_start, overlap = end, 0
+        while (
+            next_start - 1 > start
+            and overlap + len(pieces[next_start - 1]) <= overlap_words
+        ):
+            next_start -= 1
+            overlap += len(pieces[next_start])
+        start = next_start
+
+    return chunks
+
+
+def chunk_snippet(
+    snippet: Snippet, max_words: int = 200, overlap_words: int = 40
+) -> list[Snippet]:
+    if snippet.word_count <= max_words:
+        return [snippet]
+
+    return [
+        Snippet(
+            podcast=snippet.podcast,
+            episode_number=snippet.episode_number,
+            text=text,
+            speaker=snippet.speaker,
+            parent_hash=snippet._hash,
+        )
+        for text in chunk_text(snippet.text, max_words, overlap_words)
+    ]
+
+
+def chunk_snippets(
+    snippets: Iterable[Snippet], chunking: Optional[dict]
+) -> list[Snippet]:
+    if not chunking or chunking.get("max_words") is None:
+        return list(snippets)
+
+    return [
+        chunk
+        for snippet in snippets
+        for chunk in chunk_snippet(
+            snippet,
+            max_words=chunking["max_words"],
+            overlap_words=chunking.get("overlap_words", 40),
+        )
+    ]
+
+
+def parent_key(snippet: Snippet) -> str:
+    return snippet.parent_hash or snippet._hash
+
+
+def collapse_chunks(
+    snippets: Iterable[Snippet], limit: int
+) -> Iterator[Snippet]:
+    # results come best first, keep the best chunk of every turn
+    seen: set[str] = set()
+    for snippet in snippets:
+        if len(seen) >= limit:
+            return
+
+        key = parent_key(snippet)
+        if key in seen:
+            continue
+
+        seen.add(key)
+        yield snippet
+
+
+def get_collapse_overfetch(config: dict) -> int:
+    chunking = config.get("indexing", {}).get("chunking") or {}
+    return COLLAPSE_OVERFETCH if chunking.get("max_words") else 1
@@ -0,0 +1,127 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Callable, Optional
+
+from thechangelogbot.index.lexical import tokenize
+from thechangelogbot.index.snippet import Snippet
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+MIN_SNIPPET_TOKENS = 32
+ELLIPSIS = "..."
+
+
+def split_sentences(text: str) -> list[str]:
+    return [sentence for sentence in SENTENCE_PATTERN.split(text) if sentence]
+
+
+def count_words_as_tokens(texts: list[str]) -> list[int]:
+    # english averages about 4 tokens for every 3 words
+    return [(4 * len(text.split()) + 2) // 3 for text in texts]
+
+
+class ContextBuilder:
+    def __init__(
+        self,
+        count_tokens: Callable[[list[str]], list[int]] = count_words_as_tokens,
+        max_tokens: int = 600,
+        max_snippet_tokens: int = 250,
+        candidates: int = 5,
+        cache_size: int = 65536,
+    ):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.max_snippet_tokens = max_snippet_tokens
+        self.candidates = candidates
+        self.cache_size = cache_size
+        self._sentences: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sentences(self, snippet: Snippet) -> tuple[list[str], list[int]]:
+        with self._lock:
+            entry = self._sentences.get(snippet._hash)
+            if entry is not None:
+                self._sentences.move_to_end(snippet._hash)
+                return entry
+
+        sentences = split_sentences(snippet.text)
+        entry = (sentences, self.count_tokens(sentences))
+
+        with self._lock:
+            self._sentences[snippet._hash] = entry
+            if len(self._sentences) > self.cache_size:
+                self._sentences.popitem(last=False)
+
+        return entry
+
+    def header_tokens(self, snippet: Snippet) -> int:
+        header = snippet._as_context()[: -len(snippet.text) - 1]
+        return self.count_tokens([header])[0]
+
+    def trim(
+        self, query: str, snippet: Snippet, max_tokens: int
+    ) -> Optional[Snippet]:
+        sentences, sentence_tokens = self.sentences(snippet)
+        max_tokens -= 2 * self.count_tokens([ELLIPSIS])[0]
+        query_terms = set(tokenize(query))
+        overlaps = [
+            len(query_terms.intersection(tokenize(sentence)))
+            for sentence in sentences
+        ]
+
+        # grow a window around the sentence sharing most terms with the query
+        best = max(range(len(sentences)), key=lambda i: (overlaps[i], -i))
+        if sentence_tokens[best] > max_tokens:
+            return None
+
+        start, end, used = best, best + 1, sentence_tokens[best]
+        while True:
+            grown = False
+            for i in (end, start - 1):
+                if (
+                    0 <= i < len(sentences)
+                    and used + sentence_tokens[i] <= max_tokens
+                ):
+                    used += sentence_tokens[i]
+                    start, end = min(start, i), max(end, i + 1)
+                    grown = True
+            if not grown:
+                break
+
+        text = " ".join(sentences[start:end])
+        if start > 0:
+            text = f"{ELLIPSIS} {text}"
+        if end < len(sentences):
+            text = f"{text} {ELLIPSIS}"
+
+        trimmed = replace(snippet, text=text)
+        trimmed._hash = snippet._hash
+        return trimmed
+
+    def build(self, query: str, snippets: list[Snippet]) -> list[Snippet]:
+        context, used = [], 0
+
+        for snippet in snippets:
+            remaining = self.max_tokens - used
+            if remaining < MIN_SNIPPET_TOKENS:
+                break
+
+            header_tokens = self.header_tokens(snippet)
+            text_budget = (
+                min(self.max_snippet_tokens, remaining) - header_tokens
+            )
+            text_tokens = sum(self.sentences(snippet)[1])
+
+            if text_tokens > text_budget:
+                if text_budget < MIN_SNIPPET_TOKENS:
+                    continue
+                snippet = self.trim(query, snippet, text_budget)
+                if snippet is None:
+                    continue
+                text_tokens = self.count_tokens([snippet.text])[0]
+
+            context.append(snippet)
+            used += header_tokens + text_tokens
+
+        return context
@@ -1,23 +1,43 @@
+from __future__ import annotations
+
+import asyncio
 import os
 import time
 from functools import cache
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
 
-import sentence_transformers
-import superduperdb
-import torch
+import numpy as np
 from loguru import logger
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 from pymongo.server_api import ServerApi
-from superduperdb.container.document import Document
-from superduperdb.container.listener import Listener
-
-# from superduperdb.container.model import Model
-from superduperdb.container.vector_index import VectorIndex
-from superduperdb.db.mongodb.query import Collection
-from superduperdb.ext.numpy.array import array
-from superduperdb.ext.sentence_transformer import SentenceTransformer
+from tenacity import retry, stop_after_attempt, wait_random_exponential
+from thechangelogbot.index.ann import build_ann_index
+from thechangelogbot.index.cache import EmbeddingCache
+from thechangelogbot.index.chunker import (
+    collapse_chunks,
+    get_collapse_overfetch,
+)
+from thechangelogbot.index.embeddings import QueryEncoder, get_query_encoder
+from thechangelogbot.index.filters import INDEXED_FIELDS, check_filter_mode
+from thechangelogbot.index.memory import MemoryIndex, check_search_mode
+from thechangelogbot.index.quantization import quantize
+from thechangelogbot.index.rerank import Reranker
 from thechangelogbot.index.snippet import Snippet
+from thechangelogbot.index.timing import record_timing
+from tqdm import tqdm
+
+# superduperdb and torch are imported when a connection or model is made
+if TYPE_CHECKING:
+    import superduperdb
+    from superduperdb.db.mongodb.query import Collection
+
+MODEL_IDENTIFIER = "my-model"
+TOMBSTONE = "_tombstone"
+LIVE_FILTER = {TOMBSTONE: {"$ne": True}}
+# unfiltered vector searches skip tombstoned hits after the search
+TOMBSTONE_OVERFETCH = 2
+SEARCH_BACKENDS = ("mongo", "memory")
 
 
 def get_mongo_client(
@@ -41,6 +61,9 @@ def get_mongo_client(
 
 
 def get_superduperdb_components(config: dict) -> tuple:
+    import superduperdb
+    from superduperdb.db.mongodb.query import Collection
+
     mongodb_host = config["mongodb"]["host"]
     mongodb_port = config["mongodb"]["port"]
     mongodb_collection = config["mongodb"]["collection"]
@@ -63,6 +86,13 @@ def prepare_mongo(
     index_id: str,
     key: str,
 ) -> None:
+    import sentence_transformers
+    import torch
+    from superduperdb.container.listener import Listener
+    from superduperdb.container.vector_index import VectorIndex
+    from superduperdb.ext.numpy.array import array
+    from superduperdb.ext.sentence_transformer import SentenceTransformer
+
     device = (
         "cuda"
         if torch.cuda.is_available()
@@ -74,7 +104,7 @@ def prepare_mongo(
     logger.info(f"Using device {device} for indexing.")
 
     model = SentenceTransformer(
-        identifier="my-model",
+        identifier=MODEL_IDENTIFIER,
         object=sentence_transformers.SentenceTransformer(
             model_id, device=device
         ),
@@ -105,23 +135,103 @@ def prepare_mongo(
     logger.info("Prepared mongodb.")
 
 
-def upload_to_mongo(db, collection: Collection, data: list[dict]):
-    data = [Document(r) for r in data]
-    db.execute(collection.insert_many(data))
+def create_filter_indexes(client: MongoClient, collection_name: str) -> None:
+    collection = client.documents[collection_name]
 
-    logger.info(f"Uploaded {len(data)} snippets to mongodb")
+    for field in INDEXED_FIELDS:
+        collection.create_index(field)
 
+    logger.info(f"Created indexes on {INDEXED_FIELDS}")
 
-def get_uploaded_hashes(db, collection: Collection):
-    return [
-        doc["_hash"] for doc in db.execute(collection.find({}, {"_hash": 1}))
-    ]
+
+def create_hash_index(client: MongoClient, collection_name: str) -> None:
+    try:
+        client.documents[collection_name].create_index("_hash", unique=True)
+    except OperationFailure as e:
+        logger.error(e)
+        logger.warning("Failed to create a unique index on _hash.")
+
+
+def new_records(data: list[dict], existing_hashes: set[str]) -> list[dict]:
+    # a chunk can repeat a snippet, the unique index would reject the copy
+    records: dict[str, dict] = {}
+    for record in data:
+        if record["_hash"] not in existing_hashes:
+            records.setdefault(record["_hash"], record)
+    return list(records.values())
+
+
+@retry(wait=wait_random_exponential(min=1, max=40), stop=stop_after_attempt(3))
+def insert_new_snippets(db, collection: Collection, data: list[dict]) -> int:
+    from superduperdb.container.document import Document
+
+    # checking again on every attempt makes retries of a partial insert safe
+    existing_hashes = get_uploaded_hashes(
+        db, collection, hashes=[r["_hash"] for r in data]
+    )
+    data = [Document(r) for r in new_records(data, existing_hashes)]
+
+    if data:
+        db.execute(collection.insert_many(data))
+
+    return len(data)
+
+
+def upload_to_mongo(
+    db, collection: Collection, data: list[dict], batch_size: int = 500
+) -> int:
+    uploaded = 0
+
+    for i in tqdm(range(0, len(data), batch_size), desc="Uploading"):
+        uploaded += insert_new_snippets(
+            db, collection, data[i : i + batch_size]
+        )
+
+    logger.info(f"Uploaded {uploaded} snippets to mongodb")
+    return uploaded
+
+
+def reconcile_episode(
+    client: MongoClient,
+    collection_name: str,
+    podcast: str,
+    episode_number: int,
+    hashes: set[str],
+) -> int:
+    collection = client.documents[collection_name]
+    episode_filter = {"podcast": podcast, "episode_number": episode_number}
+
+    collection.update_many(
+        {**episode_filter, "_hash": {"$in": list(hashes)}, TOMBSTONE: True},
+        {"$unset": {TOMBSTONE: ""}},
+    )
+    result = collection.update_many(
+        {
+            **episode_filter,
+            "_hash": {"$nin": list(hashes)},
+            TOMBSTONE: {"$ne": True},
+        },
+        {"$set": {TOMBSTONE: True}},
+    )
+    return result.modified_count
+
+
+def get_uploaded_hashes(
+    db, collection: Collection, hashes: Iterable[str]
+) -> set[str]:
+    hash_filter = {"_hash": {"$in": list(hashes)}}
+    return {
+        doc["_hash"]
+        for doc in db.execute(collection.find(hash_filter, {"_hash": 1}))
+    }
 
 
 @cache
 def get_speakers(
     database: superduperdb.superduper, collection_name
 ) -> list[str]:
+    from superduperdb.db.mongodb.query import Collection
+
     collection = Collection(name=collection_name)
     unique_speakers = {
         s["speaker"]
@@ -134,6 +244,481 @@ def get_speakers(
     return unique_speakers
 
 
+def as_snippet(doc_dict: dict) -> Snippet:
+    doc_dict = {
+        k: v
+        for k, v in doc_dict.items()
+        if k in Snippet.__annotations__.keys()
+    }
+    snippet = Snippet(**doc_dict)
+    # __post_init__ hashes the already cleaned text, keep the original
+    snippet._hash = doc_dict.get("_hash") or snippet._hash
+    return snippet
+
+
+def get_live_snippets(db, collection: Collection) -> Iterator[Snippet]:
+    # the snippet fields only, not the listener outputs
+    projection = {field: 1 for field in Snippet.__annotations__}
+    for doc in db.execute(collection.find(LIVE_FILTER, projection)):
+        yield as_snippet(doc.unpack())
+
+
+def get_listener_embeddings(
+    db,
+    collection: Collection,
+    hashes: list[str],
+    key: str = "text",
+    model_identifier: str = MODEL_IDENTIFIER,
+) -> dict[str, np.ndarray]:
+    output = f"_outputs.{key}.{model_identifier}"
+    embeddings = {}
+
+    for doc in db.execute(
+        collection.find({"_hash": {"$in": hashes}}, {"_hash": 1, output: 1})
+    ):
+        doc_dict = doc.unpack()
+        embedding = (
+            doc_dict.get("_outputs", {}).get(key, {}).get(model_identifier)
+        )
+        if embedding is not None:
+            embeddings[doc_dict["_hash"]] = embedding
+
+    return embeddings
+
+
+def get_embedded_snippets(
+    db,
+    collection: Collection,
+    key: str = "text",
+    model_identifier: str = MODEL_IDENTIFIER,
+) -> Iterator[tuple[Snippet, np.ndarray]]:
+    for doc in db.execute(collection.find(LIVE_FILTER)):
+        doc_dict = doc.unpack()
+        embedding = (
+            doc_dict.get("_outputs", {}).get(key, {}).get(model_identifier)
+        )
+
+        if embedding is None:
+            continue
+
+        yield as_snippet(doc_dict), embedding
+
+
+def load_memory_index(
+    db,
+    collection: Collection,
+    dtype: str = "float32",
+    ann: Optional[dict] = None,
+    quantization: Optional[dict] = None,
+) -> MemoryIndex:
+    start_time = time.time()
+    snippets, embeddings = [], []
+
+    for snippet, embedding in get_embedded_snippets(db, collection):
+        snippets.append(snippet)
+        embeddings.append(embedding)
+
+    index = MemoryIndex(
+        embeddings=np.vstack(embeddings), snippets=snippets, dtype=dtype
+    )
+    index.ann_index = build_ann_index(index.embeddings, ann)
+    index.quantized = quantize(index.embeddings, quantization)
+    logger.info(
+        f"Loaded {len(index)} snippets into memory "
+        f"in {time.time() - start_time:.2f} seconds"
+    )
+    return index
+
+
+def get_query_cache(config: dict) -> Optional[EmbeddingCache]:
+    cache_config = config.get("search", {}).get("query_cache")
+
+    if not cache_config:
+        return None
+
+    return EmbeddingCache(
+        max_bytes=cache_config.get("max_bytes", 64 * 1024 * 1024),
+        ttl=cache_config.get("ttl"),
+        path=cache_config.get("path"),
+    )
+
+
+def get_nprobe(config: dict) -> Optional[int]:
+    return (config.get("search", {}).get("ann") or {}).get("nprobe")
+
+
+def get_search_backend(config: dict) -> str:
+    backend = config.get("search", {}).get("backend", "mongo")
+
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(
+            f"{backend} is not a valid search backend (must be in {SEARCH_BACKENDS})"
+        )
+
+    return backend
+
+
+def get_snapshot_directory(config: dict) -> Optional[str]:
+    # only the memory backend reads snapshots, mongo searches atlas directly
+    if get_search_backend(config) != "memory":
+        return None
+
+    return config["search"].get("snapshot_directory")
+
+
+def check_filter_fields(list_of_filters: Optional[dict[str, str]]) -> None:
+    if list_of_filters is None:
+        return
+
+    filtering_fields = [a for a in Snippet.__annotations__.keys()]
+
+    for filter_key in list_of_filters.keys():
+        assert (
+            filter_key in filtering_fields
+        ), f"{filter_key} is not a valid filter field (must be in {filtering_fields})"
+
+
+def check_filter_values(
+    list_of_filters: Optional[dict[str, str]], filter_mode: str = "exact"
+) -> None:
+    if list_of_filters is None or filter_mode != "exact":
+        return
+
+    # mongo compares integer fields as integers
+    for filter_key, filter_value in list_of_filters.items():
+        if Snippet.__annotations__.get(filter_key) is int:
+            try:
+                int(filter_value)
+            except ValueError:
+                raise ValueError(
+                    f"{filter_key} must be an integer, got {filter_value!r}"
+                )
+
+
+def search_memory(
+    query: str,
+    index: MemoryIndex,
+    encoder: QueryEncoder,
+    limit: int = 4,
+    list_of_filters: Optional[dict[str, str]] = None,
+    filter_mode: str = "exact",
+    mode: str = "vector",
+    nprobe: Optional[int] = None,
+) -> Iterator[Snippet]:
+    check_filter_mode(filter_mode)
+    check_search_mode(mode)
+    check_filter_fields(list_of_filters)
+
+    query_embedding = encoder.encode(query) if mode != "lexical" else None
+    yield from index.search(
+        query_embedding,
+        limit=limit,
+        list_of_filters=list_of_filters,
+        filter_mode=filter_mode,
+        query=query,
+        mode=mode,
+        nprobe=nprobe,
+    )
+
+
+def check_mongo_search_mode(mode: str) -> None:
+    if mode != "vector":
+        raise ValueError(
+            f"{mode} search needs the memory search backend, mongo only supports vector search"
+        )
+
+
+def search_snippets(
+    config: dict,
+    query: str,
+    db=None,
+    collection: Optional[Collection] = None,
+    memory_index: Optional[MemoryIndex] = None,
+    list_of_filters: Optional[dict[str, str]] = None,
+    filter_mode: str = "exact",
+    limit: int = 10,
+    encoder: Optional[QueryEncoder] = None,
+    mode: str = "vector",
+    reranker: Optional[Reranker] = None,
+    timings: Optional[dict] = None,
+) -> Iterator[Snippet]:
+    query_prefix = config["model"]["prefix"].get("querying", None)
+    overfetch = get_collapse_overfetch(config)
+
+    if reranker is not None:
+        start_time = time.perf_counter()
+        candidates = list(
+            search_snippets(
+                config=config,
+                query=query,
+                db=db,
+                collection=collection,
+                memory_index=memory_index,
+                list_of_filters=list_of_filters,
+                filter_mode=filter_mode,
+                limit=max(limit, reranker.candidates),
+                encoder=encoder,
+                mode=mode,
+            )
+        )
+        elapsed_ms = record_timing(timings, "retrieve", start_time)
+        return iter(
+            reranker.rerank(
+                query,
+                candidates,
+                limit,
+                elapsed_ms=elapsed_ms,
+                timings=timings,
+            )
+        )
+
+    if get_search_backend(config) == "memory":
+        if memory_index is None:
+            raise ValueError("memory_index must be provided for memory search")
+
+        if encoder is None:
+            encoder = get_query_encoder(config["model"]["name"], query_prefix)
+
+        results = search_memory(
+            query=query,
+            index=memory_index,
+            encoder=encoder,
+            limit=limit * overfetch,
+            list_of_filters=list_of_filters,
+            filter_mode=filter_mode,
+            mode=mode,
+            nprobe=get_nprobe(config),
+        )
+        return collapse_chunks(results, limit)
+
+    check_mongo_search_mode(mode)
+    results = search_mongo(
+        limit=limit * overfetch,
+        query=query,
+        query_prefix=query_prefix,
+        db=db,
+        index_id=config["mongodb"]["index_id"],
+        collection=collection,
+        list_of_filters=list_of_filters,
+        filter_mode=filter_mode,
+    )
+    return collapse_chunks(results, limit)
+
+
+async def asearch_snippets(
+    config: dict,
+    query: str,
+    db=None,
+    collection: Optional[Collection] = None,
+    memory_index: Optional[MemoryIndex] = None,
+    list_of_filters: Optional[dict[str, str]] = None,
+    filter_mode: str = "exact",
+    limit: int = 10,
+    encoder: Optional[QueryEncoder] = None,
+    mode: str = "vector",
+    reranker: Optional[Reranker] = None,
+    timings: Optional[dict] = None,
+) -> list[Snippet]:
+    if reranker is not None:
+        start_time = time.perf_counter()
+        candidates = await asearch_snippets(
+            config=config,
+            query=query,
+            db=db,
+            collection=collection,
+            memory_index=memory_index,
+            list_of_filters=list_of_filters,
+            filter_mode=filter_mode,
+            limit=max(limit, reranker.candidates),
+            encoder=encoder,
+            mode=mode,
+            timings=timings,
+        )
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        return await asyncio.to_thread(
+            reranker.rerank,
+            query,
+            candidates,
+            limit,
+            elapsed_ms=elapsed_ms,
+            timings=timings,
+        )
+
+    start_time = time.perf_counter()
+    if get_search_backend(config) == "memory":
+        if memory_index is None:
+            raise ValueError("memory_index must be provided for memory search")
+
+        if encoder is None:
+            encoder = get_query_encoder(
+                config["model"]["name"],
+                config["model"]["prefix"].get("querying", None),
+            )
+
+        check_filter_mode(filter_mode)
+        check_search_mode(mode)
+        check_filter_fields(list_of_filters)
+
+        query_embedding = (
+            await encoder.aencode(query) if mode != "lexical" else None
+        )
+        record_timing(timings, "encode", start_time)
+
+        start_time = time.perf_counter()
+        results = await asyncio.to_thread(
+            lambda: list(
+                collapse_chunks(
+                    memory_index.search(
+                        query_embedding,
+                        limit=limit * get_collapse_overfetch(config),
+                        list_of_filters=list_of_filters,
+                        filter_mode=filter_mode,
+                        query=query,
+                        mode=mode,
+                        nprobe=get_nprobe(config),
+                    ),
+                    limit,
+                )
+            )
+        )
+        record_timing(timings, "retrieve", start_time)
+        return results
+
+    check_mongo_search_mode(mode)
+
+    # pymongo has no asyncio api, keep the event loop free while it blocks
+    results = await asyncio.to_thread(
+        lambda: list(
+            search_snippets(
+                config=config,
+                query=query,
+                db=db,
+                collection=collection,
+                list_of_filters=list_of_filters,
+                filter_mode=filter_mode,
+                limit=limit,
+            )
+        )
+    )
+    record_timing(timings, "retrieve", start_time)
+    return results
+
+
+def search_memory_batch(
+    index: MemoryIndex,
+    searches: list[dict],
+    query_embeddings: dict[int, np.ndarray],
+    nprobe: Optional[int] = None,
+    overfetch: int = 1,
+) -> list[list[Snippet]]:
+    results: list = [None] * len(searches)
+
+    # plain vector searches over the exact scan share one matrix product
+    batched = [
+        i
+        for i, search in enumerate(searches)
+        if search.get("mode", "vector") == "vector"
+        and not search.get("list_of_filters")
+        and index.ann_index is None
+        and index.quantized is None
+    ]
+    if batched:
+        rows = index.batch_vector_rows(
+            np.vstack([query_embeddings[i] for i in batched]),
+            limit=max(searches[i].get("limit", 10) for i in batched)
+            * overfetch,
+        )
+        for i, query_rows in zip(batched, rows):
+            results[i] = list(
+                collapse_chunks(
+                    (index.snippets[row] for row in query_rows),
+                    searches[i].get("limit", 10),
+                )
+            )
+
+    for i, search in enumerate(searches):
+        if results[i] is not None:
+            continue
+
+        results[i] = list(
+            collapse_chunks(
+                index.search(
+                    query_embeddings.get(i),
+                    limit=search.get("limit", 10) * overfetch,
+                    list_of_filters=search.get("list_of_filters"),
+                    filter_mode=search.get("filter_mode", "exact"),
+                    query=search["query"],
+                    mode=search.get("mode", "vector"),
+                    nprobe=nprobe,
+                ),
+                search.get("limit", 10),
+            )
+        )
+
+    return results
+
+
+async def asearch_snippets_batch(
+    config: dict,
+    searches: list[dict],
+    db=None,
+    collection: Optional[Collection] = None,
+    memory_index: Optional[MemoryIndex] = None,
+    encoder: Optional[QueryEncoder] = None,
+    timings: Optional[dict] = None,
+) -> list[list[Snippet]]:
+    if get_search_backend(config) != "memory":
+        # superduperdb runs one vector search per query, overlap them instead
+        start_time = time.perf_counter()
+        results = await asyncio.gather(
+            *[
+                asearch_snippets(
+                    config=config, db=db, collection=collection, **search
+                )
+                for search in searches
+            ]
+        )
+        record_timing(timings, "retrieve", start_time)
+        return list(results)
+
+    if memory_index is None:
+        raise ValueError("memory_index must be provided for memory search")
+
+    if encoder is None:
+        encoder = get_query_encoder(
+            config["model"]["name"],
+            config["model"]["prefix"].get("querying", None),
+        )
+
+    for search in searches:
+        check_filter_mode(search.get("filter_mode", "exact"))
+        check_search_mode(search.get("mode", "vector"))
+        check_filter_fields(search.get("list_of_filters"))
+
+    start_time = time.perf_counter()
+    to_encode = [
+        i
+        for i, search in enumerate(searches)
+        if search.get("mode", "vector") != "lexical"
+    ]
+    embeddings = await asyncio.to_thread(
+        encoder.encode_many, [searches[i]["query"] for i in to_encode]
+    )
+    record_timing(timings, "encode", start_time)
+
+    start_time = time.perf_counter()
+    results = await asyncio.to_thread(
+        search_memory_batch,
+        memory_index,
+        searches,
+        dict(zip(to_encode, embeddings)),
+        get_nprobe(config),
+        get_collapse_overfetch(config),
+    )
+    record_timing(timings, "retrieve", start_time)
+    return results
+
+
 def search_mongo(
     query: str,
     db,
@@ -142,48 +727,66 @@ def search_mongo(
     query_prefix: Optional[str] = None,
     limit: int = 4,
     list_of_filters: Optional[dict[str, str]] = None,
+    filter_mode: str = "exact",
 ) -> list[Snippet]:
+    check_filter_mode(filter_mode)
     q_filter = None
 
     if query_prefix is not None:
-        logger.info(f"Using query prefix '{query_prefix}'")
+        logger.debug(f"Using query prefix '{query_prefix}'")
         query = query_prefix + query
 
     if list_of_filters is not None:
+        check_filter_values(list_of_filters, filter_mode)
         filtering_fields = [a for a in Snippet.__annotations__.keys()]
-        q_filter = dict()
+        q_filter = dict(LIVE_FILTER)
 
         for filter_key, filter_value in list_of_filters.items():
             assert (
                 filter_key in filtering_fields
             ), f"{filter_key} is not a valid filter field (must be in {filtering_fields})"
 
-            q_filter[filter_key] = {"$regex": filter_value}
+            if filter_mode == "regex":
+                q_filter[filter_key] = {"$regex": filter_value}
+            elif Snippet.__annotations__[filter_key] is int:
+                q_filter[filter_key] = int(filter_value)
+            else:
+                q_filter[filter_key] = filter_value
 
-    start_time = time.time()
+    # superduperdb encodes the query and runs the vector search up front
+    start_time = time.perf_counter()
     if q_filter is not None:
-        logger.info(f"Filtering by {q_filter}")
+        logger.debug(f"Filtering by {q_filter}")
         cur = db.execute(
             collection.find(q_filter).like(
                 {"text": query}, n=limit, vector_index=index_id
             )
         )
     else:
+        # find().like() only searches the first ids the filter returns
         cur = db.execute(
-            collection.like({"text": query}, n=limit, vector_index=index_id)
+            collection.like(
+                {"text": query},
+                n=limit * TOMBSTONE_OVERFETCH,
+                vector_index=index_id,
+            )
         )
+    record_timing(None, "vector_search", start_time)
 
+    returned = 0
     for doc in cur:
+        if returned >= limit:
+            break
+
+        start_time = time.perf_counter()
         doc_dict = doc.unpack()
-        doc_dict = {
-            k: v
-            for k, v in doc_dict.items()
-            if k in Snippet.__annotations__.keys()
-        }
-        yield Snippet(**doc_dict)
+        record_timing(None, "unpack", start_time)
+
+        if doc_dict.get(TOMBSTONE):
+            continue
 
-    end_time = time.time()
-    logger.info(f"Query took {end_time - start_time} seconds")
+        returned += 1
+        yield as_snippet(doc_dict)
 
 
 def search_database(
@@ -192,11 +795,14 @@ def search_database(
     initialize: bool = True,
     db=None,
     collection: Optional[Collection] = None,
+    memory_index: Optional[MemoryIndex] = None,
     list_of_filters: Optional[dict[str, str]] = None,
+    filter_mode: str = "exact",
     limit: int = 10,
+    encoder: Optional[QueryEncoder] = None,
+    mode: str = "vector",
+    reranker: Optional[Reranker] = None,
 ) -> list[Snippet]:
-    index_id = config["mongodb"]["index_id"]
-
     if initialize is False and db is None:
         raise ValueError("db must be provided if initialize is False")
 
@@ -210,15 +816,28 @@ def search_database(
             )
         db, collection = get_superduperdb_components(config)
 
+        if get_search_backend(config) == "memory" and memory_index is None:
+            memory_index = load_memory_index(
+                db,
+                collection,
+                dtype=config["search"].get("dtype", "float32"),
+                ann=config["search"].get("ann"),
+                quantization=config["search"].get("quantization"),
+            )
+
     results = list(
-        search_mongo(
-            limit=limit,
+        search_snippets(
+            config=config,
             query=query,
-            query_prefix=config["model"]["prefix"].get("querying", None),
             db=db,
-            index_id=index_id,
             collection=collection,
+            memory_index=memory_index,
             list_of_filters=list_of_filters,
+            filter_mode=filter_mode,
+            limit=limit,
+            encoder=encoder,
+            mode=mode,
+            reranker=reranker,
         )
     )
     return results
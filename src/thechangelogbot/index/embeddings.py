@@ -1,8 +1,48 @@
-from typing import Any, Iterator
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache, partial
+from typing import TYPE_CHECKING, Callable, Optional
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
+from thechangelogbot.index.batching import MicroBatcher, encode_in_buckets
+from thechangelogbot.index.cache import EmbeddingCache, normalize_query
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+@cache
+def get_encoder(model_name: str) -> SentenceTransformer:
+    # torch takes seconds to import, only load it once a model is needed
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+@cache
+def get_tokenizer(model_name: str):
+    # counting tokens needs the tokenizer files, not the model weights
+    from transformers import AutoTokenizer
+
+    # sentence-transformers resolves bare model names in its own namespace
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+    return AutoTokenizer.from_pretrained(model_name)
+
+
+def get_token_counter(model_name: str) -> Callable[[list[str]], list[int]]:
+    def count_tokens(texts: list[str]) -> list[int]:
+        if not texts:
+            return []
+        tokenizer = get_tokenizer(model_name)
+        input_ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in input_ids]
+
+    return count_tokens
 
 
 def embed_query(
@@ -19,19 +59,269 @@ def embed_query(
     )[-1]
 
 
-def embed_snippets(
-    snippets: list,
+def embed_queries(
+    queries: list[str],
     model: SentenceTransformer,
     prefix: str,
-    batch_size: int = 700,
     normalize_embeddings: bool = True,
-) -> Iterator[np.ndarray | Any]:
-    input_texts = [f"{prefix} {snippet.text}" for snippet in snippets]
-
-    for i in tqdm(range(0, len(input_texts), batch_size)):
-        batch = input_texts[i : i + batch_size]
-        batch_embeddings = model.encode(
-            batch,
-            normalize_embeddings=normalize_embeddings,
+) -> np.ndarray:
+    return model.encode(
+        [f"{prefix}{query}" for query in queries],
+        batch_size=max(len(queries), 1),
+        normalize_embeddings=normalize_embeddings,
+    )
+
+
+class QueryEncoder:
+    def __init__(
+        self,
+        model_name: str,
+        prefix: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        normalize_embeddings: bool = True,
+        max_batch_size: int = 1,
+        max_wait_ms: float = 5.0,
+    ):
+        self.model_name = model_name
+        self.prefix = prefix or ""
+        self.cache = cache
+        self.normalize_embeddings = normalize_embeddings
+        # concurrent callers share one forward pass instead of one each
+        self.batcher = (
+            MicroBatcher(
+                self.encode_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+            )
+            if max_batch_size > 1
+            else None
+        )
+
+    @property
+    def model(self) -> SentenceTransformer:
+        return get_encoder(self.model_name)
+
+    def encode(self, query: str) -> np.ndarray:
+        query = normalize_query(query)
+
+        if self.cache is None:
+            return self._encode(query)
+
+        key = self.cache.key(self.model_name, self.prefix, query)
+        embedding = self.cache.get(key)
+
+        if embedding is None:
+            embedding = self._encode(query)
+            self.cache.put(key, embedding)
+
+        return embedding
+
+    async def aencode(self, query: str) -> np.ndarray:
+        query = normalize_query(query)
+        key = EmbeddingCache.key(self.model_name, self.prefix, query)
+
+        if self.cache is not None:
+            embedding = await self.cache.aget(key)
+            if embedding is not None:
+                return embedding
+
+        # wait on the batcher's future instead of holding a worker thread
+        if self.batcher is not None:
+            embedding = await asyncio.wrap_future(self.batcher.submit(query))
+        else:
+            embedding = await asyncio.to_thread(self._encode, query)
+
+        if self.cache is not None:
+            await self.cache.aput(key, embedding)
+
+        return embedding
+
+    def encode_many(self, queries: list[str]) -> np.ndarray:
+        queries = [normalize_query(query) for query in queries]
+        embeddings: list = [None] * len(queries)
+        keys = [
+            EmbeddingCache.key(self.model_name, self.prefix, query)
+            for query in queries
+        ]
+
+        if self.cache is not None:
+            for i, key in enumerate(keys):
+                embeddings[i] = self.cache.get(key)
+
+        # one forward pass for every query the cache did not have
+        missing = [
+            i for i, embedding in enumerate(embeddings) if embedding is None
+        ]
+        if missing:
+            encoded = self.encode_batch([queries[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                if self.cache is not None:
+                    self.cache.put(keys[i], embedding)
+
+        return np.vstack(embeddings) if embeddings else np.empty((0, 0))
+
+    def encode_batch(self, queries: list[str]) -> np.ndarray:
+        return embed_queries(
+            queries=queries,
+            model=self.model,
+            prefix=self.prefix,
+            normalize_embeddings=self.normalize_embeddings,
+        )
+
+    def _encode(self, query: str) -> np.ndarray:
+        if self.batcher is not None:
+            return self.batcher.encode(query)
+
+        return embed_query(
+            query=query,
+            model=self.model,
+            prefix=self.prefix,
+            normalize_embeddings=self.normalize_embeddings,
+        )
+
+
+@cache
+def get_query_encoder(
+    model_name: str, prefix: Optional[str] = None
+) -> QueryEncoder:
+    return QueryEncoder(model_name=model_name, prefix=prefix)
+
+
+def token_lengths(
+    model_name: str, texts: list[str], max_length: int = 512
+) -> list[int]:
+    # bucketing only needs lengths, the parent process never loads the model
+    input_ids = get_tokenizer(model_name)(
+        texts, truncation=True, max_length=max_length
+    )["input_ids"]
+    return [len(ids) for ids in input_ids]
+
+
+def encode_texts(
+    model: SentenceTransformer,
+    texts: list[str],
+    normalize_embeddings: bool = True,
+) -> np.ndarray:
+    return model.encode(
+        texts,
+        batch_size=len(texts),
+        normalize_embeddings=normalize_embeddings,
+    )
+
+
+# every process of the encode pool loads its own model replica
+_worker_model: Optional[SentenceTransformer] = None
+
+
+def init_encode_worker(model_name: str, threads: int) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    global _worker_model
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def encode_in_worker(
+    texts: list[str], normalize_embeddings: bool = True
+) -> np.ndarray:
+    return encode_texts(_worker_model, texts, normalize_embeddings)
+
+
+class SnippetEncoder:
+    def __init__(
+        self,
+        model_name: str,
+        prefix: Optional[str] = None,
+        max_batch_tokens: int = 16384,
+        max_batch_size: int = 256,
+        workers: int = 1,
+        threads_per_worker: Optional[int] = None,
+        device: str = "cpu",
+        normalize_embeddings: bool = True,
+    ):
+        self.model_name = model_name
+        self.prefix = prefix or ""
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(
+            1, (os.cpu_count() or 1) // workers
         )
-        yield from batch_embeddings
+        self.device = device
+        self.normalize_embeddings = normalize_embeddings
+        self._model: Optional[SentenceTransformer] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(
+                self.model_name, device=self.device
+            )
+        return self._model
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # torch does not survive a fork once its thread pool is running
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_encode_worker,
+                initargs=(self.model_name, self.threads_per_worker),
+            )
+        return self._executor
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        texts = [f"{self.prefix}{text}" for text in texts]
+
+        if self.workers > 1:
+            encode_batch: Callable = partial(
+                encode_in_worker,
+                normalize_embeddings=self.normalize_embeddings,
+            )
+            map_batches: Callable = self.executor.map
+        else:
+            encode_batch = partial(
+                encode_texts,
+                self.model,
+                normalize_embeddings=self.normalize_embeddings,
+            )
+            map_batches = map
+
+        return encode_in_buckets(
+            encode_batch,
+            texts,
+            token_lengths(self.model_name, texts),
+            max_batch_tokens=self.max_batch_tokens,
+            max_batch_size=self.max_batch_size,
+            map_batches=map_batches,
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def get_snippet_encoder(
+    config: dict, device: str = "cpu"
+) -> Optional[SnippetEncoder]:
+    encoder_config = config.get("indexing", {}).get("encoder")
+
+    if not encoder_config:
+        return None
+
+    return SnippetEncoder(
+        model_name=config["model"]["name"],
+        prefix=config["model"]["prefix"].get("indexing"),
+        max_batch_tokens=encoder_config.get("max_batch_tokens", 16384),
+        max_batch_size=encoder_config.get("max_batch_size", 256),
+        workers=encoder_config.get("workers") or 1,
+        threads_per_worker=encoder_config.get("threads_per_worker"),
+        device=device,
+    )
@@ -0,0 +1,118 @@
+import re
+from typing import Iterable, Optional
+
+import numpy as np
+from thechangelogbot.index.snippet import Snippet
+
+FILTER_MODES = ("exact", "regex")
+INDEXED_FIELDS = ("podcast", "speaker", "episode_number")
+
+
+class PostingList:
+    def __init__(
+        self, values: list[str], offsets: np.ndarray, rows: np.ndarray
+    ):
+        self.values = values
+        self.offsets = offsets
+        self.rows = rows
+        self.codes = {value: code for code, value in enumerate(values)}
+
+    @classmethod
+    def from_codes(cls, values: list[str], codes: np.ndarray) -> "PostingList":
+        codes = np.asarray(codes)
+        rows = np.argsort(codes, kind="stable").astype(np.int32)
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(values)))
+        return cls(values=values, offsets=offsets, rows=rows)
+
+    @classmethod
+    def from_values(cls, column: Iterable) -> "PostingList":
+        values: dict[str, int] = {}
+        codes = [values.setdefault(str(v), len(values)) for v in column]
+        return cls.from_codes(list(values), np.array(codes, dtype=np.int64))
+
+    def get(self, code: int) -> np.ndarray:
+        return self.rows[self.offsets[code] : self.offsets[code + 1]]
+
+    def exact(self, value: str) -> np.ndarray:
+        code = self.codes.get(str(value))
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        return self.get(code)
+
+    def regex(self, pattern: str) -> np.ndarray:
+        # match against the distinct values, not against every row
+        compiled = re.compile(pattern)
+        matches = [
+            self.get(code)
+            for code, value in enumerate(self.values)
+            if compiled.search(value)
+        ]
+        if not matches:
+            return np.empty(0, dtype=np.int32)
+        return np.sort(np.concatenate(matches))
+
+
+class FilterIndex:
+    def __init__(self, postings: dict[str, PostingList]):
+        self.postings = postings
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable[Snippet]) -> "FilterIndex":
+        columns: dict[str, list] = {field: [] for field in INDEXED_FIELDS}
+        for snippet in snippets:
+            for field in INDEXED_FIELDS:
+                columns[field].append(getattr(snippet, field))
+
+        return cls(
+            {
+                field: PostingList.from_values(column)
+                for field, column in columns.items()
+            }
+        )
+
+    def rows(
+        self, list_of_filters: dict[str, str], mode: str = "exact"
+    ) -> Optional[np.ndarray]:
+        check_filter_mode(mode)
+        rows = None
+
+        for filter_key, filter_value in list_of_filters.items():
+            if filter_key not in self.postings:
+                continue
+
+            postings = self.postings[filter_key]
+            matches = (
+                postings.exact(filter_value)
+                if mode == "exact"
+                else postings.regex(filter_value)
+            )
+            rows = (
+                matches
+                if rows is None
+                else np.intersect1d(rows, matches, assume_unique=True)
+            )
+
+        return rows
+
+
+def check_filter_mode(mode: str) -> None:
+    if mode not in FILTER_MODES:
+        raise ValueError(
+            f"{mode} is not a valid filter mode (must be in {FILTER_MODES})"
+        )
+
+
+def matches_filters(
+    snippet: Snippet, list_of_filters: dict[str, str], mode: str = "exact"
+) -> bool:
+    if mode == "exact":
+        return all(
+            str(getattr(snippet, key)) == str(value)
+            for key, value in list_of_filters.items()
+        )
+
+    return all(
+        re.search(value, str(getattr(snippet, key)))
+        for key, value in list_of_filters.items()
+    )
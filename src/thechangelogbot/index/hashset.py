@@ -0,0 +1,53 @@
+import os
+import pathlib
+from typing import Iterable, Optional
+
+import numpy as np
+
+DIGEST_SIZE = 16
+DIGEST_DTYPE = f"S{DIGEST_SIZE}"
+
+
+def as_digests(hashes: Iterable[str]) -> np.ndarray:
+    digests = b"".join(bytes.fromhex(h) for h in hashes)
+    return np.frombuffer(digests, dtype=DIGEST_DTYPE)
+
+
+class HashSet:
+    def __init__(self, digests: Optional[np.ndarray] = None):
+        if digests is None:
+            digests = np.empty(0, dtype=DIGEST_DTYPE)
+        self.digests = np.unique(digests)
+
+    @classmethod
+    def from_hashes(cls, hashes: Iterable[str]) -> "HashSet":
+        return cls(as_digests(hashes))
+
+    @classmethod
+    def load(cls, path: str) -> "HashSet":
+        if not pathlib.Path(path).is_file():
+            return cls()
+        return cls(np.load(path))
+
+    def save(self, path: str) -> None:
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp.npy")
+        np.save(tmp_path, self.digests)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def __contains__(self, _hash: str) -> bool:
+        return bool(self.contains([_hash])[0])
+
+    def contains(self, hashes: Iterable[str]) -> np.ndarray:
+        digests = as_digests(hashes)
+        positions = np.searchsorted(self.digests, digests)
+        found = positions < len(self.digests)
+        found[found] = self.digests[positions[found]] == digests[found]
+        return found
+
+    def add(self, hashes: Iterable[str]) -> None:
+        self.digests = np.union1d(self.digests, as_digests(hashes))
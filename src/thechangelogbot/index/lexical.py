@@ -0,0 +1,149 @@
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Iterable
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TERM_BYTES = 32
+TERM_DTYPE = f"S{MAX_TERM_BYTES}"
+STOPWORDS = frozenset(
+    "a an and are as at be but by do for from have i if in is it its of on "
+    "or so that the then there these they this to was we were what will "
+    "with you".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+        and len(token.encode("UTF-8")) <= MAX_TERM_BYTES
+    ]
+
+
+class LexicalIndex:
+    def __init__(
+        self,
+        terms: np.ndarray,
+        offsets: np.ndarray,
+        deltas: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.deltas = deltas
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.average_length = float(np.mean(lengths)) if len(lengths) else 0.0
+
+    @classmethod
+    def from_texts(
+        cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75
+    ) -> "LexicalIndex":
+        builder = LexicalIndexBuilder()
+        for text in texts:
+            builder.add(text)
+        return builder.build(k1=k1, b=b)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        key = term.encode("UTF-8")
+        position = int(np.searchsorted(self.terms, key))
+
+        if position == len(self.terms) or self.terms[position] != key:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint16)
+
+        start, end = self.offsets[position], self.offsets[position + 1]
+        rows = np.cumsum(self.deltas[start:end], dtype=np.int64)
+        return rows, self.frequencies[start:end]
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            rows, frequencies = self.postings(term)
+            if not len(rows):
+                continue
+
+            idf = math.log(
+                1 + (len(self) - len(rows) + 0.5) / (len(rows) + 0.5)
+            )
+            frequencies = frequencies.astype(np.float32)
+            norms = self.k1 * (
+                1 - self.b + self.b * self.lengths[rows] / self.average_length
+            )
+            scores[rows] += (
+                idf * frequencies * (self.k1 + 1) / (frequencies + norms)
+            )
+
+        return scores
+
+
+class LexicalIndexBuilder:
+    def __init__(self):
+        self._term_ids: dict[str, int] = {}
+        self._terms = array("I")
+        self._rows = array("I")
+        self._frequencies = array("H")
+        self._lengths = array("I")
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, text: str) -> None:
+        row = len(self._lengths)
+        tokens = tokenize(text)
+        self._lengths.append(len(tokens))
+
+        for term, frequency in Counter(tokens).items():
+            self._terms.append(
+                self._term_ids.setdefault(term, len(self._term_ids))
+            )
+            self._rows.append(row)
+            self._frequencies.append(min(frequency, 65535))
+
+    def build(self, k1: float = 1.2, b: float = 0.75) -> LexicalIndex:
+        vocabulary = np.array(
+            [term.encode("UTF-8") for term in self._term_ids],
+            dtype=TERM_DTYPE,
+        )
+        order = np.argsort(vocabulary, kind="stable")
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+
+        term_ids = ranks[np.asarray(self._terms, dtype=np.int64)]
+        # a stable sort keeps the rows of every term ascending
+        postings_order = np.argsort(term_ids, kind="stable")
+        rows = np.asarray(self._rows, dtype=np.int64)[postings_order]
+
+        counts = np.bincount(term_ids, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        # doc ids are stored as gaps from the previous doc id of the term
+        deltas = np.diff(rows, prepend=0)
+        starts = offsets[:-1][counts > 0]
+        deltas[starts] = rows[starts]
+
+        return LexicalIndex(
+            terms=vocabulary[order],
+            offsets=offsets,
+            deltas=deltas.astype(np.uint32),
+            frequencies=np.asarray(self._frequencies, dtype=np.uint16)[
+                postings_order
+            ],
+            lengths=np.asarray(self._lengths, dtype=np.uint32),
+            k1=k1,
+            b=b,
+        )
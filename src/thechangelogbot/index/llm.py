@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+import httpx
+from tenacity import retry, stop_after_attempt, wait_random_exponential
+
+OPENAI_API_BASE = "https://api.openai.com/v1"
+STREAM_DONE = "[DONE]"
+LLM_BACKENDS = ("openai", "stub")
+
+
+def parse_stream_line(line: str) -> Optional[str]:
+    if not line.startswith("data:"):
+        return None
+
+    data = line[len("data:") :].strip()
+    if not data or data == STREAM_DONE:
+        return None
+
+    chunk = json.loads(data)
+    return chunk["choices"][-1]["delta"].get("content", None)
+
+
+def build_request(
+    client: httpx.AsyncClient,
+    messages: list[dict],
+    model: str,
+    api_key: Optional[str] = None,
+    api_base: str = OPENAI_API_BASE,
+    max_tokens: int = 250,
+) -> httpx.Request:
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    payload = {
+        "model": model,
+        "stream": True,
+        "messages": messages,
+        "max_tokens": max_tokens,
+    }
+    return client.build_request(
+        "POST",
+        f"{api_base.rstrip('/')}/chat/completions",
+        json=payload,
+        headers=headers,
+    )
+
+
+@retry(wait=wait_random_exponential(min=1, max=40), stop=stop_after_attempt(3))
+async def aopen_stream(
+    client: httpx.AsyncClient, request: httpx.Request
+) -> httpx.Response:
+    response = await client.send(request, stream=True)
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+    response.raise_for_status()
+    return response
+
+
+async def astream_chat_completion(
+    messages: list[dict],
+    model: str,
+    api_key: Optional[str] = None,
+    api_base: str = OPENAI_API_BASE,
+    max_tokens: int = 250,
+    client: Optional[httpx.AsyncClient] = None,
+) -> AsyncIterator[str]:
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=5.0))
+
+    try:
+        request = build_request(
+            client, messages, model, api_key, api_base, max_tokens
+        )
+        response = await aopen_stream(client, request)
+
+        try:
+            async for line in response.aiter_lines():
+                text = parse_stream_line(line)
+                if text:
+                    yield text
+        finally:
+            await response.aclose()
+    finally:
+        if owns_client:
+            await client.aclose()
+
+
+class LLMBackend(ABC):
+    @abstractmethod
+    def astream(self, messages: list[dict]) -> AsyncIterator[str]:
+        ...
+
+
+class OpenAIBackend(LLMBackend):
+    def __init__(
+        self,
+        model: str = "gpt-3.5-turbo",
+        api_key: Optional[str] = None,
+        api_base: str = OPENAI_API_BASE,
+        max_tokens: int = 250,
+        max_connections: int = 100,
+    ):
+        self.model = model
+        self.api_key = api_key
+        self.api_base = api_base
+        self.max_tokens = max_tokens
+
+        # keep-alive pool, so requests skip the tcp and tls handshakes
+        self.async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def astream(self, messages: list[dict]) -> AsyncIterator[str]:
+        async for text in astream_chat_completion(
+            messages=messages,
+            model=self.model,
+            api_key=self.api_key,
+            api_base=self.api_base,
+            max_tokens=self.max_tokens,
+            client=self.async_client,
+        ):
+            yield text
+
+
+class StubBackend(LLMBackend):
+    def __init__(
+        self,
+        tokens_per_second: float = 50.0,
+        time_to_first_token: float = 0.0,
+        max_tokens: int = 250,
+    ):
+        self.tokens_per_second = tokens_per_second
+        self.time_to_first_token = time_to_first_token
+        self.max_tokens = max_tokens
+
+    def tokens(self, messages: list[dict]) -> list[str]:
+        question = messages[-1]["content"].split("QUESTION")[-1]
+        words = question.replace("-", " ").split()
+        answer = ["This", "is", "a", "stub", "answer", "to:"] + words
+        return [f"{word} " for word in answer[: self.max_tokens]]
+
+    def _delay(self, position: int) -> float:
+        if position == 0:
+            return self.time_to_first_token
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    async def astream(self, messages: list[dict]) -> AsyncIterator[str]:
+        for position, token in enumerate(self.tokens(messages)):
+            await asyncio.sleep(self._delay(position))
+            yield token
+
+
+def get_llm_backend(config: dict) -> LLMBackend:
+    llm_config = config.get("llm", {})
+    backend = llm_config.get("backend", "openai")
+
+    if backend == "stub":
+        return StubBackend(
+            max_tokens=llm_config.get("max_tokens", 250),
+            **llm_config.get("stub", {}),
+        )
+
+    if backend == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY is not set")
+
+        return OpenAIBackend(
+            model=llm_config.get("model", "gpt-3.5-turbo"),
+            api_key=api_key,
+            api_base=llm_config.get("api_base", OPENAI_API_BASE),
+            max_tokens=llm_config.get("max_tokens", 250),
+            max_connections=llm_config.get("max_connections", 100),
+        )
+
+    raise ValueError(
+        f"{backend} is not a valid llm backend (must be in {LLM_BACKENDS})"
+    )
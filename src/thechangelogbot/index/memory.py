@@ -0,0 +1,260 @@
+import time
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+from thechangelogbot.index.ann import IVFIndex
+from thechangelogbot.index.filters import FilterIndex, matches_filters
+from thechangelogbot.index.lexical import LexicalIndex
+from thechangelogbot.index.quantization import QuantizedVectors
+from thechangelogbot.index.snippet import Snippet
+from thechangelogbot.index.timing import record_timing
+
+SUPPORTED_DTYPES = ("float32", "float16")
+SCORE_CHUNK_SIZE = 2048
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+RRF_K = 60
+HYBRID_CANDIDATES = 100
+QUERY_CHUNK_SIZE = 32
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def check_search_mode(mode: str) -> None:
+    if mode not in SEARCH_MODES:
+        raise ValueError(
+            f"{mode} is not a valid search mode (must be in {SEARCH_MODES})"
+        )
+
+
+def reciprocal_rank_fusion(
+    rankings: list[np.ndarray], limit: int, k: int = RRF_K
+) -> np.ndarray:
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking.tolist()):
+            fused[row] = fused.get(row, 0.0) + 1 / (k + rank + 1)
+
+    rows = np.array(list(fused), dtype=np.int64)
+    scores = np.array(list(fused.values()), dtype=np.float64)
+    return rows[top_k(scores, limit)]
+
+
+class MemoryIndex:
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        snippets: Sequence[Snippet],
+        dtype: str = "float32",
+        normalized: bool = False,
+        filter_index: Optional[FilterIndex] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+        ann_index: Optional[IVFIndex] = None,
+        quantized: Optional[QuantizedVectors] = None,
+    ):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(
+                f"{dtype} is not a supported dtype (must be in {SUPPORTED_DTYPES})"
+            )
+
+        if len(embeddings) != len(snippets):
+            raise ValueError(
+                f"Got {len(embeddings)} embeddings for {len(snippets)} snippets"
+            )
+
+        if not normalized:
+            embeddings = normalize_rows(embeddings)
+
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=dtype)
+        self.snippets = snippets
+        self.filter_index = (
+            filter_index
+            if filter_index is not None
+            else FilterIndex.from_snippets(snippets)
+        )
+        self.lexical_index = (
+            lexical_index
+            if lexical_index is not None
+            else LexicalIndex.from_texts(snippet.text for snippet in snippets)
+        )
+        self.ann_index = ann_index
+        self.quantized = quantized
+
+    def __len__(self) -> int:
+        return len(self.snippets)
+
+    @property
+    def vector_size(self) -> int:
+        return self.embeddings.shape[1]
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+
+        if self.embeddings.dtype == np.float32:
+            return self.embeddings @ query_embedding
+
+        # numpy has no BLAS kernel for float16, upcast one block at a time
+        scores = np.empty(len(self.embeddings), dtype=np.float32)
+        for i in range(0, len(self.embeddings), SCORE_CHUNK_SIZE):
+            block = self.embeddings[i : i + SCORE_CHUNK_SIZE]
+            scores[i : i + SCORE_CHUNK_SIZE] = (
+                block.astype(np.float32) @ query_embedding
+            )
+        return scores
+
+    def filter_rows(
+        self, list_of_filters: dict[str, str], mode: str = "exact"
+    ) -> np.ndarray:
+        rows = self.filter_index.rows(list_of_filters, mode=mode)
+        unindexed_filters = {
+            key: value
+            for key, value in list_of_filters.items()
+            if key not in self.filter_index.postings
+        }
+
+        if not unindexed_filters:
+            return rows
+
+        candidates = range(len(self)) if rows is None else rows
+        return np.array(
+            [
+                row
+                for row in candidates
+                if matches_filters(
+                    self.snippets[row], unindexed_filters, mode=mode
+                )
+            ],
+            dtype=np.int64,
+        )
+
+    def vector_rows(
+        self,
+        query_embedding: np.ndarray,
+        limit: int,
+        candidates: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+    ) -> np.ndarray:
+        # filtered searches stay exact over the filtered rows
+        if candidates is None and self.ann_index is not None:
+            candidates = self.ann_index.candidates(query_embedding, nprobe)
+
+        if candidates is None and self.quantized is not None:
+            approximate_scores = self.quantized.scores(query_embedding)
+            if not self.quantized.rescore:
+                return top_k(approximate_scores, limit)
+
+            # rescore the best quantized matches with the full vectors
+            candidates = np.sort(
+                top_k(approximate_scores, limit * self.quantized.rescore)
+            )
+
+        if candidates is None:
+            return top_k(self.scores(query_embedding), limit)
+
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        candidate_scores = (
+            self.embeddings[candidates].astype(np.float32) @ query_embedding
+        )
+        return candidates[top_k(candidate_scores, limit)]
+
+    def batch_vector_rows(
+        self, query_embeddings: np.ndarray, limit: int
+    ) -> list[np.ndarray]:
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        rows = []
+
+        # a few queries at a time bounds the score matrix to queries x rows
+        for i in range(0, len(query_embeddings), QUERY_CHUNK_SIZE):
+            queries = query_embeddings[i : i + QUERY_CHUNK_SIZE]
+
+            if self.embeddings.dtype == np.float32:
+                scores = queries @ self.embeddings.T
+            else:
+                scores = np.empty((len(queries), len(self)), dtype=np.float32)
+                for j in range(0, len(self), SCORE_CHUNK_SIZE):
+                    block = self.embeddings[j : j + SCORE_CHUNK_SIZE]
+                    scores[:, j : j + SCORE_CHUNK_SIZE] = (
+                        queries @ block.astype(np.float32).T
+                    )
+
+            rows.extend(top_k(query_scores, limit) for query_scores in scores)
+
+        return rows
+
+    def lexical_rows(
+        self,
+        query: str,
+        limit: int,
+        candidates: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        scores = self.lexical_index.scores(query)
+
+        # only snippets sharing at least one term with the query
+        if candidates is None:
+            candidates = np.flatnonzero(scores > 0)
+        else:
+            candidates = candidates[scores[candidates] > 0]
+        return candidates[top_k(scores[candidates], limit)]
+
+    def search(
+        self,
+        query_embedding: Optional[np.ndarray],
+        limit: int = 4,
+        list_of_filters: Optional[dict[str, str]] = None,
+        filter_mode: str = "exact",
+        query: Optional[str] = None,
+        mode: str = "vector",
+        nprobe: Optional[int] = None,
+    ) -> Iterator[Snippet]:
+        check_search_mode(mode)
+        if mode != "vector" and query is None:
+            raise ValueError(f"query must be provided for {mode} search")
+
+        start_time = time.perf_counter()
+        candidates = (
+            self.filter_rows(list_of_filters, mode=filter_mode)
+            if list_of_filters
+            else None
+        )
+
+        if mode == "vector":
+            rows = self.vector_rows(
+                query_embedding, limit, candidates, nprobe=nprobe
+            )
+        elif mode == "lexical":
+            rows = self.lexical_rows(query, limit, candidates)
+        else:
+            depth = max(limit, HYBRID_CANDIDATES)
+            rows = reciprocal_rank_fusion(
+                [
+                    self.vector_rows(
+                        query_embedding, depth, candidates, nprobe=nprobe
+                    ),
+                    self.lexical_rows(query, depth, candidates),
+                ],
+                limit,
+            )
+        record_timing(None, f"{mode}_search", start_time)
+
+        for row in rows:
+            start_time = time.perf_counter()
+            snippet = self.snippets[row]
+            record_timing(None, "unpack", start_time)
+            yield snippet
@@ -0,0 +1,150 @@
+import bisect
+import threading
+from typing import Sequence, Union
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+STAGE_SECONDS = "changelogbot_stage_seconds"
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        # the bucket is found outside the lock, which only guards two adds
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self) -> tuple[list[int], float]:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+def format_labels(labels: tuple, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict = {}
+        self._help: dict[str, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, name: str, help: str, labels: dict, factory):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is not None:
+            return metric
+
+        with self._lock:
+            registered = self._help.setdefault(name, (kind, help))
+            if registered[0] != kind:
+                raise ValueError(f"{name} is already a {registered[0]}")
+            return self._metrics.setdefault(key, factory())
+
+    def histogram(
+        self,
+        name: str,
+        help: str = "",
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        return self._get(
+            "histogram", name, help, labels, lambda: Histogram(buckets)
+        )
+
+    def counter(self, name: str, help: str = "", **labels: str) -> Counter:
+        return self._get("counter", name, help, labels, Counter)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.items(), key=lambda item: item[0])
+            helps = dict(self._help)
+
+        lines, last_name = [], None
+        for (name, labels), metric in metrics:
+            if name != last_name:
+                kind, help = helps[name]
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                last_name = name
+
+            if isinstance(metric, Counter):
+                lines.append(f"{name}{format_labels(labels)} {metric.value}")
+                continue
+
+            cumulative, total = metric.samples()
+            bounds: list[Union[float, str]] = [*metric.buckets, "+Inf"]
+            for bound, count in zip(bounds, cumulative):
+                le = bound if isinstance(bound, str) else format_value(bound)
+                lines.append(
+                    f"{name}_bucket{format_labels(labels, le=le)} {count}"
+                )
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(
+                f"{name}_count{format_labels(labels)} {cumulative[-1]}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    METRICS.histogram(
+        STAGE_SECONDS, "Time spent in each stage of a request", stage=stage
+    ).observe(seconds)
@@ -1,16 +1,24 @@
+import os
 import pathlib
 import re
-from typing import Iterator, Optional
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, Iterator, Optional
 
 from loguru import logger
+from thechangelogbot.index.chunker import chunk_snippets
 from thechangelogbot.index.snippet import Snippet
 
+SPEAKER_PATTERN = re.compile(r"^\*\*(.+?):\*\*")
+BREAK_SPEAKER = "Break"
+
 
 def filter_items(
     items: list[Snippet], num_words: int = 25
 ) -> Iterator[Snippet]:
     for snippet in items:
-        if snippet.speaker == "Break":
+        if snippet.speaker == BREAK_SPEAKER:
             continue
 
         elif snippet.word_count < num_words:
@@ -24,72 +32,79 @@ def parse_episode_text(
     episode_number: int,
     podcast: str,
 ) -> list[Snippet]:
-    text = ""
     speaking_items = []
-    last_speaker = None
+    speaker, lines = None, []
+
+    def add_turn() -> None:
+        # the snippet hash covers this exact text, keep it byte for byte
+        text = " ".join(lines).strip()
+        if speaker and text and speaker != BREAK_SPEAKER:
+            speaking_items.append(
+                Snippet(
+                    podcast=podcast,
+                    episode_number=episode_number,
+                    text=text,
+                    speaker=speaker,
+                )
+            )
 
     for line in episode_text.splitlines():
         if not line:
             continue
 
-        speaker_match = re.match(r"^\*\*(.+?):\*\*", line)
+        speaker_match = (
+            SPEAKER_PATTERN.match(line) if line.startswith("**") else None
+        )
 
         if speaker_match:
-            if last_speaker and text:
-                speaking_items.append(
-                    Snippet(
-                        podcast=podcast,
-                        episode_number=episode_number,
-                        text=text.strip(),
-                        speaker=last_speaker,
-                    )
-                )
-
+            add_turn()
             speaker = speaker_match.group(1)
-            text = line.replace(f"**{speaker}:** ", "")
-            last_speaker = speaker
+            prefix = f"**{speaker}:** "
+            rest = line[len(prefix) :]
+            if line.startswith(prefix) and prefix not in rest:
+                lines = [rest]
+            else:
+                lines = [line.replace(prefix, "")]
 
         else:
-            text += " " + line
-
-    if last_speaker and text:
-        speaking_items.append(
-            Snippet(
-                podcast=podcast,
-                episode_number=episode_number,
-                text=text.strip(),
-                speaker=last_speaker,
-            )
-        )
+            lines.append(line)
 
-    speaking_items = list(filter_items(speaking_items))
+    add_turn()
 
-    return speaking_items
+    return list(filter_items(speaking_items))
+
+
+def parse_episode_file(
+    file: pathlib.Path, chunking: Optional[dict] = None
+) -> list[Snippet]:
+    try:
+        episode_number = int(file.stem.split("-")[-1])
+        episode_text = file.read_text()
+
+        snippets = parse_episode_text(
+            episode_text=episode_text,
+            episode_number=episode_number,
+            podcast=file.parent.name,
+        )
+        return chunk_snippets(snippets, chunking)
+
+    except Exception as e:
+        logger.error(f"Error processing {file.name}: {e}")
+        return []
 
 
 def process_podcast_directory(
     directory: pathlib.Path,
 ) -> Iterator[list[Snippet]]:
     for file in pathlib.Path(directory).iterdir():
-        try:
-            episode_number = int(file.stem.split("-")[-1])
-            episode_text = file.read_text()
-
-            yield parse_episode_text(
-                episode_text=episode_text,
-                episode_number=episode_number,
-                podcast=directory.name,
-            )
-
-        except Exception as e:
-            logger.error(f"Error processing {file.name}: {e}")
+        yield parse_episode_file(file)
 
 
-def index_snippets(
+def iter_episode_files(
     transcript_repo_directory: str,
     podcast_filter: Optional[list[str]] = None,
     directories_to_ignore: list[str] = [".github", ".git", "scripts"],
-) -> Iterator[Snippet]:
+) -> Iterator[pathlib.Path]:
     for directory in pathlib.Path(transcript_repo_directory).iterdir():
         if not directory.is_dir() or directory.name in directories_to_ignore:
             continue
@@ -97,8 +112,81 @@ def index_snippets(
         if podcast_filter and directory.name not in podcast_filter:
             continue
 
-        podcast = directory.name
-        logger.info(f"Processing podcast {podcast}...")
+        logger.info(f"Processing podcast {directory.name}...")
+        yield from directory.iterdir()
+
+
+def parse_episode_files(
+    files: Iterable[pathlib.Path],
+    workers: Optional[int] = 1,
+    max_pending: Optional[int] = None,
+    chunking: Optional[dict] = None,
+) -> Iterator[list[Snippet]]:
+    parse = partial(parse_episode_file, chunking=chunking)
+
+    if workers == 1:
+        yield from map(parse, files)
+        return
+
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or workers * 4
+    pending: deque[Future] = deque()
+
+    # keep a bounded window of files in flight, results come back in order
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file in files:
+            pending.append(executor.submit(parse, file))
+
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
 
-        for items in list(process_podcast_directory(directory=directory)):
-            yield from items
+        while pending:
+            yield pending.popleft().result()
+
+
+def index_snippets(
+    transcript_repo_directory: str,
+    podcast_filter: Optional[list[str]] = None,
+    directories_to_ignore: list[str] = [".github", ".git", "scripts"],
+    workers: Optional[int] = 1,
+    files: Optional[Iterable[pathlib.Path]] = None,
+    chunking: Optional[dict] = None,
+) -> Iterator[Snippet]:
+    if files is None:
+        files = iter_episode_files(
+            transcript_repo_directory,
+            podcast_filter=podcast_filter,
+            directories_to_ignore=directories_to_ignore,
+        )
+
+    for items in parse_episode_files(
+        files, workers=workers, chunking=chunking
+    ):
+        yield from items
+
+
+def index_snippet_batches(
+    transcript_repo_directory: str,
+    podcast_filter: Optional[list[str]] = None,
+    workers: Optional[int] = 1,
+    batch_size: int = 1000,
+    files: Optional[Iterable[pathlib.Path]] = None,
+    chunking: Optional[dict] = None,
+) -> Iterator[list[Snippet]]:
+    batch = []
+
+    for snippet in index_snippets(
+        transcript_repo_directory,
+        podcast_filter=podcast_filter,
+        workers=workers,
+        files=files,
+        chunking=chunking,
+    ):
+        batch.append(snippet)
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
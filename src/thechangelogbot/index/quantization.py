@@ -0,0 +1,122 @@
+from typing import Optional
+
+import numpy as np
+
+QUANTIZATIONS = ("int8", "binary")
+QUANTIZE_CHUNK_SIZE = 2048
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def check_quantization(quantization: Optional[str]) -> None:
+    if quantization is not None and quantization not in QUANTIZATIONS:
+        raise ValueError(
+            f"{quantization} is not a valid quantization (must be in {QUANTIZATIONS})"
+        )
+
+
+def quantize_int8(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    codes = np.empty(embeddings.shape, dtype=np.int8)
+    scales = np.empty(len(embeddings), dtype=np.float32)
+
+    # symmetric, one scale per vector so x ~= codes * scale
+    for i in range(0, len(embeddings), QUANTIZE_CHUNK_SIZE):
+        block = np.asarray(
+            embeddings[i : i + QUANTIZE_CHUNK_SIZE], dtype=np.float32
+        )
+        block_scales = np.abs(block).max(axis=1) / 127
+        block_scales[block_scales == 0] = 1.0
+        codes[i : i + QUANTIZE_CHUNK_SIZE] = np.round(
+            block / block_scales[:, None]
+        )
+        scales[i : i + QUANTIZE_CHUNK_SIZE] = block_scales
+
+    return codes, scales
+
+
+def binarize(embeddings: np.ndarray) -> np.ndarray:
+    return np.packbits(np.asarray(embeddings) > 0, axis=-1)
+
+
+def hamming_distances(codes: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    # numpy >= 2.0 counts bits a 64 bit word at a time, older versions
+    # go through a lookup table one byte at a time
+    if hasattr(np, "bitwise_count") and codes.shape[1] % 8 == 0:
+        words = np.ascontiguousarray(codes).view(np.uint64)
+        bits = np.bitwise_count(words ^ query_bits.view(np.uint64))
+    else:
+        bits = POPCOUNT[codes ^ query_bits]
+    return bits.sum(axis=1, dtype=np.int32)
+
+
+def int8_scores(
+    codes: np.ndarray, scales: np.ndarray, query_embedding: np.ndarray
+) -> np.ndarray:
+    scores = np.empty(len(codes), dtype=np.float32)
+    for i in range(0, len(codes), QUANTIZE_CHUNK_SIZE):
+        block = codes[i : i + QUANTIZE_CHUNK_SIZE].astype(np.float32)
+        scores[i : i + QUANTIZE_CHUNK_SIZE] = block @ query_embedding
+    return scores * scales
+
+
+def binary_scores(
+    codes: np.ndarray, query_embedding: np.ndarray
+) -> np.ndarray:
+    query_bits = binarize(query_embedding)
+    dimensions = codes.shape[1] * 8
+
+    scores = np.empty(len(codes), dtype=np.float32)
+    for i in range(0, len(codes), QUANTIZE_CHUNK_SIZE):
+        distances = hamming_distances(
+            codes[i : i + QUANTIZE_CHUNK_SIZE], query_bits
+        )
+        scores[i : i + QUANTIZE_CHUNK_SIZE] = dimensions - 2 * distances
+    return scores
+
+
+class QuantizedVectors:
+    def __init__(
+        self,
+        quantization: str,
+        codes: np.ndarray,
+        scales: Optional[np.ndarray] = None,
+        rescore: int = 4,
+    ):
+        check_quantization(quantization)
+        self.quantization = quantization
+        self.codes = codes
+        self.scales = scales
+        self.rescore = rescore
+
+    @classmethod
+    def from_embeddings(
+        cls, embeddings: np.ndarray, quantization: str, rescore: int = 4
+    ) -> "QuantizedVectors":
+        check_quantization(quantization)
+        if quantization == "int8":
+            codes, scales = quantize_int8(embeddings)
+            return cls(quantization, codes, scales, rescore=rescore)
+        return cls(quantization, binarize(embeddings), rescore=rescore)
+
+    @property
+    def nbytes(self) -> int:
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return self.codes.nbytes + scales
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        if self.quantization == "int8":
+            return int8_scores(self.codes, self.scales, query_embedding)
+        return binary_scores(self.codes, query_embedding)
+
+
+def quantize(
+    embeddings: np.ndarray, quantization_config: Optional[dict]
+) -> Optional[QuantizedVectors]:
+    if not quantization_config or quantization_config.get("type") is None:
+        return None
+
+    return QuantizedVectors.from_embeddings(
+        embeddings,
+        quantization=quantization_config["type"],
+        rescore=quantization_config.get("rescore", 4),
+    )
@@ -0,0 +1,107 @@
+import json
+import os
+import pathlib
+import shutil
+from typing import Optional
+
+from git import InvalidGitRepositoryError, NoSuchPathError
+from git.exc import BadName, GitCommandError
+from git.repo import Repo
+from loguru import logger
+
+IGNORED_DIRECTORIES = [".github", ".git", "scripts"]
+
+
+def read_state(state_file: str) -> dict:
+    path = pathlib.Path(state_file)
+    if not path.is_file():
+        return {}
+    return json.loads(path.read_text())
+
+
+def write_state(state_file: str, state: dict) -> None:
+    path = pathlib.Path(state_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, path)
+
+
+def clone_repository(directory: str, git_url: str) -> Repo:
+    if pathlib.Path(directory).is_dir():
+        shutil.rmtree(directory)
+
+    return Repo.clone_from(git_url, directory)
+
+
+def update_repository(directory: str, git_url: str) -> Repo:
+    try:
+        repo = Repo(directory)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        logger.info(f"No checkout found in {directory}, cloning {git_url}")
+        return clone_repository(directory, git_url)
+
+    try:
+        branch = repo.active_branch.name
+    except TypeError:
+        logger.warning(f"{directory} has a detached HEAD, cloning {git_url}")
+        return clone_repository(directory, git_url)
+
+    origin = repo.remotes.origin
+    origin.fetch()
+    repo.git.reset("--hard", f"{origin.name}/{branch}")
+    return repo
+
+
+def episode_key(path: str) -> Optional[tuple[str, int]]:
+    parts = pathlib.PurePosixPath(path).parts
+
+    if len(parts) != 2:
+        return None
+
+    try:
+        return parts[0], int(pathlib.PurePosixPath(path).stem.split("-")[-1])
+    except ValueError:
+        return None
+
+
+def is_episode_file(
+    path: str,
+    podcast_filter: Optional[list[str]] = None,
+    directories_to_ignore: list[str] = IGNORED_DIRECTORIES,
+) -> bool:
+    key = episode_key(path)
+
+    if key is None or key[0] in directories_to_ignore:
+        return False
+
+    return not podcast_filter or key[0] in podcast_filter
+
+
+def changed_episode_files(
+    repo: Repo,
+    old_commit: str,
+    new_commit: str,
+    podcast_filter: Optional[list[str]] = None,
+) -> tuple[Optional[list[pathlib.Path]], set[tuple[str, int]]]:
+    changed, touched = [], set()
+
+    # a rewritten history or a shallow clone can lose the indexed commit
+    try:
+        diffs = repo.commit(old_commit).diff(new_commit)
+    except (BadName, GitCommandError, ValueError) as e:
+        logger.warning(f"Cannot diff from {old_commit[:7]}: {e}")
+        return None, set()
+
+    for diff in diffs:
+        for path in (diff.a_path, diff.b_path):
+            if path and is_episode_file(path, podcast_filter=podcast_filter):
+                touched.add(episode_key(path))
+
+        if diff.change_type == "D":
+            continue
+
+        if is_episode_file(diff.b_path, podcast_filter=podcast_filter):
+            changed.append(pathlib.Path(repo.working_tree_dir) / diff.b_path)
+
+    return changed, touched
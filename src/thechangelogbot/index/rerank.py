@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import time
+from functools import cache
+from typing import TYPE_CHECKING, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+from thechangelogbot.index.snippet import Snippet
+from thechangelogbot.index.timing import record_timing
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+# every skipped rerank lowers the cost estimate, so a stale or inflated
+# estimate gets probed again instead of skipping reranks for good
+SKIP_DECAY = 0.8
+
+
+@cache
+def get_cross_encoder(model_name: str, max_length: int = 256) -> CrossEncoder:
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+
+class Reranker:
+    def __init__(
+        self,
+        model_name: str,
+        candidates: int = 20,
+        budget_ms: Optional[float] = 150.0,
+        max_length: int = 256,
+    ):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self.max_length = max_length
+        # moving average of the forward pass cost per (query, snippet) pair
+        self.pair_ms: Optional[float] = None
+
+    @property
+    def model(self) -> CrossEncoder:
+        return get_cross_encoder(self.model_name, self.max_length)
+
+    def load(self) -> None:
+        self.model
+
+    def affordable(self, elapsed_ms: float = 0.0) -> int:
+        if self.budget_ms is None or self.pair_ms is None:
+            return self.candidates
+        return max(0, int((self.budget_ms - elapsed_ms) // self.pair_ms))
+
+    def score(self, query: str, snippets: Sequence[Snippet]) -> np.ndarray:
+        return np.asarray(
+            self.model.predict(
+                [(query, snippet.text) for snippet in snippets],
+                batch_size=len(snippets),
+                show_progress_bar=False,
+            )
+        )
+
+    def rerank(
+        self,
+        query: str,
+        snippets: Sequence[Snippet],
+        limit: int,
+        elapsed_ms: float = 0.0,
+        timings: Optional[dict] = None,
+    ) -> list[Snippet]:
+        # under load rerank fewer candidates, or none, to stay in budget
+        count = min(len(snippets), self.affordable(elapsed_ms))
+        if timings is not None:
+            timings["reranked"] = count if count > 1 else 0
+
+        if count <= 1:
+            if self.pair_ms is not None:
+                self.pair_ms *= SKIP_DECAY
+            logger.debug(f"Skipping rerank, {elapsed_ms:.1f}ms already spent")
+            return list(snippets[:limit])
+
+        # loading the model is not part of the per pair cost
+        self.load()
+        start_time = time.perf_counter()
+        scores = self.score(query, snippets[:count])
+        rerank_ms = record_timing(timings, "rerank", start_time)
+
+        pair_ms = rerank_ms / count
+        self.pair_ms = (
+            pair_ms
+            if self.pair_ms is None
+            else 0.8 * self.pair_ms + 0.2 * pair_ms
+        )
+
+        order = np.argsort(-scores, kind="stable")
+        reranked = [snippets[i] for i in order] + list(snippets[count:])
+        return reranked[:limit]
+
+
+def get_reranker(config: dict) -> Optional[Reranker]:
+    rerank_config = config.get("search", {}).get("rerank") or {}
+
+    if rerank_config.get("model") is None:
+        return None
+
+    return Reranker(
+        model_name=rerank_config["model"],
+        candidates=rerank_config.get("candidates", 20),
+        budget_ms=rerank_config.get("budget_ms", 150.0),
+        max_length=rerank_config.get("max_length", 256),
+    )
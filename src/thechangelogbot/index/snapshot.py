@@ -0,0 +1,494 @@
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+from loguru import logger
+from thechangelogbot.index.ann import IVFIndex, build_ann_index
+from thechangelogbot.index.filters import FilterIndex, PostingList
+from thechangelogbot.index.lexical import LexicalIndex, LexicalIndexBuilder
+from thechangelogbot.index.memory import MemoryIndex, normalize_rows
+from thechangelogbot.index.quantization import QuantizedVectors, quantize
+from thechangelogbot.index.snippet import Snippet
+
+SNAPSHOT_FORMAT_VERSION = 4
+CURRENT_FILE = "CURRENT"
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.bin"
+TEXT_FILE = "text.bin"
+COLUMN_FILES = {
+    "podcast": "podcast.npy",
+    "speaker": "speaker.npy",
+    "episode_number": "episode_number.npy",
+    "hash": "hash.npy",
+    "text_offsets": "text_offsets.npy",
+    "parent_hash": "parent_hash.npy",
+}
+NO_PARENT = bytes(16)
+LEXICAL_FILES = {
+    "terms": "lexical.terms.npy",
+    "offsets": "lexical.offsets.npy",
+    "deltas": "lexical.deltas.npy",
+    "frequencies": "lexical.frequencies.npy",
+    "lengths": "lexical.lengths.npy",
+}
+IVF_FILES = {
+    "centroids": "ivf.centroids.npy",
+    "offsets": "ivf.offsets.npy",
+    "rows": "ivf.rows.npy",
+}
+QUANTIZED_FILES = {
+    "codes": "quantized.codes.npy",
+    "scales": "quantized.scales.npy",
+}
+
+
+class SnippetTable:
+    def __init__(
+        self,
+        podcasts: list[str],
+        speakers: list[str],
+        podcast_codes: np.ndarray,
+        speaker_codes: np.ndarray,
+        episode_numbers: np.ndarray,
+        hashes: np.ndarray,
+        text_offsets: np.ndarray,
+        text: np.ndarray,
+        parent_hashes: Optional[np.ndarray] = None,
+    ):
+        self.podcasts = podcasts
+        self.speakers = speakers
+        self.podcast_codes = podcast_codes
+        self.speaker_codes = speaker_codes
+        self.episode_numbers = episode_numbers
+        self.hashes = hashes
+        self.text_offsets = text_offsets
+        self.text = text
+        self.parent_hashes = parent_hashes
+
+    def __len__(self) -> int:
+        return len(self.episode_numbers)
+
+    def __getitem__(self, row: int) -> Snippet:
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        parent = (
+            self.parent_hashes[row].tobytes()
+            if self.parent_hashes is not None
+            else NO_PARENT
+        )
+        return Snippet.from_stored(
+            podcast=self.podcasts[self.podcast_codes[row]],
+            episode_number=int(self.episode_numbers[row]),
+            text=self.text[start:end].tobytes().decode("UTF-8"),
+            speaker=self.speakers[self.speaker_codes[row]],
+            _hash=self.hashes[row].tobytes().hex(),
+            parent_hash=parent.hex() if parent != NO_PARENT else "",
+        )
+
+
+class SnapshotWriter:
+    def __init__(
+        self,
+        directory: str,
+        vector_size: int,
+        dtype: str = "float32",
+        model: Optional[str] = None,
+        keep: int = 2,
+        ann: Optional[dict] = None,
+        quantization: Optional[dict] = None,
+    ):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vector_size = vector_size
+        self.dtype = np.dtype(dtype)
+        self.model = model
+        self.keep = keep
+        self.ann = ann
+        self.quantization = quantization
+
+        self.path = pathlib.Path(
+            tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        )
+        self._embeddings = open(self.path / EMBEDDINGS_FILE, "wb")
+        self._text = open(self.path / TEXT_FILE, "wb")
+        self._text_offsets = [0]
+        self._podcasts: dict[str, int] = {}
+        self._speakers: dict[str, int] = {}
+        self._podcast_codes: list[int] = []
+        self._speaker_codes: list[int] = []
+        self._episode_numbers: list[int] = []
+        self._hashes: list[bytes] = []
+        self._parent_hashes: list[bytes] = []
+        self._lexical = LexicalIndexBuilder()
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+
+    def __len__(self) -> int:
+        return len(self._episode_numbers)
+
+    def add(self, snippet: Snippet, embedding: np.ndarray) -> None:
+        embedding = normalize_rows(embedding)
+        if embedding.shape != (self.vector_size,):
+            raise ValueError(
+                f"Expected an embedding of shape ({self.vector_size},), got {embedding.shape}"
+            )
+
+        self._embeddings.write(embedding.astype(self.dtype).tobytes())
+
+        text = snippet.text.encode("UTF-8")
+        self._text.write(text)
+        self._text_offsets.append(self._text_offsets[-1] + len(text))
+
+        self._podcast_codes.append(
+            self._podcasts.setdefault(snippet.podcast, len(self._podcasts))
+        )
+        self._speaker_codes.append(
+            self._speakers.setdefault(snippet.speaker, len(self._speakers))
+        )
+        self._episode_numbers.append(snippet.episode_number)
+        self._hashes.append(bytes.fromhex(snippet._hash))
+        self._parent_hashes.append(
+            bytes.fromhex(snippet.parent_hash)
+            if snippet.parent_hash
+            else NO_PARENT
+        )
+        self._lexical.add(snippet.text)
+
+    def add_all(self, items: Iterable[tuple[Snippet, np.ndarray]]) -> None:
+        for snippet, embedding in items:
+            self.add(snippet, embedding)
+
+    def commit(self) -> pathlib.Path:
+        if len(self) == 0:
+            self.abort()
+            raise ValueError("Refusing to write an empty snapshot")
+
+        for handle in (self._embeddings, self._text):
+            handle.flush()
+            os.fsync(handle.fileno())
+            handle.close()
+
+        columns = {
+            "podcast": np.array(self._podcast_codes, dtype=np.uint16),
+            "speaker": np.array(self._speaker_codes, dtype=np.uint32),
+            "episode_number": np.array(self._episode_numbers, dtype=np.int32),
+            "hash": np.frombuffer(
+                b"".join(self._hashes), dtype=np.uint8
+            ).reshape(-1, 16),
+            "text_offsets": np.array(self._text_offsets, dtype=np.int64),
+            "parent_hash": np.frombuffer(
+                b"".join(self._parent_hashes), dtype=np.uint8
+            ).reshape(-1, 16),
+        }
+        for column, file_name in COLUMN_FILES.items():
+            np.save(self.path / file_name, columns[column])
+
+        filter_index = FilterIndex(
+            {
+                "podcast": PostingList.from_codes(
+                    list(self._podcasts), columns["podcast"]
+                ),
+                "speaker": PostingList.from_codes(
+                    list(self._speakers), columns["speaker"]
+                ),
+                "episode_number": PostingList.from_values(
+                    self._episode_numbers
+                ),
+            }
+        )
+        write_filter_index(self.path, filter_index)
+
+        lexical_index = self._lexical.build()
+        write_lexical_index(self.path, lexical_index)
+
+        embeddings = np.memmap(
+            self.path / EMBEDDINGS_FILE,
+            dtype=self.dtype,
+            mode="r",
+            shape=(len(self), self.vector_size),
+        )
+        ann_index = build_ann_index(embeddings, self.ann)
+        if ann_index is not None:
+            write_ivf_index(self.path, ann_index)
+
+        quantized = quantize(embeddings, self.quantization)
+        if quantized is not None:
+            write_quantized_vectors(self.path, quantized)
+
+        header = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "created": time.time(),
+            "count": len(self),
+            "vector_size": self.vector_size,
+            "dtype": self.dtype.name,
+            "model": self.model,
+            "podcasts": list(self._podcasts),
+            "speakers": list(self._speakers),
+            "filters": {
+                field: postings.values
+                for field, postings in filter_index.postings.items()
+            },
+            "lexical": {"k1": lexical_index.k1, "b": lexical_index.b},
+        }
+        if ann_index is not None:
+            header["ann"] = {"type": "ivf", "nprobe": ann_index.nprobe}
+        if quantized is not None:
+            header["quantization"] = {
+                "type": quantized.quantization,
+                "rescore": quantized.rescore,
+            }
+        (self.path / HEADER_FILE).write_text(json.dumps(header))
+
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{self.path.name[5:]}"
+        final_path = self.directory / name
+        os.rename(self.path, final_path)
+        set_current_snapshot(self.directory, name)
+        self.prune()
+
+        logger.info(f"Wrote snapshot {final_path} with {len(self)} snippets")
+        return final_path
+
+    def abort(self) -> None:
+        for handle in (self._embeddings, self._text):
+            handle.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def prune(self) -> None:
+        current = get_current_snapshot(self.directory)
+        snapshots = sorted(
+            path
+            for path in self.directory.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        )
+        # readers may still have the previous snapshot mapped, unlinking is
+        # safe on posix but keeping it around makes rollbacks trivial
+        for path in snapshots[: -self.keep]:
+            if path.name != current:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def set_current_snapshot(directory: pathlib.Path, name: str) -> None:
+    tmp_file = directory / f".{CURRENT_FILE}.tmp"
+    tmp_file.write_text(name)
+    os.replace(tmp_file, directory / CURRENT_FILE)
+
+
+def get_current_snapshot(directory: pathlib.Path) -> Optional[str]:
+    current_file = pathlib.Path(directory) / CURRENT_FILE
+    if not current_file.is_file():
+        return None
+    return current_file.read_text().strip()
+
+
+def get_current_header(directory: pathlib.Path) -> Optional[dict]:
+    name = get_current_snapshot(directory)
+    if name is None:
+        return None
+    return json.loads(
+        (pathlib.Path(directory) / name / HEADER_FILE).read_text()
+    )
+
+
+def write_filter_index(path: pathlib.Path, filter_index: FilterIndex) -> None:
+    for field, postings in filter_index.postings.items():
+        np.save(path / f"{field}.rows.npy", postings.rows)
+        np.save(path / f"{field}.offsets.npy", postings.offsets)
+
+
+def read_filter_index(path: pathlib.Path, header: dict) -> FilterIndex:
+    return FilterIndex(
+        {
+            field: PostingList(
+                values=values,
+                offsets=np.load(path / f"{field}.offsets.npy"),
+                rows=np.load(path / f"{field}.rows.npy", mmap_mode="r"),
+            )
+            for field, values in header["filters"].items()
+        }
+    )
+
+
+def write_lexical_index(
+    path: pathlib.Path, lexical_index: LexicalIndex
+) -> None:
+    for column, file_name in LEXICAL_FILES.items():
+        np.save(path / file_name, getattr(lexical_index, column))
+
+
+def read_lexical_index(path: pathlib.Path, header: dict) -> LexicalIndex:
+    return LexicalIndex(
+        **{
+            column: np.load(path / file_name, mmap_mode="r")
+            for column, file_name in LEXICAL_FILES.items()
+        },
+        **header["lexical"],
+    )
+
+
+def write_ivf_index(path: pathlib.Path, ann_index: IVFIndex) -> None:
+    for column, file_name in IVF_FILES.items():
+        np.save(path / file_name, getattr(ann_index, column))
+
+
+def read_ivf_index(path: pathlib.Path, header: dict) -> IVFIndex:
+    return IVFIndex(
+        **{
+            column: np.load(path / file_name, mmap_mode="r")
+            for column, file_name in IVF_FILES.items()
+        },
+        nprobe=header["ann"]["nprobe"],
+    )
+
+
+def write_quantized_vectors(
+    path: pathlib.Path, quantized: QuantizedVectors
+) -> None:
+    np.save(path / QUANTIZED_FILES["codes"], quantized.codes)
+    if quantized.scales is not None:
+        np.save(path / QUANTIZED_FILES["scales"], quantized.scales)
+
+
+def read_quantized_vectors(
+    path: pathlib.Path, header: dict
+) -> QuantizedVectors:
+    scales_file = path / QUANTIZED_FILES["scales"]
+    return QuantizedVectors(
+        quantization=header["quantization"]["type"],
+        codes=np.load(path / QUANTIZED_FILES["codes"], mmap_mode="r"),
+        scales=np.load(scales_file) if scales_file.is_file() else None,
+        rescore=header["quantization"]["rescore"],
+    )
+
+
+def read_snapshot(path: pathlib.Path) -> MemoryIndex:
+    header = json.loads((path / HEADER_FILE).read_text())
+
+    if header["version"] > SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Snapshot {path} has version {header['version']}, expected at most {SNAPSHOT_FORMAT_VERSION}"
+        )
+
+    embeddings = np.memmap(
+        path / EMBEDDINGS_FILE,
+        dtype=header["dtype"],
+        mode="r",
+        shape=(header["count"], header["vector_size"]),
+    )
+    # snapshots before version 4 have no parent hashes
+    columns = {
+        column: np.load(path / file_name, mmap_mode="r")
+        for column, file_name in COLUMN_FILES.items()
+        if (path / file_name).is_file()
+    }
+    table = SnippetTable(
+        podcasts=header["podcasts"],
+        speakers=header["speakers"],
+        podcast_codes=columns["podcast"],
+        speaker_codes=columns["speaker"],
+        episode_numbers=columns["episode_number"],
+        hashes=columns["hash"],
+        text_offsets=columns["text_offsets"],
+        text=np.memmap(path / TEXT_FILE, dtype=np.uint8, mode="r"),
+        parent_hashes=columns.get("parent_hash"),
+    )
+
+    # version 1 snapshots carry no posting lists, rebuild them on load
+    filter_index = (
+        read_filter_index(path, header)
+        if "filters" in header
+        else FilterIndex.from_snippets(table)
+    )
+
+    return MemoryIndex(
+        embeddings=embeddings,
+        snippets=table,
+        dtype=header["dtype"],
+        normalized=True,
+        filter_index=filter_index,
+        # older snapshots have no lexical index, MemoryIndex builds one
+        lexical_index=(
+            read_lexical_index(path, header) if "lexical" in header else None
+        ),
+        ann_index=read_ivf_index(path, header) if "ann" in header else None,
+        quantized=(
+            read_quantized_vectors(path, header)
+            if "quantization" in header
+            else None
+        ),
+    )
+
+
+def load_snapshot(directory: str) -> MemoryIndex:
+    name = get_current_snapshot(directory)
+
+    if name is None:
+        raise ValueError(f"No snapshot found in {directory}")
+
+    return read_snapshot(pathlib.Path(directory) / name)
+
+
+class SnapshotWatcher:
+    def __init__(self, directory: str, check_interval: float = 30.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._name = get_current_snapshot(directory)
+
+        if self._name is None:
+            raise ValueError(f"No snapshot found in {directory}")
+
+        self._index = read_snapshot(pathlib.Path(directory) / self._name)
+        self._last_check = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+
+    def start(self) -> "SnapshotWatcher":
+        # reading a snapshot takes seconds, keep it off the request path
+        self._thread = threading.Thread(
+            target=self._watch, name="snapshot-watcher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def get(self) -> MemoryIndex:
+        if (
+            self._thread is None
+            and time.monotonic() - self._last_check >= self.check_interval
+        ):
+            self.reload()
+        return self._index
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Snapshot reload failed: {e}")
+
+    def reload(self) -> bool:
+        with self._lock:
+            self._last_check = time.monotonic()
+            name = get_current_snapshot(self.directory)
+
+            if name is None or name == self._name:
+                return False
+
+            self._index = read_snapshot(pathlib.Path(self.directory) / name)
+            self._name = name
+
+        logger.info(f"Swapped to snapshot {name}")
+        return True
@@ -1,13 +1,21 @@
+import json
 import re
 from dataclasses import dataclass
 from hashlib import md5
 
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+TIMESTAMP_PATTERN = re.compile(r"\\\[\d{1,2}:\d{1,2}\\\]\s")
+
+
+def clean_words(text: str) -> list[str]:
+    if "\\[" in text:
+        text = TIMESTAMP_PATTERN.sub("", text)
+    # str.split and the \s regex agree on what counts as whitespace
+    return text.split()
+
 
 def clean_text(text: str) -> str:
-    text = re.sub(r"\\\[\d{1,2}:\d{1,2}\\\]\s", "", text)
-    text = re.sub(r"\s+", " ", text)
-    text = text.strip()
-    return text
+    return " ".join(clean_words(text))
 
 
 @dataclass
@@ -18,14 +26,39 @@ class Snippet:
     speaker: str
     _hash: str = ""
     word_count: int = 0
+    # chunks of a long speaker turn point at the hash of the whole turn
+    parent_hash: str = ""
 
     def __post_init__(self):
         to_encode = (
             f"{self.podcast}{self.episode_number}{self.text}{self.speaker}"
+            f"{self.parent_hash}"
         )
-        self._hash = str(md5(to_encode.encode("UTF-8")).hexdigest())
-        self.text = clean_text(self.text)
-        self.word_count = len(self.text.split())
+        self._hash = md5(to_encode.encode("UTF-8")).hexdigest()
+        words = clean_words(self.text)
+        self.text = " ".join(words)
+        self.word_count = len(words)
+
+    @classmethod
+    def from_stored(
+        cls,
+        podcast: str,
+        episode_number: int,
+        text: str,
+        speaker: str,
+        _hash: str,
+        parent_hash: str = "",
+    ) -> "Snippet":
+        # stored text is already clean and hashed, skip __post_init__
+        snippet = object.__new__(cls)
+        snippet.podcast = podcast
+        snippet.episode_number = episode_number
+        snippet.text = text
+        snippet.speaker = speaker
+        snippet._hash = _hash
+        snippet.word_count = text.count(" ") + 1 if text else 0
+        snippet.parent_hash = parent_hash
+        return snippet
 
     def _as_context(self) -> str:
         return (
@@ -34,3 +67,16 @@ class Snippet:
             f"Speaker: {self.speaker}\n"
             f"Transcript: {self.text}\n"
         )
+
+    def _as_json(self) -> str:
+        return JSON_ENCODER.encode(
+            {
+                "podcast": self.podcast,
+                "episode_number": self.episode_number,
+                "text": self.text,
+                "speaker": self.speaker,
+                "_hash": self._hash,
+                "word_count": self.word_count,
+                "parent_hash": self.parent_hash,
+            }
+        )
@@ -0,0 +1,306 @@
+import json
+import os
+import pathlib
+from hashlib import md5
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+from loguru import logger
+from thechangelogbot.index.hashset import DIGEST_DTYPE, HashSet, as_digests
+from thechangelogbot.index.snippet import Snippet
+
+META_FILE = "meta.json"
+INDEX_FILE = "index.npy"
+SHARD_FILE = "shard-{:06}.bin"
+INDEX_DTYPE = np.dtype(
+    [("digest", DIGEST_DTYPE), ("shard", np.uint32), ("row", np.uint32)]
+)
+
+
+def store_namespace(model_name: str, prefix: Optional[str]) -> str:
+    key = f"{model_name}\x00{prefix or ''}".encode("UTF-8")
+    return md5(key).hexdigest()[:16]
+
+
+class EmbeddingStore:
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        vector_size: int,
+        prefix: Optional[str] = None,
+        dtype: str = "float32",
+        shard_size: int = 65536,
+    ):
+        self.model_name = model_name
+        self.prefix = prefix or ""
+        self.vector_size = vector_size
+        self.dtype = np.dtype(dtype)
+        self.shard_size = shard_size
+        self.row_bytes = self.vector_size * self.dtype.itemsize
+
+        # one directory per model and prefix, switching models keeps both
+        self.path = pathlib.Path(path) / store_namespace(model_name, prefix)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._check_meta()
+
+        index_file = self.path / INDEX_FILE
+        self.index = (
+            np.load(index_file)
+            if index_file.is_file()
+            else np.empty(0, dtype=INDEX_DTYPE)
+        )
+        self._shards: dict[int, np.memmap] = {}
+
+    def _check_meta(self) -> None:
+        meta = {
+            "model": self.model_name,
+            "prefix": self.prefix,
+            "vector_size": self.vector_size,
+            "dtype": self.dtype.name,
+        }
+        meta_file = self.path / META_FILE
+
+        if not meta_file.is_file():
+            meta_file.write_text(json.dumps(meta))
+            return
+
+        stored = json.loads(meta_file.read_text())
+        if stored != meta:
+            raise ValueError(
+                f"Embedding store {self.path} holds {stored}, expected {meta}"
+            )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def shard_numbers(self) -> list[int]:
+        return sorted(
+            int(path.stem.split("-")[1]) for path in self.path.glob("shard-*")
+        )
+
+    def shard_rows(self, shard: int) -> int:
+        shard_file = self.path / SHARD_FILE.format(shard)
+        if not shard_file.is_file():
+            return 0
+        return shard_file.stat().st_size // self.row_bytes
+
+    @property
+    def dead_rows(self) -> int:
+        rows = sum(self.shard_rows(shard) for shard in self.shard_numbers())
+        return rows - len(self)
+
+    def _shard(self, shard: int) -> np.memmap:
+        # shards only grow, map again once rows past the mapped ones are read
+        mapped = self._shards.get(shard)
+        if mapped is None or len(mapped) < self.shard_rows(shard):
+            mapped = np.memmap(
+                self.path / SHARD_FILE.format(shard),
+                dtype=self.dtype,
+                mode="r",
+                shape=(self.shard_rows(shard), self.vector_size),
+            )
+            self._shards[shard] = mapped
+        return mapped
+
+    def _lookup(self, digests: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        positions = np.searchsorted(self.index["digest"], digests)
+        found = positions < len(self.index)
+        found[found] = self.index["digest"][positions[found]] == digests[found]
+        return found, positions[found]
+
+    def contains(self, hashes: Iterable[str]) -> np.ndarray:
+        return self._lookup(as_digests(hashes))[0]
+
+    def get(self, hashes: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+        found, positions = self._lookup(as_digests(hashes))
+        entries = self.index[positions]
+        embeddings = np.empty((len(entries), self.vector_size), self.dtype)
+
+        for shard in np.unique(entries["shard"]):
+            in_shard = entries["shard"] == shard
+            embeddings[in_shard] = self._shard(int(shard))[
+                entries["row"][in_shard]
+            ]
+
+        return found, embeddings
+
+    def _append(self, embeddings: np.ndarray) -> np.ndarray:
+        entries = np.empty(len(embeddings), dtype=INDEX_DTYPE)
+        shards = self.shard_numbers()
+        shard = shards[-1] if shards else 0
+        written = 0
+
+        while written < len(embeddings):
+            rows = self.shard_rows(shard)
+            if rows >= self.shard_size:
+                shard, rows = shard + 1, 0
+
+            count = min(self.shard_size - rows, len(embeddings) - written)
+            with open(self.path / SHARD_FILE.format(shard), "ab") as handle:
+                handle.write(embeddings[written : written + count].tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            entries["shard"][written : written + count] = shard
+            entries["row"][written : written + count] = np.arange(
+                rows, rows + count
+            )
+            written += count
+
+        return entries
+
+    def _save_index(self, index: np.ndarray) -> None:
+        # rows written before a crash but missing from the index are only
+        # dead space until the next compaction
+        tmp_file = self.path / f".{INDEX_FILE}.tmp.npy"
+        np.save(tmp_file, index)
+        os.replace(tmp_file, self.path / INDEX_FILE)
+        self.index = index
+
+    def add(self, hashes: list[str], embeddings: np.ndarray) -> int:
+        digests = as_digests(hashes)
+        digests, first = np.unique(digests, return_index=True)
+        new = ~self._lookup(digests)[0]
+        if not new.any():
+            return 0
+
+        embeddings = np.asarray(embeddings, dtype=self.dtype)[first[new]]
+        if embeddings.shape[1:] != (self.vector_size,):
+            raise ValueError(
+                f"Expected embeddings of size {self.vector_size}, got {embeddings.shape[1:]}"
+            )
+
+        entries = self._append(np.ascontiguousarray(embeddings))
+        entries["digest"] = digests[new]
+        index = np.concatenate([self.index, entries])
+        self._save_index(index[np.argsort(index["digest"], kind="stable")])
+        return len(entries)
+
+    def gc(self, live_hashes: Iterable[str]) -> int:
+        live = HashSet.from_hashes(live_hashes)
+        keep = np.isin(self.index["digest"], live.digests)
+        removed = int((~keep).sum())
+
+        if removed:
+            self._save_index(self.index[keep])
+            logger.info(f"Dropped {removed} unreferenced embeddings")
+
+        return removed
+
+    def compact(self) -> None:
+        old_shards = self.shard_numbers()
+        if not old_shards:
+            return
+
+        # live rows are copied into new shards in their current order, the
+        # index switches over atomically before the old shards are removed
+        order = np.lexsort((self.index["row"], self.index["shard"]))
+        index = self.index.copy()
+        first_shard = old_shards[-1] + 1
+        written = 0
+
+        for start in range(0, len(order), self.shard_size):
+            positions = order[start : start + self.shard_size]
+            entries = index[positions]
+            embeddings = np.empty((len(entries), self.vector_size), self.dtype)
+            for shard in np.unique(entries["shard"]):
+                in_shard = entries["shard"] == shard
+                embeddings[in_shard] = self._shard(int(shard))[
+                    entries["row"][in_shard]
+                ]
+
+            shard = first_shard + start // self.shard_size
+            with open(self.path / SHARD_FILE.format(shard), "wb") as handle:
+                handle.write(embeddings.tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            index["shard"][positions] = shard
+            index["row"][positions] = np.arange(len(positions))
+            written += len(positions)
+
+        self._save_index(index)
+        self._shards.clear()
+        for shard in old_shards:
+            (self.path / SHARD_FILE.format(shard)).unlink()
+
+        logger.info(
+            f"Compacted {len(old_shards)} shards into "
+            f"{len(self.shard_numbers())} with {written} embeddings"
+        )
+
+    def maybe_compact(self, compact_ratio: float = 0.25) -> bool:
+        dead_rows = self.dead_rows
+        if dead_rows == 0 or dead_rows < compact_ratio * (
+            len(self) + dead_rows
+        ):
+            return False
+
+        self.compact()
+        return True
+
+
+def embed_with_store(
+    snippets: Iterable[Snippet],
+    store: EmbeddingStore,
+    encode: Callable[[list[str]], np.ndarray],
+    batch_size: int = 10000,
+    fetch: Optional[Callable[[list[str]], dict[str, np.ndarray]]] = None,
+) -> Iterator[tuple[Snippet, np.ndarray]]:
+    snippets = iter(snippets)
+    hits, fetched, encoded = 0, 0, 0
+
+    while batch := list(islice(snippets, batch_size)):
+        hashes = [snippet._hash for snippet in batch]
+        found, embeddings = store.get(hashes)
+        missing = np.flatnonzero(~found)
+
+        if len(missing):
+            missing_hashes = [hashes[i] for i in missing]
+            vectors = np.empty((len(missing), store.vector_size), store.dtype)
+
+            # vectors computed elsewhere (the listener) are not encoded again
+            found_elsewhere = (
+                fetch(missing_hashes) if fetch is not None else {}
+            )
+            unknown = []
+            for j, _hash in enumerate(missing_hashes):
+                if _hash in found_elsewhere:
+                    vectors[j] = found_elsewhere[_hash]
+                else:
+                    unknown.append(j)
+
+            if unknown:
+                vectors[unknown] = encode(
+                    [batch[missing[j]].text for j in unknown]
+                )
+
+            store.add(missing_hashes, vectors)
+            _, embeddings = store.get(hashes)
+            fetched += len(missing) - len(unknown)
+            encoded += len(unknown)
+
+        hits += len(batch) - len(missing)
+        yield from zip(batch, embeddings)
+
+    logger.info(
+        f"Embedding store had {hits} snippets, fetched {fetched}, "
+        f"encoded {encoded}"
+    )
+
+
+def get_embedding_store(config: dict) -> Optional[EmbeddingStore]:
+    store_config = config.get("indexing", {}).get("embedding_store") or {}
+
+    if store_config.get("path") is None:
+        return None
+
+    return EmbeddingStore(
+        store_config["path"],
+        model_name=config["model"]["name"],
+        vector_size=config["model"]["vector_size"],
+        prefix=config["model"]["prefix"].get("indexing"),
+        shard_size=store_config.get("shard_size", 65536),
+    )
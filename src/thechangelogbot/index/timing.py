@@ -0,0 +1,22 @@
+import time
+from typing import Optional
+
+from thechangelogbot.index.metrics import observe_stage
+
+
+def record_timing(
+    timings: Optional[dict], stage: str, start_time: float
+) -> float:
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    observe_stage(stage, elapsed_ms / 1000)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + elapsed_ms
+    return elapsed_ms
+
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(
+        f"{stage};dur={value:.1f}"
+        for stage, value in timings.items()
+        if isinstance(value, float)
+    )
@@ -2,7 +2,12 @@ import superduperdb
 from loguru import logger
 from superduperdb.db.mongodb.query import Collection
 from thechangelogbot.conf.load_config import config
-from thechangelogbot.index.database import get_mongo_client, prepare_mongo
+from thechangelogbot.index.database import (
+    create_filter_indexes,
+    create_hash_index,
+    get_mongo_client,
+    prepare_mongo,
+)
 
 
 def prepare_database(config: dict = config) -> None:
@@ -39,6 +44,8 @@ def prepare_database(config: dict = config) -> None:
         index_id=index_id,
         key="text",
     )
+    create_filter_indexes(client, collection_name=mongodb_collection)
+    create_hash_index(client, collection_name=mongodb_collection)
     logger.info("Prepared mongodb.")
 
 
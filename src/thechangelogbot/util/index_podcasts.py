@@ -1,36 +1,177 @@
-import pathlib
-import shutil
+import argparse
 from dataclasses import asdict
+from functools import partial
+from typing import Iterator
 
+import numpy as np
 import superduperdb
-from git.repo import Repo
 from loguru import logger
 from superduperdb.db.mongodb.query import Collection
 from thechangelogbot.conf.load_config import config
 from thechangelogbot.index.database import (
+    create_hash_index,
+    get_embedded_snippets,
+    get_listener_embeddings,
+    get_live_snippets,
     get_mongo_client,
-    get_uploaded_hashes,
+    get_snapshot_directory,
+    reconcile_episode,
     upload_to_mongo,
 )
-from thechangelogbot.index.parser import index_snippets
+from thechangelogbot.index.embeddings import (
+    SnippetEncoder,
+    get_snippet_encoder,
+)
+from thechangelogbot.index.hashset import HashSet
+from thechangelogbot.index.parser import index_snippet_batches
+from thechangelogbot.index.repository import (
+    changed_episode_files,
+    clone_repository,
+    episode_key,
+    read_state,
+    update_repository,
+    write_state,
+)
+from thechangelogbot.index.snapshot import SnapshotWriter, get_current_header
+from thechangelogbot.index.snippet import Snippet
+from thechangelogbot.index.store import embed_with_store, get_embedding_store
 
 
-def index(config: dict = config) -> None:
+def snapshot_outdated(config: dict) -> bool:
+    snapshot_directory = get_snapshot_directory(config)
+    if snapshot_directory is None:
+        return False
+
+    header = get_current_header(snapshot_directory)
+    return header is None or header.get("model") != config["model"]["name"]
+
+
+def write_snapshot(db, collection: Collection, config: dict) -> None:
+    store = get_embedding_store(config)
+
+    if store is None:
+        items = get_embedded_snippets(db=db, collection=collection)
+    else:
+        # snapshot vectors come from the store, store misses reuse what the
+        # listener computed for them; only snippets it has not embedded yet,
+        # or an indexing prefix the listener does not use, are encoded here
+        encoder = get_snippet_encoder(config) or SnippetEncoder(
+            config["model"]["name"],
+            prefix=config["model"]["prefix"].get("indexing"),
+        )
+        fetch = (
+            None
+            if encoder.prefix
+            else partial(get_listener_embeddings, db, collection)
+        )
+        live_hashes: list[str] = []
+
+        def embedded_snippets() -> Iterator[tuple[Snippet, np.ndarray]]:
+            for snippet, embedding in embed_with_store(
+                get_live_snippets(db, collection),
+                store,
+                encoder.encode,
+                fetch=fetch,
+            ):
+                live_hashes.append(snippet._hash)
+                yield snippet, embedding
+
+        items = embedded_snippets()
+
+    with SnapshotWriter(
+        get_snapshot_directory(config),
+        vector_size=config["model"]["vector_size"],
+        dtype=config["search"].get("dtype", "float32"),
+        model=config["model"]["name"],
+        ann=config["search"].get("ann"),
+        quantization=config["search"].get("quantization"),
+    ) as writer:
+        writer.add_all(items)
+        writer.commit()
+
+    if store is not None:
+        encoder.close()
+        store.gc(live_hashes)
+        store.maybe_compact(
+            config["indexing"]["embedding_store"].get("compact_ratio", 0.25)
+        )
+
+
+def checkout_transcripts(config: dict) -> tuple:
     transcript_repo_directory = config["indexing"]["transcript_repo_directory"]
     transcript_git_url = config["indexing"]["transcript_git_url"]
     podcast_filter = config["indexing"]["podcasts"]
+    incremental = config["indexing"].get("mode", "full") == "incremental"
+    state_file = config["indexing"].get("state_file", "./indexing.json")
 
-    if pathlib.Path(transcript_repo_directory).is_dir():
-        shutil.rmtree(transcript_repo_directory)
+    state = read_state(state_file)
+    files, touched = None, set()
 
-    Repo.clone_from(transcript_git_url, transcript_repo_directory)
+    if incremental:
+        repo = update_repository(transcript_repo_directory, transcript_git_url)
+    else:
+        repo = clone_repository(transcript_repo_directory, transcript_git_url)
 
-    snippets = list(
-        index_snippets(
-            transcript_repo_directory, podcast_filter=podcast_filter
+    head_commit = repo.head.commit.hexsha
+
+    if incremental and state.get("commit") is not None:
+        files, touched = changed_episode_files(
+            repo,
+            old_commit=state["commit"],
+            new_commit=head_commit,
+            podcast_filter=podcast_filter,
         )
+        if files is None:
+            logger.info("Parsing every episode file instead")
+        else:
+            logger.info(
+                f"{len(files)} changed episode files "
+                f"between {state['commit'][:7]} and {head_commit[:7]}"
+            )
+
+    return head_commit, files, touched
+
+
+def iter_batches(config: dict, files) -> Iterator[list[Snippet]]:
+    return index_snippet_batches(
+        config["indexing"]["transcript_repo_directory"],
+        podcast_filter=config["indexing"]["podcasts"],
+        workers=config["indexing"].get("workers", 1),
+        batch_size=config["indexing"].get("batch_size", 1000),
+        files=files,
+        chunking=config["indexing"].get("chunking"),
     )
-    snippets = list(asdict(s) for s in snippets)
+
+
+def dry_run(config: dict = config) -> None:
+    hash_file = config["indexing"].get("hash_file", "./hashes.npy")
+    known_hashes = HashSet.load(hash_file)
+    logger.info(f"Loaded {len(known_hashes)} known hashes from {hash_file}")
+
+    _, files, _ = checkout_transcripts(config)
+    parsed, new = 0, 0
+
+    for batch in iter_batches(config, files):
+        parsed += len(batch)
+        new += int((~known_hashes.contains(sn._hash for sn in batch)).sum())
+
+    logger.info(f"Parsed {parsed} snippets, {new} would be uploaded.")
+
+
+def index(config: dict = config) -> None:
+    state_file = config["indexing"].get("state_file", "./indexing.json")
+    hash_file = config["indexing"].get("hash_file", "./hashes.npy")
+    head_commit, files, touched = checkout_transcripts(config)
+
+    if (
+        files is not None
+        and not files
+        and not touched
+        and not snapshot_outdated(config)
+    ):
+        logger.info(f"Nothing changed up to {head_commit}, nothing to do.")
+        write_state(state_file, {"commit": head_commit})
+        return
 
     mongodb_host = config["mongodb"]["host"]
     mongodb_port = config["mongodb"]["port"]
@@ -42,21 +183,83 @@ def index(config: dict = config) -> None:
     )
     db = superduperdb.superduper(client.documents)
     collection = Collection(name=mongodb_collection)
+    create_hash_index(client, collection_name=mongodb_collection)
+
+    # uploads look up the hashes of the parsed snippets, not the whole set
+    parsed_hashes: list[str] = []
+    uploaded, tombstoned = 0, 0
+    episode_hashes: dict[tuple[str, int], set[str]] = {
+        key: set() for key in touched
+    }
+
+    for batch in iter_batches(config, files):
+        for sn in batch:
+            key = (sn.podcast, sn.episode_number)
+            if key in episode_hashes:
+                episode_hashes[key].add(sn._hash)
+
+        parsed_hashes.extend(sn._hash for sn in batch)
+        uploaded += upload_to_mongo(
+            db, collection, [asdict(sn) for sn in batch]
+        )
+
+    # files that parse to nothing failed to parse, unlike deleted episodes
+    changed_episodes = {
+        episode_key(f"{file.parent.name}/{file.name}") for file in files or []
+    }
 
-    existing_hashes = get_uploaded_hashes(db=db, collection=collection)
-    logger.info(f"Total snippets already in database: {len(existing_hashes)}")
+    # snippets of modified or deleted episodes that are no longer produced
+    for (podcast, episode_number), hashes in episode_hashes.items():
+        if not hashes and (podcast, episode_number) in changed_episodes:
+            logger.warning(
+                f"No snippets parsed for {podcast} episode {episode_number}, "
+                "keeping its snippets"
+            )
+            continue
 
-    snippets_to_upload = [
-        sn for sn in snippets if sn["_hash"] not in existing_hashes
-    ]
+        tombstoned += reconcile_episode(
+            client,
+            collection_name=mongodb_collection,
+            podcast=podcast,
+            episode_number=episode_number,
+            hashes=hashes,
+        )
 
-    if len(snippets_to_upload) > 0:
-        logger.info(f"Uploading {len(snippets_to_upload)} new snippets.")
-        upload_to_mongo(db, collection, snippets_to_upload)
+    if uploaded > 0:
+        logger.info(f"Uploaded {uploaded} new snippets.")
 
     else:
         logger.info("No new snippets to upload.")
 
+    if tombstoned > 0:
+        logger.info(f"Tombstoned {tombstoned} stale snippets.")
+
+    if get_snapshot_directory(config) is not None and (
+        uploaded > 0 or tombstoned > 0 or snapshot_outdated(config)
+    ):
+        write_snapshot(db=db, collection=collection, config=config)
+
+    # an incremental run only saw the changed episodes
+    known_hashes = HashSet.load(hash_file) if files is not None else HashSet()
+    known_hashes.add(parsed_hashes)
+    known_hashes.save(hash_file)
+    write_state(state_file, {"commit": head_commit})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Index podcast transcripts")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report how many snippets are new, using the local hash set",
+    )
+    args = parser.parse_args()
+
+    if args.dry_run:
+        dry_run(config=config)
+    else:
+        index(config=config)
+
 
 if __name__ == "__main__":
-    index(config=config)
+    main()
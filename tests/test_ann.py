@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from thechangelogbot.index.ann import IVFIndex, build_ann_index
+from thechangelogbot.index.memory import MemoryIndex, normalize_rows, top_k
+from thechangelogbot.index.snapshot import SnapshotWriter, load_snapshot
+from thechangelogbot.index.snippet import Snippet
+
+
+def clustered(count: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((8, dim))
+    labels = rng.integers(0, 8, count)
+    return normalize_rows(
+        centers[labels] + 0.1 * rng.standard_normal((count, dim))
+    )
+
+
+def snippets(count: int) -> list[Snippet]:
+    return [
+        Snippet("gotime", i, f"snippet {i}", "Mat Ryer") for i in range(count)
+    ]
+
+
+class TestIVFIndex:
+    def test_lists_cover_every_row(self):
+        embeddings = clustered(500)
+        index = IVFIndex.build(embeddings, n_lists=8)
+
+        assert len(index) == 8
+        assert sorted(index.rows.tolist()) == list(range(500))
+        assert index.offsets[-1] == 500
+        assert len(index.candidates(embeddings[0], nprobe=8)) == 500
+
+    def test_recall(self):
+        embeddings = clustered(2000)
+        index = IVFIndex.build(embeddings, n_lists=16, nprobe=2)
+        queries = clustered(50, seed=1)
+
+        hits = 0
+        for query in queries:
+            exact = top_k(embeddings @ query, 10)
+            candidates = index.candidates(query)
+            found = candidates[top_k(embeddings[candidates] @ query, 10)]
+            hits += len(np.intersect1d(exact, found))
+
+        assert hits / (50 * 10) > 0.9
+
+    def test_memory_index_uses_ann(self):
+        embeddings = clustered(300)
+        index = MemoryIndex(embeddings, snippets(300), normalized=True)
+        index.ann_index = IVFIndex.build(embeddings, n_lists=4)
+
+        results = list(index.search(embeddings[42], limit=1, nprobe=1))
+        assert results[0].episode_number == 42
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        embeddings = clustered(300)
+        with SnapshotWriter(
+            tmp_path, vector_size=16, ann={"type": "ivf", "n_lists": 4}
+        ) as writer:
+            writer.add_all(zip(snippets(300), embeddings))
+            writer.commit()
+
+        index = load_snapshot(tmp_path)
+        assert len(index.ann_index) == 4
+        assert index.ann_index.nprobe == 8
+        results = list(index.search(embeddings[7], limit=1))
+        assert results[0].episode_number == 7
+
+    def test_invalid_type(self):
+        assert build_ann_index(clustered(10), {"type": None}) is None
+        with pytest.raises(ValueError, match="hnsw"):
+            build_ann_index(clustered(10), {"type": "hnsw"})
@@ -0,0 +1,61 @@
+import numpy as np
+from thechangelogbot.index.answers import AnswerCache, context_key
+from thechangelogbot.index.snippet import Snippet
+
+CHUNKS = ["Bun ", "is ", "a ", "fast ", "runtime."]
+
+
+def snippets(*texts: str) -> list[Snippet]:
+    return [Snippet("jsparty", 1, text, "Jerod Santo") for text in texts]
+
+
+class TestAnswerCache:
+    def test_context_key(self):
+        context = snippets("bun", "deno")
+        assert context_key("Jerod Santo", context) == (
+            context_key("Jerod Santo", snippets("bun", "deno"))
+        )
+        assert context_key("Jerod Santo", context) != (
+            context_key("Jerod Santo", context[::-1])
+        )
+        assert context_key("Jerod Santo", context) != (
+            context_key("Adam Stacoviak", context)
+        )
+
+    def test_replays_chunks(self):
+        cache = AnswerCache()
+        key = context_key("Jerod Santo", snippets("bun"))
+        cache.put(key, "what is bun?", CHUNKS)
+
+        assert cache.get(key, "  what is\nbun? ") == CHUNKS
+        assert cache.get(key, "what is deno?") is None
+        assert cache.get("other", "what is bun?") is None
+        assert cache.stats()["hit_rate"] == 1 / 3
+
+    def test_similar_query_embedding(self):
+        cache = AnswerCache(similarity_threshold=0.9)
+        key = context_key("Jerod Santo", snippets("bun"))
+        cache.put(key, "what is bun?", CHUNKS, np.array([1.0, 0.0]))
+
+        assert cache.get(key, "what's bun", np.array([0.99, 0.1])) == CHUNKS
+        assert cache.get(key, "is bun fast", np.array([0.5, 0.5])) is None
+        assert cache.get("other", "what's bun", np.array([1.0, 0.0])) is None
+
+        cache.similarity_threshold = None
+        assert cache.get(key, "what's bun", np.array([1.0, 0.0])) is None
+
+    def test_eviction(self):
+        cache = AnswerCache(max_bytes=80)
+        for question in ["a", "b", "c", "d"]:
+            cache.put("key", question, ["x" * 20])
+
+        assert len(cache) == 3
+        assert cache.get("key", "a") is None
+        assert cache.get("key", "d") == ["x" * 20]
+        assert cache.size_bytes <= 80
+
+    def test_ttl(self):
+        cache = AnswerCache(ttl=-1)
+        cache.put("key", "what is bun?", CHUNKS)
+        assert cache.get("key", "what is bun?") is None
+        assert len(cache) == 0
@@ -1,5 +1,6 @@
+import pytest
 from fastapi.testclient import TestClient
-from thechangelogbot.api.main import app
+from thechangelogbot.api.main import app, config
 
 client = TestClient(app)
 
@@ -8,3 +9,29 @@ class TestAPI:
     def test_read_root(self):
         response = client.get("/")
         assert response.status_code == 200
+
+    @pytest.mark.parametrize("mode", ["lexical", "hybrid"])
+    def test_mongo_backend_rejects_mode(self, monkeypatch, mode):
+        monkeypatch.setitem(config["search"], "backend", "mongo")
+
+        response = client.post("/search", json={"query": "bun", "mode": mode})
+        assert response.status_code == 400
+        assert "memory search backend" in response.json()["detail"]
+
+        response = client.post(
+            "/search/batch",
+            json={
+                "searches": [{"query": "bun"}, {"query": "bun", "mode": mode}]
+            },
+        )
+        assert response.status_code == 400
+
+    def test_mongo_backend_rejects_non_integer_episode(self, monkeypatch):
+        monkeypatch.setitem(config["search"], "backend", "mongo")
+
+        response = client.post(
+            "/search",
+            json={"query": "bun", "filters": {"episode_number": "latest"}},
+        )
+        assert response.status_code == 400
+        assert "episode_number" in response.json()["detail"]
@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+from thechangelogbot.index.batching import (
+    MicroBatcher,
+    encode_in_buckets,
+    plan_batches,
+)
+
+
+def fake_encode(texts: list[str]) -> np.ndarray:
+    return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+class TestMicroBatcher:
+    def test_results_match_callers(self):
+        batcher = MicroBatcher(fake_encode, max_batch_size=8, max_wait_ms=50)
+        texts = ["a" * i for i in range(1, 33)]
+        results = [None] * len(texts)
+
+        def call(i):
+            results[i] = batcher.encode(texts[i])
+
+        threads = [
+            threading.Thread(target=call, args=(i,)) for i in range(len(texts))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        assert [int(r[0]) for r in results] == list(range(1, 33))
+        assert batcher.items == 32
+        assert batcher.batches < 32
+
+    def test_errors_reach_callers(self):
+        def broken(texts):
+            raise RuntimeError("model failed")
+
+        batcher = MicroBatcher(broken, max_batch_size=4, max_wait_ms=1)
+        with pytest.raises(RuntimeError, match="model failed"):
+            batcher.encode("hello")
+        batcher.close()
+
+        with pytest.raises(RuntimeError):
+            batcher.submit("hello")
+
+
+def padded_encode(texts: list[str]) -> np.ndarray:
+    # fails like a model would if a batch went over the token budget
+    assert len(texts) * max(len(text) for text in texts) <= 64
+    return fake_encode(texts)
+
+
+class TestBucketing:
+    def test_plan_batches(self):
+        lengths = [5, 40, 1, 20, 20, 3, 64, 2]
+        batches = plan_batches(lengths, max_batch_tokens=64, max_batch_size=4)
+
+        assert sorted(np.concatenate(batches).tolist()) == list(range(8))
+        for batch in batches:
+            assert len(batch) <= 4
+            assert len(batch) * max(lengths[i] for i in batch) <= 64
+        assert batches[0].tolist() == [6]
+
+    def test_oversized_items_get_their_own_batch(self):
+        batches = plan_batches([100, 200], max_batch_tokens=64)
+        assert [b.tolist() for b in batches] == [[1], [0]]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_encode_in_buckets_keeps_order(self, workers):
+        texts = ["a" * (i * 7 % 31 + 1) for i in range(50)]
+
+        if workers == 1:
+            embeddings = encode_in_buckets(
+                padded_encode, texts, [len(t) for t in texts], 64, 8
+            )
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                embeddings = encode_in_buckets(
+                    padded_encode,
+                    texts,
+                    [len(t) for t in texts],
+                    64,
+                    8,
+                    map_batches=executor.map,
+                )
+
+        assert embeddings[:, 0].tolist() == [len(t) for t in texts]
+
+    def test_encode_nothing(self):
+        assert encode_in_buckets(fake_encode, [], []).shape == (0, 0)
@@ -0,0 +1,64 @@
+import asyncio
+
+import numpy as np
+from thechangelogbot.index.cache import EmbeddingCache
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(384, value, dtype=np.float32)
+
+
+class TestEmbeddingCache:
+    def test_key_normalizes_whitespace(self):
+        assert EmbeddingCache.key("bge", "q: ", " what  is\nbun ") == (
+            EmbeddingCache.key("bge", "q: ", "what is bun")
+        )
+        assert EmbeddingCache.key("bge", "", "bun") != (
+            EmbeddingCache.key("minilm", "", "bun")
+        )
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(max_bytes=3 * (384 * 4 + 1))
+        for key in "abc":
+            cache.put(key, vector(1))
+
+        assert cache.get("a") is not None
+        cache.put("d", vector(1))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert len(cache) == 3
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+    def test_ttl(self):
+        cache = EmbeddingCache(ttl=-1)
+        cache.put("a", vector(1))
+        assert cache.get("a") is None
+
+    def test_disk_tier(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        EmbeddingCache(path=path).put("a", vector(0.5))
+
+        cache = EmbeddingCache(path=path)
+        assert np.array_equal(cache.get("a"), vector(0.5))
+        assert cache.stats()["hit_rate"] == 1.0
+
+    def test_disk_entry_larger_than_memory(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        EmbeddingCache(path=path).put("a", vector(0.5))
+
+        cache = EmbeddingCache(max_bytes=100, path=path)
+        assert np.array_equal(cache.get("a"), vector(0.5))
+        assert len(cache) == 0
+
+    def test_async_disk_tier(self, tmp_path):
+        cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+
+        async def roundtrip():
+            await cache.aput("a", vector(0.5))
+            return await cache.aget("a"), await cache.aget("b")
+
+        hit, miss = asyncio.run(roundtrip())
+        assert np.array_equal(hit, vector(0.5))
+        assert miss is None
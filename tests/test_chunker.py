@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from thechangelogbot.index.chunker import (
+    chunk_snippet,
+    chunk_snippets,
+    chunk_text,
+    collapse_chunks,
+)
+from thechangelogbot.index.snapshot import SnapshotWriter, load_snapshot
+from thechangelogbot.index.snippet import Snippet
+
+TEXT = " ".join(
+    f"Sentence {i} talks about topic {i} for a bit." for i in range(10)
+)
+
+
+def make_turn(text: str = TEXT) -> Snippet:
+    return Snippet("gotime", 1, text, "Mat Ryer")
+
+
+class TestChunker:
+    def test_chunk_text(self):
+        chunks = chunk_text(TEXT, max_words=30, overlap_words=10)
+
+        assert len(chunks) == 5
+        assert all(len(chunk.split()) <= 30 for chunk in chunks)
+        assert chunks[0].startswith("Sentence 0") and chunks[0].endswith(".")
+        # one sentence of overlap between neighbouring chunks
+        assert chunks[1].startswith("Sentence 2")
+        assert chunks[-1].endswith("topic 9 for a bit.")
+
+    def test_long_sentences_are_split(self):
+        chunks = chunk_text(" ".join(["word"] * 25), 10, overlap_words=0)
+        assert [len(chunk.split()) for chunk in chunks] == [10, 10, 5]
+
+    def test_invalid_overlap(self):
+        with pytest.raises(ValueError):
+            chunk_text(TEXT, max_words=10, overlap_words=10)
+
+    def test_chunk_snippet(self):
+        turn = make_turn()
+        chunks = chunk_snippet(turn, max_words=30, overlap_words=10)
+
+        assert {chunk.parent_hash for chunk in chunks} == {turn._hash}
+        assert len({chunk._hash for chunk in chunks}) == len(chunks)
+        # chunking again yields the same hashes, so dedup keeps working
+        assert [c._hash for c in chunks] == [
+            c._hash for c in chunk_snippet(make_turn(), 30, 10)
+        ]
+        assert chunk_snippet(turn, max_words=100) == [turn]
+
+    def test_chunk_snippets_disabled(self):
+        turns = [make_turn()]
+        assert chunk_snippets(turns, None) == turns
+        assert chunk_snippets(turns, {"max_words": None}) == turns
+        assert (
+            len(chunk_snippets(turns, {"max_words": 30, "overlap_words": 10}))
+            > 1
+        )
+
+    def test_collapse_chunks(self):
+        first, second = make_turn(), make_turn("Another turn entirely.")
+        chunks = chunk_snippet(first, max_words=30, overlap_words=10)
+        results = [chunks[2], chunks[0], second, chunks[1]]
+
+        assert list(collapse_chunks(results, limit=5)) == [chunks[2], second]
+        assert list(collapse_chunks(results, limit=1)) == [chunks[2]]
+
+    def test_snapshot_keeps_parent(self, tmp_path):
+        turn = make_turn()
+        chunks = chunk_snippet(turn, max_words=30, overlap_words=10)
+        snippets = [Snippet("gotime", 2, "Whole turn.", "Mat Ryer"), *chunks]
+
+        with SnapshotWriter(tmp_path, vector_size=4) as writer:
+            for i, snippet in enumerate(snippets):
+                writer.add(snippet, np.eye(4, dtype=np.float32)[i % 4])
+            writer.commit()
+        index = load_snapshot(tmp_path)
+
+        assert [index.snippets[i] for i in range(len(index))] == snippets
+        assert index.snippets[0].parent_hash == ""
+        assert index.snippets[1].parent_hash == turn._hash
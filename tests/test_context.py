@@ -0,0 +1,72 @@
+from thechangelogbot.index.context import (
+    ContextBuilder,
+    count_words_as_tokens,
+    split_sentences,
+)
+from thechangelogbot.index.snippet import Snippet
+
+FILLER = " ".join(
+    f"Filler sentence number {i} about nothing." for i in range(40)
+)
+
+
+def snippet(text: str, episode_number: int = 1) -> Snippet:
+    return Snippet("practicalai", episode_number, text, "Daniel Whitenack")
+
+
+def context_tokens(builder: ContextBuilder, context: list[Snippet]) -> int:
+    return sum(builder.count_tokens([s._as_context()])[0] for s in context)
+
+
+class TestContextBuilder:
+    def test_split_sentences(self):
+        assert split_sentences("One. Two? Three! Four") == [
+            "One.",
+            "Two?",
+            "Three!",
+            "Four",
+        ]
+
+    def test_short_snippets_are_kept(self):
+        builder = ContextBuilder(max_tokens=1000)
+        snippets = [
+            snippet("A short answer about embeddings.", i) for i in range(3)
+        ]
+        assert builder.build("embeddings", snippets) == snippets
+
+    def test_budget(self):
+        builder = ContextBuilder(max_tokens=300, max_snippet_tokens=200)
+        snippets = [snippet(FILLER, i) for i in range(5)]
+        context = builder.build("anything", snippets)
+
+        assert 1 <= len(context) < 5
+        assert context_tokens(builder, context) <= 300 + 5 * len(context)
+        assert [s.episode_number for s in context] == list(range(len(context)))
+
+    def test_trim_around_the_question(self):
+        text = f"{FILLER} Quantized embeddings use int8 codes. {FILLER}"
+        original = snippet(text)
+        builder = ContextBuilder(max_tokens=1000, max_snippet_tokens=120)
+        (trimmed,) = builder.build("how are embeddings quantized?", [original])
+
+        assert "Quantized embeddings use int8 codes." in trimmed.text
+        assert trimmed.text.startswith("...") and trimmed.text.endswith("...")
+        assert trimmed._hash == original._hash
+        assert count_words_as_tokens([trimmed.text])[0] <= 120
+
+    def test_tokenization_is_cached(self):
+        calls = []
+
+        def count_tokens(texts):
+            calls.append(texts)
+            return count_words_as_tokens(texts)
+
+        builder = ContextBuilder(count_tokens=count_tokens)
+        snippets = [snippet("Some text. More text.")]
+        builder.build("text", snippets)
+        builder.build("text", snippets)
+
+        sentence_calls = [
+            c for c in calls if c == ["Some text.", "More text."]
+        ]
+        assert len(sentence_calls) == 1
@@ -0,0 +1,164 @@
+import pytest
+from thechangelogbot.index.database import (
+    LIVE_FILTER,
+    check_filter_values,
+    get_listener_embeddings,
+    get_live_snippets,
+    get_uploaded_hashes,
+    new_records,
+    search_mongo,
+)
+
+
+class FakeDocument(dict):
+    def unpack(self) -> dict:
+        return dict(self)
+
+
+class FakeQuery:
+    def __init__(self, calls: list, name: str, *args):
+        calls.append((name, *args))
+        self.calls = calls
+
+    def find(self, *args) -> "FakeQuery":
+        return FakeQuery(self.calls, "find", *args)
+
+    def like(self, r: dict, n: int, vector_index: str) -> "FakeQuery":
+        return FakeQuery(self.calls, "like", n)
+
+
+class FakeDatabase:
+    def __init__(self, docs: list[dict]):
+        self.docs = docs
+
+    def execute(self, query: FakeQuery) -> list[FakeDocument]:
+        return [FakeDocument(doc) for doc in self.docs]
+
+
+def make_doc(i: int, **extra) -> dict:
+    return {
+        "podcast": "gotime",
+        "episode_number": i,
+        "text": f"snippet {i}",
+        "speaker": "Jerod Santo",
+        "_hash": f"hash-{i}",
+        **extra,
+    }
+
+
+class TestSearchMongo:
+    def test_unfiltered_search_skips_tombstones(self):
+        calls: list = []
+        docs = [
+            make_doc(0),
+            make_doc(1, _tombstone=True),
+            make_doc(2),
+            make_doc(3),
+        ]
+        results = list(
+            search_mongo(
+                query="bun",
+                db=FakeDatabase(docs),
+                index_id="index",
+                collection=FakeQuery(calls, "collection"),
+                limit=2,
+            )
+        )
+
+        assert [s._hash for s in results] == ["hash-0", "hash-2"]
+        # the whole vector index is searched, not a prefiltered id scan
+        assert calls == [("collection",), ("like", 4)]
+
+    def test_filtered_search_prefilters_live_snippets(self):
+        calls: list = []
+        list(
+            search_mongo(
+                query="bun",
+                db=FakeDatabase([make_doc(0)]),
+                index_id="index",
+                collection=FakeQuery(calls, "collection"),
+                list_of_filters={"podcast": "gotime"},
+            )
+        )
+
+        assert calls[1] == ("find", {**LIVE_FILTER, "podcast": "gotime"})
+        assert calls[2] == ("like", 4)
+
+    def test_integer_filters_are_checked(self):
+        check_filter_values({"episode_number": "42"})
+        check_filter_values({"episode_number": "4."}, filter_mode="regex")
+
+        with pytest.raises(ValueError, match="episode_number"):
+            list(
+                search_mongo(
+                    query="bun",
+                    db=FakeDatabase([]),
+                    index_id="index",
+                    collection=FakeQuery([], "collection"),
+                    list_of_filters={"episode_number": "latest"},
+                )
+            )
+
+
+class TestUploadedHashes:
+    def test_only_looks_up_the_given_hashes(self):
+        calls: list = []
+        uploaded = get_uploaded_hashes(
+            FakeDatabase([{"_hash": "hash-1"}]),
+            FakeQuery(calls, "collection"),
+            hashes=["hash-1", "hash-2"],
+        )
+
+        assert uploaded == {"hash-1"}
+        assert calls[1] == (
+            "find",
+            {"_hash": {"$in": ["hash-1", "hash-2"]}},
+            {"_hash": 1},
+        )
+
+    def test_new_records_skip_uploaded_and_repeated_hashes(self):
+        data = [
+            make_doc(0),
+            make_doc(1),
+            make_doc(1, speaker="Adam"),
+            make_doc(2),
+        ]
+        records = new_records(data, existing_hashes={"hash-0"})
+
+        assert [r["_hash"] for r in records] == ["hash-1", "hash-2"]
+        assert records[0]["speaker"] == "Jerod Santo"
+
+
+class TestLiveSnippets:
+    def test_listener_outputs_are_not_fetched(self):
+        calls: list = []
+        snippets = list(
+            get_live_snippets(
+                FakeDatabase([make_doc(0)]), FakeQuery(calls, "collection")
+            )
+        )
+
+        assert [s._hash for s in snippets] == ["hash-0"]
+        name, query, projection = calls[1]
+        assert (name, query) == ("find", LIVE_FILTER)
+        assert "_hash" in projection and "text" in projection
+        assert not any(field.startswith("_outputs") for field in projection)
+
+    def test_listener_embeddings_by_hash(self):
+        calls: list = []
+        docs = [
+            {"_hash": "hash-1", "_outputs": {"text": {"my-model": [1, 2]}}},
+            {"_hash": "hash-2"},
+        ]
+        embeddings = get_listener_embeddings(
+            FakeDatabase(docs),
+            FakeQuery(calls, "collection"),
+            ["hash-1", "hash-2"],
+        )
+
+        assert embeddings == {"hash-1": [1, 2]}
+        assert calls[1] == (
+            "find",
+            {"_hash": {"$in": ["hash-1", "hash-2"]}},
+            {"_hash": 1, "_outputs.text.my-model": 1},
+        )
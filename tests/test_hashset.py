@@ -0,0 +1,35 @@
+from hashlib import md5
+
+from thechangelogbot.index.hashset import HashSet
+
+
+def make_hashes(start: int, stop: int) -> list[str]:
+    return [md5(str(i).encode()).hexdigest() for i in range(start, stop)]
+
+
+class TestHashSet:
+    def test_contains(self):
+        hashes = make_hashes(0, 100)
+        hash_set = HashSet.from_hashes(hashes[:50] + hashes[:10])
+
+        assert len(hash_set) == 50
+        assert hashes[0] in hash_set
+        assert hashes[99] not in hash_set
+        assert hash_set.contains(hashes).tolist() == [True] * 50 + [False] * 50
+
+    def test_trailing_zero_bytes(self):
+        hashes = ["ab" * 15 + "00", "ab" * 15 + "01", "00" * 16]
+        hash_set = HashSet.from_hashes(hashes[:1])
+        assert hash_set.contains(hashes).tolist() == [True, False, False]
+
+    def test_add_save_load(self, tmp_path):
+        path = str(tmp_path / "hashes.npy")
+        assert len(HashSet.load(path)) == 0
+
+        hash_set = HashSet.from_hashes(make_hashes(0, 10))
+        hash_set.add(make_hashes(5, 20))
+        hash_set.save(path)
+
+        loaded = HashSet.load(path)
+        assert len(loaded) == 20
+        assert loaded.contains(make_hashes(15, 25)).sum() == 5
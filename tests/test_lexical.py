@@ -0,0 +1,76 @@
+import numpy as np
+from thechangelogbot.index.lexical import LexicalIndex, tokenize
+from thechangelogbot.index.memory import MemoryIndex, reciprocal_rank_fusion
+from thechangelogbot.index.snippet import Snippet
+
+TEXTS = [
+    "We rewrote the build in Bun and it is fast",
+    "SQLite is the most deployed database in the world",
+    "Running k8s clusters is hard, k8s everywhere",
+    "Bun ships with a SQLite driver built in",
+]
+
+
+def make_index() -> MemoryIndex:
+    snippets = [
+        Snippet("jsparty", i, text, "Jerod Santo" if i % 2 else "Amal")
+        for i, text in enumerate(TEXTS)
+    ]
+    return MemoryIndex(
+        embeddings=np.eye(4, dtype=np.float32), snippets=snippets
+    )
+
+
+class TestLexicalIndex:
+    def test_tokenize(self):
+        assert tokenize("What is K8s, SQLite and Bun?") == [
+            "k8s",
+            "sqlite",
+            "bun",
+        ]
+
+    def test_postings_are_delta_encoded(self):
+        index = LexicalIndex.from_texts(TEXTS)
+        rows, frequencies = index.postings("bun")
+
+        assert rows.tolist() == [0, 3]
+        assert frequencies.tolist() == [1, 1]
+        assert index.postings("k8s")[1].tolist() == [2]
+        assert index.postings("deno")[0].tolist() == []
+
+        start = index.offsets[np.searchsorted(index.terms, b"sqlite")]
+        assert index.deltas[start : start + 2].tolist() == [1, 2]
+
+    def test_bm25(self):
+        scores = LexicalIndex.from_texts(TEXTS).scores("bun sqlite")
+        assert np.argmax(scores) == 3
+        assert (scores > 0).tolist() == [True, True, False, True]
+        assert LexicalIndex.from_texts(TEXTS).scores("deno").max() == 0
+
+    def test_reciprocal_rank_fusion(self):
+        rows = reciprocal_rank_fusion(
+            [np.array([1, 2, 3]), np.array([3, 1])], 2
+        )
+        assert rows.tolist() == [1, 3]
+
+    def test_search_modes(self):
+        index = make_index()
+        results = index.search(None, limit=4, query="k8s", mode="lexical")
+        assert [r.episode_number for r in results] == [2]
+
+        results = index.search(
+            np.array([0.5, 0, 0, 1]),
+            limit=2,
+            query="sqlite driver",
+            mode="hybrid",
+        )
+        assert [r.episode_number for r in results] == [3, 1]
+
+        results = index.search(
+            None,
+            limit=4,
+            query="sqlite",
+            mode="lexical",
+            list_of_filters={"speaker": "Jerod Santo"},
+        )
+        assert [r.episode_number for r in results] == [1, 3]
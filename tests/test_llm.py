@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from thechangelogbot.index.llm import (
+    LLMBackend,
+    OpenAIBackend,
+    StubBackend,
+    astream_chat_completion,
+    get_llm_backend,
+)
+
+TOKENS = ["I ", "think ", "embeddings ", "are ", "neat."]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    token_delay = 0.01
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        assert body["stream"] is True
+        assert self.path == "/v1/chat/completions"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunks = [{"role": "assistant"}] + [{"content": t} for t in TOKENS]
+        for delta in chunks:
+            event = json.dumps({"choices": [{"delta": delta}]})
+            self.write_chunk(f"data: {event}\n\n")
+            time.sleep(self.token_delay)
+        self.write_chunk("data: [DONE]\n\n")
+        self.write_chunk("")
+
+    def write_chunk(self, text: str) -> None:
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture(scope="module")
+def api_base():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLMHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+async def collect(api_base: str, client=None) -> str:
+    return "".join(
+        [
+            text
+            async for text in astream_chat_completion(
+                messages=[{"role": "user", "content": "hi"}],
+                model="fake",
+                api_base=api_base,
+                client=client,
+            )
+        ]
+    )
+
+
+class TestLLM:
+    def test_stream(self, api_base):
+        assert asyncio.run(collect(api_base)) == "".join(TOKENS)
+
+    def test_concurrent_streams(self, api_base):
+        count, started = 50, 0
+
+        async def collect_together(client, all_started) -> str:
+            nonlocal started
+            texts: list[str] = []
+            async for text in astream_chat_completion(
+                messages=[{"role": "user", "content": "hi"}],
+                model="fake",
+                api_base=api_base,
+                client=client,
+            ):
+                if not texts:
+                    started += 1
+                    if started == count:
+                        all_started.set()
+                    # only finishes if every stream is in flight at once
+                    await asyncio.wait_for(all_started.wait(), timeout=30)
+                texts.append(text)
+            return "".join(texts)
+
+        async def run() -> list[str]:
+            all_started = asyncio.Event()
+            async with httpx.AsyncClient() as client:
+                return await asyncio.gather(
+                    *[
+                        collect_together(client, all_started)
+                        for _ in range(count)
+                    ]
+                )
+
+        assert asyncio.run(run()) == ["".join(TOKENS)] * count
+
+    def test_openai_backend(self, api_base):
+        backend = OpenAIBackend(model="fake", api_base=api_base)
+        messages = [{"role": "user", "content": "hi"}]
+
+        async def collect_twice() -> list[str]:
+            # the second request reuses the pooled connection
+            return [
+                "".join([t async for t in backend.astream(messages)])
+                for _ in range(2)
+            ]
+
+        assert asyncio.run(collect_twice()) == ["".join(TOKENS)] * 2
+
+    def test_stub_backend(self):
+        backend = get_llm_backend(
+            {"llm": {"backend": "stub", "stub": {"tokens_per_second": 200}}}
+        )
+        assert isinstance(backend, StubBackend)
+
+        messages = [
+            {"role": "user", "content": "QUESTION\n----\nWhat is Bun?"}
+        ]
+
+        async def collect(backend: StubBackend) -> str:
+            return "".join([t async for t in backend.astream(messages)])
+
+        start_time = time.perf_counter()
+        answer = asyncio.run(collect(backend))
+        elapsed = time.perf_counter() - start_time
+
+        assert answer == "This is a stub answer to: What is Bun? "
+        assert answer == asyncio.run(collect(StubBackend(tokens_per_second=0)))
+        assert elapsed >= 8 / 200
+
+    def test_backends_must_stream(self):
+        with pytest.raises(TypeError):
+            LLMBackend()
+
+    def test_openai_backend_needs_key(self, monkeypatch):
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+            get_llm_backend({"llm": {"backend": "openai"}})
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from thechangelogbot.index.filters import FilterIndex
+from thechangelogbot.index.memory import MemoryIndex, top_k
+from thechangelogbot.index.snippet import Snippet
+
+
+def make_index(dtype: str = "float32") -> MemoryIndex:
+    snippets = [
+        Snippet(
+            podcast="podcast",
+            episode_number=i,
+            text=f"snippet number {i}",
+            speaker="Adam Stacoviak" if i % 2 else "Jerod Santo",
+        )
+        for i in range(4)
+    ]
+    embeddings = np.eye(4, dtype=np.float32) * 3
+    return MemoryIndex(embeddings=embeddings, snippets=snippets, dtype=dtype)
+
+
+class TestMemoryIndex:
+    def test_top_k_is_sorted(self):
+        scores = np.array([0.1, 0.9, 0.5, 0.7])
+        assert top_k(scores, 3).tolist() == [1, 3, 2]
+        assert top_k(scores, 10).tolist() == [1, 3, 2, 0]
+
+    def test_rows_are_normalized(self):
+        index = make_index()
+        assert np.allclose(np.linalg.norm(index.embeddings, axis=1), 1)
+
+    def test_search(self):
+        index = make_index()
+        query = np.array([0.1, 0.2, 0.9, 0.0])
+        results = list(index.search(query, limit=2))
+        assert [r.episode_number for r in results] == [2, 1]
+
+    def test_search_float16(self):
+        index = make_index(dtype="float16")
+        query = np.array([0.0, 0.0, 0.1, 0.9])
+        results = list(index.search(query, limit=1))
+        assert results[0].episode_number == 3
+
+    def test_search_with_filters(self):
+        index = make_index()
+        query = np.array([0.1, 0.2, 0.9, 0.0])
+        results = list(
+            index.search(
+                query, limit=2, list_of_filters={"speaker": "Jerod Santo"}
+            )
+        )
+        assert [r.episode_number for r in results] == [2, 0]
+
+        results = list(
+            index.search(query, limit=2, list_of_filters={"speaker": "Jerod"})
+        )
+        assert results == []
+
+        results = list(
+            index.search(
+                query,
+                limit=2,
+                list_of_filters={"speaker": "Jerod"},
+                filter_mode="regex",
+            )
+        )
+        assert [r.episode_number for r in results] == [2, 0]
+
+    def test_filter_index(self):
+        index = make_index()
+        filter_index = FilterIndex.from_snippets(index.snippets)
+
+        rows = filter_index.rows({"speaker": "Adam Stacoviak"})
+        assert rows.tolist() == [1, 3]
+
+        rows = filter_index.rows(
+            {"speaker": "Adam Stacoviak", "episode_number": "3"}
+        )
+        assert rows.tolist() == [3]
+
+        rows = filter_index.rows({"speaker": "^(Adam|Jerod)"}, mode="regex")
+        assert rows.tolist() == [0, 1, 2, 3]
+
+        rows = index.filter_rows({"text": "number [12]"}, mode="regex")
+        assert rows.tolist() == [1, 2]
+
+    @pytest.mark.parametrize("dtype", ["float32", "float16"])
+    def test_batch_vector_rows(self, dtype):
+        rng = np.random.default_rng(0)
+        embeddings = rng.standard_normal((300, 8))
+        snippets = [Snippet("podcast", i, "text", "Adam") for i in range(300)]
+        index = MemoryIndex(
+            embeddings=embeddings, snippets=snippets, dtype=dtype
+        )
+        queries = rng.standard_normal((40, 8)).astype(np.float32)
+
+        rows = index.batch_vector_rows(queries, limit=5)
+        assert len(rows) == 40
+        for query, query_rows in zip(queries, rows):
+            assert np.array_equal(query_rows, index.vector_rows(query, 5))
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from thechangelogbot.api.profiler import SamplingProfiler
+from thechangelogbot.index.metrics import (
+    METRICS,
+    STAGE_SECONDS,
+    Histogram,
+    MetricsRegistry,
+)
+from thechangelogbot.index.timing import record_timing
+
+
+def busy_loop(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestMetrics:
+    def test_histogram(self):
+        histogram = Histogram(buckets=[0.1, 1.0])
+        for value in [0.05, 0.1, 0.5, 2.0]:
+            histogram.observe(value)
+
+        assert histogram.count == 4
+        assert histogram.samples() == ([2, 3, 4], 2.65)
+
+    def test_render(self):
+        registry = MetricsRegistry()
+        registry.histogram("latency_seconds", "Latency", [0.1], stage="a")
+        registry.histogram("latency_seconds", stage="a").observe(0.05)
+        registry.counter("rejected_total", "Rejected", endpoint='x"y').inc()
+
+        assert registry.render().splitlines() == [
+            "# HELP latency_seconds Latency",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{stage="a",le="0.1"} 1',
+            'latency_seconds_bucket{stage="a",le="+Inf"} 1',
+            'latency_seconds_sum{stage="a"} 0.05',
+            'latency_seconds_count{stage="a"} 1',
+            "# HELP rejected_total Rejected",
+            "# TYPE rejected_total counter",
+            'rejected_total{endpoint="x\\"y"} 1',
+        ]
+
+    def test_concurrent_observations(self):
+        histogram = Histogram()
+
+        def observe():
+            for _ in range(10000):
+                histogram.observe(0.001)
+
+        threads = [threading.Thread(target=observe) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert histogram.count == 40000
+
+    def test_record_timing_observes_stage(self):
+        histogram = METRICS.histogram(STAGE_SECONDS, stage="test_stage")
+        count = histogram.count
+
+        record_timing(None, "test_stage", time.perf_counter())
+        assert histogram.count == count + 1
+        assert 'stage="test_stage"' in METRICS.render()
+
+    def test_sampling_profiler(self):
+        profiler = SamplingProfiler(interval_ms=1).start()
+        busy_loop(0.1)
+        samples = profiler.stop()
+
+        assert sum(samples.values()) > 0
+        assert any("busy_loop" in stack for stack in samples)
+        assert "test_sampling_profiler" in profiler.folded()
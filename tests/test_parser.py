@@ -0,0 +1,89 @@
+import json
+from dataclasses import asdict
+
+from thechangelogbot.index.parser import (
+    index_snippet_batches,
+    index_snippets,
+    parse_episode_text,
+)
+
+EPISODE = """**Adam Stacoviak:** \\[00:01\\] Welcome back to the show, today we are talking about {topic} with a very special guest who has been building things for a really long time.
+
+And this is the second paragraph of the same turn.
+
+**Break:** \\[01:00\\] This is a break that is long enough to be kept if it were not a break, so it should be filtered out by the parser no matter what.
+
+**Jerod Santo:** Short answer.
+
+**Jerod Santo:** \\[02:13\\] A longer answer about {topic} that has more than enough words in it to make it past the minimum word count filter of the parser.
+"""
+
+
+def write_repo(directory, podcasts: int = 2, episodes: int = 3):
+    for p in range(podcasts):
+        podcast_directory = directory / f"podcast{p}"
+        podcast_directory.mkdir()
+        for e in range(episodes):
+            (podcast_directory / f"podcast{p}-{e + 1}.md").write_text(
+                EPISODE.format(topic=f"topic {p} {e}")
+            )
+    (directory / ".github").mkdir()
+    return directory
+
+
+class TestParser:
+    def test_parse_episode_text(self):
+        snippets = parse_episode_text(
+            EPISODE.format(topic="sqlite"), episode_number=1, podcast="news"
+        )
+        assert [s.speaker for s in snippets] == [
+            "Adam Stacoviak",
+            "Jerod Santo",
+        ]
+        assert snippets[0].text.startswith("Welcome back")
+        assert snippets[0].text.endswith("second paragraph of the same turn.")
+        assert "\\[" not in snippets[1].text
+
+    def test_hashes_are_stable(self):
+        # hashes dedup snippets already in the database, they must not drift
+        snippets = parse_episode_text(
+            EPISODE.format(topic="sqlite"), episode_number=1, podcast="news"
+        )
+        assert [s._hash for s in snippets] == [
+            "c79a9492b5cba0fbcd1e44f73dc8204b",
+            "4a6b21e9d268dd416dc9cde6f3dc786a",
+        ]
+
+    def test_speaker_without_space(self):
+        text = "**Mat Ryer:**word" + " word" * 30
+        snippets = parse_episode_text(text, episode_number=1, podcast="go")
+        assert snippets[0].speaker == "Mat Ryer"
+        assert snippets[0].text.startswith("**Mat Ryer:**word word")
+
+    def test_parallel_matches_serial(self, tmp_path):
+        directory = str(write_repo(tmp_path))
+        serial = list(index_snippets(directory))
+        parallel = list(index_snippets(directory, workers=2))
+
+        assert len(serial) == 12
+        assert sorted(s._hash for s in serial) == sorted(
+            s._hash for s in parallel
+        )
+
+    def test_batches(self, tmp_path):
+        directory = str(write_repo(tmp_path))
+        batches = list(
+            index_snippet_batches(
+                directory, podcast_filter=["podcast1"], batch_size=4
+            )
+        )
+        assert [len(b) for b in batches] == [4, 2]
+        assert {s.podcast for b in batches for s in b} == {"podcast1"}
+
+    def test_snippet_json(self):
+        snippet = parse_episode_text(
+            EPISODE.format(topic="café"), episode_number=7, podcast="news"
+        )[0]
+
+        assert json.loads(snippet._as_json()) == asdict(snippet)
+        assert "café" in snippet._as_json()
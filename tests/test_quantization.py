@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from thechangelogbot.index.memory import MemoryIndex, normalize_rows
+from thechangelogbot.index.quantization import (
+    POPCOUNT,
+    QuantizedVectors,
+    binarize,
+    hamming_distances,
+    quantize,
+    quantize_int8,
+)
+from thechangelogbot.index.snapshot import SnapshotWriter, load_snapshot
+from thechangelogbot.index.snippet import Snippet
+
+
+def vectors(count: int, dim: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return normalize_rows(rng.standard_normal((count, dim)))
+
+
+def snippets(count: int) -> list[Snippet]:
+    return [
+        Snippet("shipit", i, f"snippet {i}", "Gerhard") for i in range(count)
+    ]
+
+
+class TestQuantization:
+    def test_int8_roundtrip(self):
+        embeddings = vectors(100)
+        codes, scales = quantize_int8(embeddings)
+
+        assert codes.dtype == np.int8
+        assert np.abs(codes).max() == 127
+        assert np.allclose(codes * scales[:, None], embeddings, atol=0.01)
+
+    def test_hamming_distances(self):
+        codes = binarize(vectors(50))
+        query_bits = binarize(vectors(1, seed=1)[0])
+
+        expected = POPCOUNT[codes ^ query_bits].sum(axis=1)
+        assert np.array_equal(hamming_distances(codes, query_bits), expected)
+        assert hamming_distances(codes[:1], codes[0]).tolist() == [0]
+
+    @pytest.mark.parametrize("quantization", ["int8", "binary"])
+    def test_rescoring_is_exact(self, quantization):
+        embeddings = vectors(500)
+        index = MemoryIndex(embeddings, snippets(500), normalized=True)
+        expected = index.vector_rows(embeddings[3], 5)
+
+        index.quantized = QuantizedVectors.from_embeddings(
+            embeddings, quantization, rescore=100
+        )
+        assert np.array_equal(index.vector_rows(embeddings[3], 5), expected)
+
+        index.quantized.rescore = 0
+        assert index.vector_rows(embeddings[3], 1).tolist() == [3]
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        embeddings = vectors(200)
+        with SnapshotWriter(
+            tmp_path, vector_size=64, quantization={"type": "int8"}
+        ) as writer:
+            writer.add_all(zip(snippets(200), embeddings))
+            writer.commit()
+
+        index = load_snapshot(tmp_path)
+        assert index.quantized.quantization == "int8"
+        assert index.quantized.codes.nbytes == 200 * 64
+        results = list(index.search(embeddings[9], limit=1))
+        assert results[0].episode_number == 9
+
+    def test_invalid_quantization(self):
+        assert quantize(vectors(2), None) is None
+        with pytest.raises(ValueError, match="int4"):
+            quantize(vectors(2), {"type": "int4"})
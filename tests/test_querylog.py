@@ -0,0 +1,34 @@
+from thechangelogbot.api.querylog import QueryLog, read_query_log
+
+
+def entry(i: int) -> dict:
+    return {"endpoint": "/search", "request": {"query": f"bün {i}"}}
+
+
+class TestQueryLog:
+    def test_entries_are_written_in_order(self, tmp_path):
+        path = tmp_path / "logs" / "queries.jsonl"
+        log = QueryLog(str(path), flush_interval=0.01)
+        for i in range(100):
+            log.record(entry(i))
+        log.close()
+
+        assert list(read_query_log(str(path))) == [
+            entry(i) for i in range(100)
+        ]
+
+    def test_rotation(self, tmp_path):
+        path = tmp_path / "queries.jsonl"
+        log = QueryLog(str(path), max_bytes=200, backups=2, flush_interval=0)
+        for i in range(30):
+            log.record(entry(i))
+        log.close()
+
+        rotated = sorted(p.name for p in tmp_path.iterdir())
+        assert rotated == [
+            "queries.jsonl",
+            "queries.jsonl.1",
+            "queries.jsonl.2",
+        ]
+        assert all(p.stat().st_size < 200 + 50 for p in tmp_path.iterdir())
+        assert list(read_query_log(str(path)))[-1] == entry(29)
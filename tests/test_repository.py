@@ -0,0 +1,102 @@
+import pytest
+from git.repo import Repo
+from thechangelogbot.index.repository import (
+    changed_episode_files,
+    read_state,
+    update_repository,
+    write_state,
+)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    bare = Repo.init(tmp_path / "upstream.git", bare=True)
+    work = Repo.clone_from(bare.working_dir, tmp_path / "work")
+    work.config_writer().set_value("user", "name", "test").release()
+    work.config_writer().set_value("user", "email", "test@test").release()
+
+    def commit(files: dict, message: str) -> str:
+        for path, text in files.items():
+            file = tmp_path / "work" / path
+            if text is None:
+                work.index.remove([path], working_tree=True)
+                continue
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_text(text)
+            work.index.add([path])
+        work.index.commit(message)
+        work.remotes.origin.push(work.active_branch.name)
+        return work.head.commit.hexsha
+
+    return bare.working_dir, commit
+
+
+class TestRepository:
+    def test_state_roundtrip(self, tmp_path):
+        state_file = str(tmp_path / "state" / "indexing.json")
+        assert read_state(state_file) == {}
+        write_state(state_file, {"commit": "abc"})
+        assert read_state(state_file) == {"commit": "abc"}
+
+    def test_changed_episode_files(self, tmp_path, upstream):
+        git_url, commit = upstream
+        first = commit(
+            {
+                "gotime/gotime-1.md": "one",
+                "gotime/gotime-2.md": "two",
+                "jsparty/jsparty-1.md": "one",
+                "README.md": "readme",
+            },
+            "first",
+        )
+
+        checkout = str(tmp_path / "checkout")
+        repo = update_repository(checkout, git_url)
+        assert repo.head.commit.hexsha == first
+
+        second = commit(
+            {
+                "gotime/gotime-1.md": "one, edited",
+                "gotime/gotime-2.md": None,
+                "gotime/gotime-3.md": "three",
+                "jsparty/jsparty-1.md": "one, edited",
+                "README.md": "readme, edited",
+            },
+            "second",
+        )
+
+        repo = update_repository(checkout, git_url)
+        assert repo.head.commit.hexsha == second
+
+        changed, touched = changed_episode_files(
+            repo, first, second, podcast_filter=["gotime"]
+        )
+        assert sorted(p.name for p in changed) == [
+            "gotime-1.md",
+            "gotime-3.md",
+        ]
+        assert all(p.is_file() for p in changed)
+        assert touched == {("gotime", 1), ("gotime", 2), ("gotime", 3)}
+
+    def test_unknown_commit_falls_back_to_full_parse(self, tmp_path, upstream):
+        git_url, commit = upstream
+        head = commit({"gotime/gotime-1.md": "one"}, "first")
+        repo = update_repository(str(tmp_path / "checkout"), git_url)
+
+        for old_commit in ["0" * 40, "not-a-commit"]:
+            changed, touched = changed_episode_files(repo, old_commit, head)
+            assert changed is None
+            assert touched == set()
+
+    def test_detached_head_is_cloned_again(self, tmp_path, upstream):
+        git_url, commit = upstream
+        first = commit({"gotime/gotime-1.md": "one"}, "first")
+        second = commit({"gotime/gotime-2.md": "two"}, "second")
+
+        checkout = str(tmp_path / "checkout")
+        repo = update_repository(checkout, git_url)
+        repo.git.checkout(first)
+
+        repo = update_repository(checkout, git_url)
+        assert repo.head.commit.hexsha == second
+        assert not repo.head.is_detached
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+from thechangelogbot.index.rerank import Reranker
+from thechangelogbot.index.snippet import Snippet
+from thechangelogbot.index.timing import server_timing
+
+
+class FakeReranker(Reranker):
+    def __init__(self, pair_ms: float, **kwargs):
+        super().__init__("fake", **kwargs)
+        self.fake_pair_ms = pair_ms
+        self.scored: list[int] = []
+
+    def load(self) -> None:
+        pass
+
+    def score(self, query, snippets) -> np.ndarray:
+        time.sleep(self.fake_pair_ms * len(snippets) / 1000)
+        self.scored.append(len(snippets))
+        # prefers snippets mentioning the query
+        return np.array([query in snippet.text for snippet in snippets], float)
+
+
+def snippets() -> list[Snippet]:
+    texts = ["go", "rust", "zig", "bun", "deno", "node"]
+    return [Snippet("gotime", i, t, "Mat Ryer") for i, t in enumerate(texts)]
+
+
+class TestReranker:
+    def test_rerank(self):
+        reranker = FakeReranker(pair_ms=1, candidates=6, budget_ms=None)
+        timings: dict = {}
+        results = reranker.rerank("bun", snippets(), limit=2, timings=timings)
+
+        assert [r.text for r in results] == ["bun", "go"]
+        assert timings["reranked"] == 6
+        assert "rerank;dur=" in server_timing(timings)
+
+    def test_budget_truncates_and_skips(self):
+        reranker = FakeReranker(pair_ms=5, candidates=6, budget_ms=40)
+        reranker.rerank("bun", snippets(), limit=2)
+        assert reranker.pair_ms >= 5
+
+        # 20ms of the budget is gone, ~4 pairs still fit
+        results = reranker.rerank("zig", snippets(), limit=2, elapsed_ms=20)
+        assert 1 < reranker.scored[-1] < 6
+        assert results[0].text == "zig"
+
+        timings: dict = {}
+        results = reranker.rerank(
+            "bun", snippets(), limit=2, elapsed_ms=40, timings=timings
+        )
+        assert timings["reranked"] == 0
+        assert [r.text for r in results] == ["go", "rust"]
+
+    def test_inflated_estimate_recovers(self):
+        reranker = FakeReranker(pair_ms=1, candidates=6, budget_ms=150)
+        # e.g. a first rerank that also paid for loading the model
+        reranker.pair_ms = 100.0
+
+        for _ in range(20):
+            reranker.rerank("bun", snippets(), limit=2)
+
+        assert reranker.scored and reranker.scored[-1] == 6
+        assert reranker.pair_ms < 10
@@ -0,0 +1,104 @@
+import time
+
+import numpy as np
+import pytest
+from thechangelogbot.index.snapshot import (
+    SnapshotWatcher,
+    SnapshotWriter,
+    get_current_snapshot,
+    load_snapshot,
+)
+from thechangelogbot.index.snippet import Snippet
+
+
+def make_items(count: int, offset: int = 0) -> list:
+    return [
+        (
+            Snippet(
+                podcast="gotime" if i % 2 else "jsparty",
+                episode_number=i,
+                text=f"This is snippet \\[01:0{i % 10}\\] number {i}",
+                speaker="Adam Stacoviak" if i % 3 else "Jerod Santo",
+            ),
+            np.eye(4, dtype=np.float32)[(i + offset) % 4] * 2,
+        )
+        for i in range(count)
+    ]
+
+
+def write(directory, items) -> None:
+    with SnapshotWriter(directory, vector_size=4) as writer:
+        writer.add_all(items)
+        writer.commit()
+
+
+class TestSnapshot:
+    def test_roundtrip(self, tmp_path):
+        items = make_items(6)
+        write(tmp_path, items)
+        index = load_snapshot(tmp_path)
+
+        assert len(index) == 6
+        assert not index.embeddings.flags.writeable
+        assert np.allclose(np.linalg.norm(index.embeddings, axis=1), 1)
+
+        for row, (snippet, _) in enumerate(items):
+            assert index.snippets[row] == snippet
+
+        results = list(index.search(np.array([0, 0, 1, 0]), limit=1))
+        assert [r.episode_number for r in results] == [2]
+
+        rows = index.filter_rows(
+            {"speaker": "Jerod Santo", "podcast": "gotime"}
+        )
+        assert rows.tolist() == [3]
+
+        assert isinstance(index.lexical_index.deltas, np.memmap)
+        results = list(
+            index.search(None, limit=1, query="number 4", mode="lexical")
+        )
+        assert [r.episode_number for r in results] == [4]
+
+    def test_stored_hashes_roundtrip(self, tmp_path, monkeypatch):
+        items = make_items(3)
+        items[1][0]._hash = "f" * 32
+        items[2][0].parent_hash = items[0][0]._hash
+        write(tmp_path, items)
+        index = load_snapshot(tmp_path)
+
+        # rows are read back as stored, not hashed and cleaned again
+        monkeypatch.setattr(Snippet, "__post_init__", None)
+        for row, (snippet, _) in enumerate(items):
+            stored = index.snippets[row]
+            assert stored._hash == snippet._hash
+            assert stored.parent_hash == snippet.parent_hash
+            assert stored.word_count == snippet.word_count
+
+    def test_failed_write_keeps_current(self, tmp_path):
+        write(tmp_path, make_items(2))
+        current = get_current_snapshot(tmp_path)
+
+        with pytest.raises(ValueError):
+            write(tmp_path, [(make_items(1)[0][0], np.ones(3))])
+
+        assert get_current_snapshot(tmp_path) == current
+        assert not [p for p in tmp_path.iterdir() if p.name.startswith(".tmp")]
+
+    def test_hot_swap(self, tmp_path):
+        write(tmp_path, make_items(2))
+        watcher = SnapshotWatcher(tmp_path, check_interval=0)
+        assert len(watcher.get()) == 2
+
+        write(tmp_path, make_items(5, offset=1))
+        assert len(watcher.get()) == 5
+        assert watcher.reload() is False
+
+    def test_background_swap(self, tmp_path):
+        write(tmp_path, make_items(2))
+        watcher = SnapshotWatcher(tmp_path, check_interval=0.01).start()
+        write(tmp_path, make_items(5, offset=1))
+
+        deadline = time.monotonic() + 5
+        while len(watcher.get()) != 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(watcher.get()) == 5
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from thechangelogbot.index.snippet import Snippet
+from thechangelogbot.index.store import EmbeddingStore, embed_with_store
+
+
+def make_snippets(count: int, offset: int = 0) -> list[Snippet]:
+    return [
+        Snippet("gotime", i, f"snippet number {i}", "Mat Ryer")
+        for i in range(offset, offset + count)
+    ]
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.encoded: list[str] = []
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        self.encoded.extend(texts)
+        return np.array(
+            [[int(text.split()[-1]), 1, 0, 0] for text in texts],
+            dtype=np.float32,
+        )
+
+
+def make_store(path, **kwargs) -> EmbeddingStore:
+    return EmbeddingStore(path, "model", vector_size=4, **kwargs)
+
+
+class TestEmbeddingStore:
+    def test_add_and_get(self, tmp_path):
+        store = make_store(tmp_path, shard_size=3)
+        snippets = make_snippets(8)
+        hashes = [s._hash for s in snippets]
+        embeddings = FakeEncoder().encode([s.text for s in snippets])
+
+        assert store.add(hashes, embeddings) == 8
+        assert store.add(hashes[:2], embeddings[:2]) == 0
+        assert store.shard_numbers() == [0, 1, 2]
+
+        # reopening reads the index and shards back from disk
+        store = make_store(tmp_path, shard_size=3)
+        found, vectors = store.get([hashes[5], "00" * 16, hashes[1]])
+        assert found.tolist() == [True, False, True]
+        assert vectors[:, 0].tolist() == [5, 1]
+
+    def test_models_are_kept_apart(self, tmp_path):
+        snippet = make_snippets(1)[0]
+        make_store(tmp_path).add([snippet._hash], np.ones((1, 4)))
+
+        other = EmbeddingStore(tmp_path, "other-model", vector_size=4)
+        assert other.contains([snippet._hash]).tolist() == [False]
+        assert make_store(tmp_path, prefix="query: ").get([snippet._hash])[
+            0
+        ].tolist() == [False]
+
+        with pytest.raises(ValueError):
+            EmbeddingStore(tmp_path, "model", vector_size=8)
+
+    def test_only_misses_are_encoded(self, tmp_path):
+        store = make_store(tmp_path)
+        encoder = FakeEncoder()
+        list(embed_with_store(make_snippets(5), store, encoder.encode))
+        assert len(encoder.encoded) == 5
+
+        encoder = FakeEncoder()
+        snippets = make_snippets(7)
+        items = list(
+            embed_with_store(snippets, store, encoder.encode, batch_size=3)
+        )
+
+        assert encoder.encoded == ["snippet number 5", "snippet number 6"]
+        assert [s for s, _ in items] == snippets
+        assert [int(e[0]) for _, e in items] == list(range(7))
+
+    def test_fetched_vectors_are_not_encoded(self, tmp_path):
+        store = make_store(tmp_path)
+        snippets = make_snippets(4)
+        fetched = {snippets[1]._hash: np.array([9, 9, 9, 9])}
+        encoder = FakeEncoder()
+        items = list(
+            embed_with_store(
+                snippets,
+                store,
+                encoder.encode,
+                fetch=lambda hashes: {
+                    h: fetched[h] for h in hashes if h in fetched
+                },
+            )
+        )
+
+        assert len(encoder.encoded) == 3
+        assert "snippet number 1" not in encoder.encoded
+        assert [int(e[0]) for _, e in items] == [0, 9, 2, 3]
+        assert store.get([snippets[1]._hash])[0].all()
+
+    def test_gc_and_compact(self, tmp_path):
+        store = make_store(tmp_path, shard_size=4)
+        snippets = make_snippets(10)
+        list(embed_with_store(snippets, store, FakeEncoder().encode))
+
+        live = snippets[::3]
+        assert store.gc(s._hash for s in live) == 6
+        assert store.dead_rows == 6
+        assert not store.maybe_compact(compact_ratio=0.9)
+        assert store.maybe_compact(compact_ratio=0.5)
+
+        assert store.dead_rows == 0
+        assert store.shard_numbers() == [3]
+        store = make_store(tmp_path, shard_size=4)
+        found, vectors = store.get(s._hash for s in snippets)
+        assert found.sum() == 4
+        assert vectors[:, 0].tolist() == [0, 3, 6, 9]
+
+        # appends go to the compacted shard
+        store.add([snippets[1]._hash], np.ones((1, 4)))
+        assert store.shard_numbers() == [3, 4]
@@ -0,0 +1,59 @@
+from thechangelogbot.api.warmup import Warmup
+
+
+class TestWarmup:
+    def test_steps_run_in_order(self):
+        calls = []
+        warmup = Warmup(
+            [
+                ("database", lambda: calls.append("database")),
+                ("search", lambda: calls.append("search")),
+            ]
+        )
+        assert not warmup.ready
+        assert warmup.state()["status"] == "pending"
+
+        assert warmup.start().wait(5)
+        assert calls == ["database", "search"]
+        assert warmup.state()["status"] == "ready"
+        assert set(warmup.timings) == {
+            "warmup_database",
+            "warmup_search",
+            "warmup",
+        }
+
+    def test_failed_step_is_retried(self):
+        attempts = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError("not up yet")
+
+        warmup = Warmup([("database", connect)], retry_interval=0.01)
+        warmup.run()
+
+        assert warmup.ready
+        assert len(attempts) == 3
+        assert warmup.error is None
+
+    def test_retried_step_clears_failure(self):
+        attempts = []
+        states = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise ConnectionError("not up yet")
+
+        warmup = Warmup(
+            [
+                ("database", connect),
+                ("search", lambda: states.append(warmup.state())),
+            ],
+            retry_interval=0.01,
+        )
+        warmup.run()
+
+        assert states[0]["status"] == "warming"
+        assert states[0]["error"] is None